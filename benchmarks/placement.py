@@ -0,0 +1,64 @@
+# Copyright 2024 The Kubric Authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Measures the time of placing objects with `move_until_no_overlap` against the object count.
+
+Compares `PyBullet.check_overlap` with and without the AABB broadphase, e.g.:
+
+  python benchmarks/placement.py --num_objects 10 20 40 80
+"""
+
+import argparse
+import functools
+import time
+
+import kubric as kb
+from kubric.simulator import PyBullet
+import numpy as np
+
+
+def place_objects(num_objects: int, broadphase: bool, seed: int = 0) -> float:
+  """Places num_objects cubes into a cluttered region and returns the time it took (in seconds)."""
+  rng = np.random.RandomState(seed)
+  scene = kb.Scene()
+  simulator = PyBullet(scene)
+  simulator.check_overlap = functools.partial(simulator.check_overlap, broadphase=broadphase)
+  scene += kb.Cube(scale=(10, 10, 0.1), position=(0, 0, -0.1), static=True)
+  spawn_region = [(-4, -4, 0.2), (4, 4, 2)]
+
+  start = time.perf_counter()
+  for _ in range(num_objects):
+    obj = kb.Cube(scale=rng.uniform(0.05, 0.2), static=True)
+    scene += obj
+    kb.move_until_no_overlap(obj, simulator, spawn_region=spawn_region, rng=rng)
+  return time.perf_counter() - start
+
+
+def main():
+  parser = argparse.ArgumentParser()
+  parser.add_argument("--num_objects", type=int, nargs="+", default=[10, 20, 40, 80])
+  parser.add_argument("--repeats", type=int, default=3)
+  args = parser.parse_args()
+
+  print(f"{'objects':>8} {'exhaustive [s]':>15} {'broadphase [s]':>15} {'speedup':>8}")
+  for num_objects in args.num_objects:
+    exhaustive, broadphase = (
+        min(place_objects(num_objects, use_broadphase, seed) for seed in range(args.repeats))
+        for use_broadphase in (False, True))
+    print(f"{num_objects:>8} {exhaustive:>15.3f} {broadphase:>15.3f} "
+          f"{exhaustive / broadphase:>8.1f}")
+
+
+if __name__ == "__main__":
+  main()
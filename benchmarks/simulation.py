@@ -0,0 +1,104 @@
+# Copyright 2024 The Kubric Authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Measures the accuracy and speed of the simulation against step rate and solver iterations.
+
+Simulates scenes like those of MOVi-A/B (3-10 CLEVR sized objects with the physical properties of
+the "metal" and "rubber" materials, thrown towards the center of a floor) with every combination
+of the given step rates and solver iterations. The trajectories are compared to those of a
+reference simulation (with the highest step rate and number of iterations) e.g.:
+
+  python benchmarks/simulation.py --step_rates 120 240 480 --solver_iterations 10 25 50 100
+
+For each setting, the wall time of the simulation and the mean / max distance of the object
+positions from the reference (over all frames, objects and scenes) are reported.
+Note that the MOVi objects are approximated by cubes and spheres (the KuBasic assets would have to
+be downloaded), and that diverging trajectories after collisions are expected to some extent.
+"""
+
+import argparse
+import itertools
+import time
+from typing import Tuple
+
+import kubric as kb
+from kubric.simulator import PyBullet
+import numpy as np
+
+SPAWN_REGION = [(-5, -5, 1), (5, 5, 5)]
+VELOCITY_RANGE = [(-4., -4., 0.), (4., 4., 0.)]
+# friction, restitution, density
+MATERIALS = {"metal": (0.4, 0.3, 2.7), "rubber": (0.8, 0.7, 1.1)}
+
+
+def simulate(seed: int, step_rate: int, solver_iterations: int,
+             num_substeps: int = 0) -> Tuple[np.ndarray, float]:
+  """Simulates a MOVi-like scene.
+
+  Returns:
+    The positions of the objects as an array of shape (frames, objects, 3) and the duration of the
+    simulation (in seconds).
+  """
+  rng = np.random.RandomState(seed)
+  scene = kb.Scene(frame_start=0, frame_end=24, frame_rate=12, step_rate=step_rate)
+  simulator = PyBullet(scene, num_substeps=num_substeps, solver_iterations=solver_iterations)
+  scene += kb.Cube(scale=(20, 20, 1), position=(0, 0, -1), friction=0.3, restitution=0.5,
+                   static=True)
+  objects = []
+  for _ in range(rng.randint(3, 11)):
+    _, size = kb.randomness.sample_sizes("clevr", rng)
+    friction, restitution, density = MATERIALS[rng.choice(list(MATERIALS))]
+    shape = kb.Cube if rng.uniform() < 0.5 else kb.Sphere
+    obj = shape(scale=size, friction=friction, restitution=restitution,
+                mass=density * size**3)
+    scene += obj
+    kb.move_until_no_overlap(obj, simulator, spawn_region=SPAWN_REGION, rng=rng)
+    obj.velocity = rng.uniform(*VELOCITY_RANGE) - [obj.position[0], obj.position[1], 0]
+    objects.append(obj)
+
+  start = time.perf_counter()
+  animation, _ = simulator.run(frame_start=0, frame_end=scene.frame_end + 1)
+  duration = time.perf_counter() - start
+  return np.stack([animation[obj]["position"] for obj in objects], axis=1), duration
+
+
+def main():
+  parser = argparse.ArgumentParser()
+  parser.add_argument("--step_rates", type=int, nargs="+", default=[120, 240, 480, 960])
+  parser.add_argument("--solver_iterations", type=int, nargs="+", default=[10, 25, 50, 100])
+  parser.add_argument("--num_substeps", type=int, default=0)
+  parser.add_argument("--num_scenes", type=int, default=10)
+  args = parser.parse_args()
+
+  reference = [simulate(seed, max(args.step_rates), max(args.solver_iterations),
+                        args.num_substeps)[0]
+               for seed in range(args.num_scenes)]
+
+  print(f"{'step rate':>10} {'iterations':>10} {'time [s]':>10} "
+        f"{'mean err [m]':>13} {'max err [m]':>12}")
+  for step_rate, solver_iterations in itertools.product(sorted(args.step_rates),
+                                                        sorted(args.solver_iterations)):
+    total_duration = 0.
+    errors = []
+    for seed in range(args.num_scenes):
+      positions, duration = simulate(seed, step_rate, solver_iterations, args.num_substeps)
+      total_duration += duration
+      errors.append(np.linalg.norm(positions - reference[seed], axis=-1).ravel())
+    errors = np.concatenate(errors)
+    print(f"{step_rate:>10} {solver_iterations:>10} {total_duration:>10.3f} "
+          f"{errors.mean():>13.4f} {errors.max():>12.4f}")
+
+
+if __name__ == "__main__":
+  main()
@@ -65,6 +65,9 @@ parser.add_argument("--hdri_assets", type=str,
 parser.add_argument("--gso_assets", type=str,
                     default="gs://kubric-public/assets/GSO/GSO.json")
 parser.add_argument("--save_state", dest="save_state", action="store_true")
+parser.add_argument("--no_pack_state", dest="pack_state", action="store_false",
+                    help="do not pack the textures into the saved .blend file (which then "
+                         "refers to the downloaded files)")
 parser.set_defaults(save_state=False, frame_end=24, frame_rate=12,
                     resolution=256)
 FLAGS = parser.parse_args()
@@ -180,7 +183,7 @@ for i in range(num_objects):
 if FLAGS.save_state:
   logging.info("Saving the simulator state to '%s' prior to the simulation.",
                output_dir / "scene.bullet")
-  simulator.save_state(output_dir / "scene.bullet")
+  simulator.save_state(output_dir / "scene.bullet", background=True)
 
 # Run dynamic objects simulation
 logging.info("Running the simulation ...")
@@ -191,7 +194,8 @@ animation, collisions = simulator.run(frame_start=0,
 if FLAGS.save_state:
   logging.info("Saving the renderer state to '%s' ",
                output_dir / "scene.blend")
-  renderer.save_state(output_dir / "scene.blend")
+  renderer.save_state(output_dir / "scene.blend", pack_textures=FLAGS.pack_state,
+                      background=True)
 
 
 logging.info("Rendering the scene ...")
@@ -247,7 +247,8 @@ def main(flags) -> None:
   simulator = kubric.simulator.pybullet.PyBullet(scene, scratch_dir)
   renderer = kubric.renderer.blender.Blender(
       scene, scratch_dir,
-      adaptive_sampling=False)  # Removes salt-and-pepper artifacts in shadows.
+      adaptive_sampling=False,  # Removes salt-and-pepper artifacts in shadows.
+      static_scene_fast_path=True)  # Only the camera moves.
 
   logging.info("Loading assets from %s", flags.assets_path)
   kubasic = kb.AssetSource.from_manifest(flags.assets_path)
@@ -433,6 +434,9 @@ def main(flags) -> None:
 
   logging.info("Rendering the scene ...")
   render_data = renderer.render()
+  logging.info("Camera-only animation (static scene fast path): %s",
+               renderer.is_camera_only_animation())
+  logging.info("Render time per stage (seconds): %s", renderer.last_render_profile.summary())
   # replace asset index (in scene.assets) with segmentation_id
   render_data["segmentation"] = kb.adjust_segmentation_idxs(
       render_data["segmentation"], scene.assets, scene.assets)
@@ -23,6 +23,7 @@ import shutil
 
 import numpy as np
 import trimesh
+from kubric.renderer import lod
 from kubric.safeimport.bpy import bpy
 
 
@@ -208,7 +209,7 @@ def create_blender_object_from_tmesh(tmesh, name):
   return bobj
 
 
-def kubricify(output_folder, obj=None, density=None, friction=None):
+def kubricify(output_folder, obj=None, density=None, friction=None, lod_face_ratios=None):
   if obj is None:
     obj = get_active_object()
   with select(obj):
@@ -234,6 +235,9 @@ def kubricify(output_folder, obj=None, density=None, friction=None):
     output_path.mkdir(parents=True, exist_ok=True)  # ensure path exists
     urdf_path = save_urdf(output_path, properties)
     vis_path = save_visual_geometry(obj, output_path)
+    if lod_face_ratios:
+      print("Creating decimated LOD variants...")
+      properties["lods"] = lod.make_lod_variants(vis_path, lod_face_ratios)
 
     if tmesh.is_convex():
       coll_path = save_collision_geometry(obj, output_path)
@@ -303,11 +307,11 @@ def save_properties(output_path, properties):
   return json_path
 
 
-def export_collection(collection_name, output_folder):
+def export_collection(collection_name, output_folder, lod_face_ratios=None):
   details_list = []
   output_folder = pathlib.Path(output_folder)
   for obj in bpy.data.collections[collection_name].all_objects:
-    details_list.append(kubricify(output_folder, obj))
+    details_list.append(kubricify(output_folder, obj, lod_face_ratios=lod_face_ratios))
 
   with open(output_folder / "manifest.json", "w", encoding="utf-8") as f:
     json.dump(details_list, f, indent=4, sort_keys=True)
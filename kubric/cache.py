@@ -0,0 +1,103 @@
+# Copyright 2024 The Kubric Authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""A size-bounded on-disk store for dicts of arrays, and memoized file digests.
+
+This is the common base of the render cache (`kubric.renderer.render_cache`) and of the simulation
+cache (`kubric.simulator.simulation_cache`), which differ in how they compute their keys.
+This module depends on neither bpy nor pybullet.
+"""
+
+import collections
+import hashlib
+import logging
+import os
+import pathlib
+import tempfile
+from typing import Dict, Optional, Sequence
+
+import numpy as np
+
+from kubric.kubric_typing import PathLike
+
+logger = logging.getLogger(__name__)
+
+_FILE_DIGESTS = {}
+
+
+def file_digest(path: PathLike) -> str:
+  """SHA-256 of the file content (memoized by path, size and modification time)."""
+  stat = os.stat(path)
+  memo_key = (os.path.abspath(path), stat.st_size, stat.st_mtime_ns)
+  if memo_key not in _FILE_DIGESTS:
+    sha = hashlib.sha256()
+    with open(path, "rb") as f:
+      for chunk in iter(lambda: f.read(2**20), b""):
+        sha.update(chunk)
+    _FILE_DIGESTS[memo_key] = sha.hexdigest()
+  return _FILE_DIGESTS[memo_key]
+
+
+class ArrayCache:
+  """Stores dicts of arrays as npz files (one per key) on disk with LRU eviction."""
+
+  # whether the arrays are stored with np.savez_compressed (instead of np.savez)
+  compressed = False
+
+  def __init__(self, directory: PathLike, max_size_bytes: int):
+    """
+    Args:
+      directory: where to store the entries (can be shared across runs).
+      max_size_bytes: the least recently used entries are evicted once the cache exceeds this size.
+    """
+    self.directory = pathlib.Path(directory)
+    self.directory.mkdir(parents=True, exist_ok=True)
+    self.max_size_bytes = max_size_bytes
+    self.statistics = collections.Counter(hits=0, misses=0, evictions=0)
+    # restore the LRU order of previous runs from the modification times
+    entries = sorted(self.directory.glob("*.npz"), key=lambda p: p.stat().st_mtime_ns)
+    self._entries = collections.OrderedDict((p.stem, p.stat().st_size) for p in entries)
+
+  @property
+  def size_bytes(self) -> int:
+    return sum(self._entries.values())
+
+  def _path(self, key: str) -> pathlib.Path:
+    return self.directory / f"{key}.npz"
+
+  def get(self, key: str, names: Sequence[str]) -> Optional[Dict[str, np.ndarray]]:
+    """Returns the cached arrays of an entry (or None if not all of them are cached)."""
+    if key in self._entries:
+      with np.load(self._path(key)) as data:
+        if all(name in data for name in names):
+          self._entries.move_to_end(key)
+          os.utime(self._path(key))
+          self.statistics["hits"] += 1
+          return {name: data[name] for name in names}
+    self.statistics["misses"] += 1
+    return None
+
+  def put(self, key: str, arrays: Dict[str, np.ndarray]):
+    """Stores the arrays of an entry and evicts the least recently used entries if necessary."""
+    with tempfile.NamedTemporaryFile(dir=self.directory, suffix=".tmp", delete=False) as f:
+      (np.savez_compressed if self.compressed else np.savez)(f, **arrays)
+    os.replace(f.name, self._path(key))
+    self._entries[key] = self._path(key).stat().st_size
+    self._entries.move_to_end(key)
+
+    while self.size_bytes > self.max_size_bytes and len(self._entries) > 1:
+      evicted_key, _ = self._entries.popitem(last=False)
+      self._path(evicted_key).unlink(missing_ok=True)
+      self.statistics["evictions"] += 1
+      logger.debug("Evicted '%s' from the %s", evicted_key, type(self).__name__)
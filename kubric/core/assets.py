@@ -16,6 +16,7 @@
 
 import collections
 import contextlib
+from typing import Any, Sequence
 
 import munch
 import numpy as np
@@ -93,6 +94,27 @@ class Asset(tl.HasTraits):
                                    frame=frame,
                                    type="keyframe"))
 
+  def keyframe_insert_many(self, member: str, frames: Sequence[int], values: Sequence[Any]):
+    """Inserts keyframes with the given values for multiple frames at once.
+
+    Unlike `keyframe_insert` the values are given explicitly (the current value of the trait is
+    not changed), and observers are notified only once, with a change of type "keyframe" that
+    has the lists "frames" and "values" instead of a single "frame".
+    """
+    if not self.has_trait(member):
+      raise KeyError(f"Unknown member '{member}'")
+    if len(frames) != len(values):
+      raise ValueError(f"Got {len(frames)} frames but {len(values)} values")
+    trait = self.traits()[member]
+    values = [trait.validate(self, value) for value in values]
+    self.keyframes[member].update(zip(frames, values))
+
+    self.notify_change(munch.Munch(name=member,
+                                   owner=self,
+                                   frames=list(frames),
+                                   values=values,
+                                   type="keyframe"))
+
   @contextlib.contextmanager
   def at_frame(self, frame, interpolation="linear"):
     if frame is None:
@@ -12,12 +12,15 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+from typing import Optional
+
 import numpy as np
 import traitlets as tl
 
 from kubric.core.assets import UndefinedAsset
 from kubric.core import objects
 from kubric.kubric_typing import ArrayLike
+from kubric.kubric_typing import Region
 
 
 class Camera(objects.Object3D):
@@ -60,7 +63,7 @@ class Camera(objects.Object3D):
       image_coords[2] = np.sign(projected[2])
       return image_coords
 
-  def z_to_depth(self, z: ArrayLike) -> np.ndarray:
+  def z_to_depth(self, z: ArrayLike, region: Optional[Region] = None) -> np.ndarray:
     raise NotImplementedError
 
 
@@ -151,13 +154,44 @@ class PerspectiveCamera(Camera):
         [0,   0,   -1],
     ])
 
-  def z_to_depth(self, z: ArrayLike) -> np.ndarray:
+  def intrinsics_for_region(self, region: Region) -> np.ndarray:
+    """The (normalized) intrinsics of an image region rendered with `Blender.render(region=...)`.
+
+    Args:
+      region: (y_min, x_min, y_max, x_max) in pixels of the full image.
+    """
+    width, height = self.active_scene.resolution
+    y_min, x_min, y_max, x_max = region
+    # maps normalized image coordinates of the full image to those of the region
+    to_region = np.array([
+        [width / (x_max - x_min), 0, -x_min / (x_max - x_min)],
+        [0, height / (y_max - y_min), -y_min / (y_max - y_min)],
+        [0, 0, 1],
+    ])
+    return to_region @ self.intrinsics
+
+  def z_to_depth(self, z: ArrayLike, region: Optional[Region] = None) -> np.ndarray:
+    """Converts z values (distance to the camera plane) into depth (distance to the camera center).
+
+    Args:
+      z: array of z values. shape = (..., height, width, 1)
+      region: if z only covers a region (y_min, x_min, y_max, x_max) of the full image
+        (see `Blender.render(region=...)`) then the pixel offset of that region.
+    """
     z = np.array(z)
     assert z.ndim >= 3
     h, w, _ = z.shape[-3:]
-
-    pixel_centers_x = (np.arange(-w/2, w/2, dtype=np.float32) + 0.5) / w * self.sensor_width
-    pixel_centers_y = (np.arange(-h/2, h/2, dtype=np.float32) + 0.5) / h * self.sensor_height
+    if region is None:
+      y_min, x_min, full_h, full_w = 0, 0, h, w
+    else:
+      y_min, x_min, y_max, x_max = region
+      assert (y_max - y_min, x_max - x_min) == (h, w), (region, z.shape)
+      full_w, full_h = self.active_scene.resolution
+
+    pixel_centers_x = ((np.arange(x_min, x_min + w, dtype=np.float32) - full_w/2 + 0.5) / full_w *
+                       self.sensor_width)
+    pixel_centers_y = ((np.arange(y_min, y_min + h, dtype=np.float32) - full_h/2 + 0.5) / full_h *
+                       self.sensor_height)
     squared_distance_from_center = np.sum(np.square(np.meshgrid(
         pixel_centers_x,  # X-Axis (columns)
         pixel_centers_y,  # Y-Axis (rows)
@@ -189,7 +223,7 @@ class OrthographicCamera(Camera):
         [0,   0,   -1],
     ])
 
-  def z_to_depth(self, z: ArrayLike) -> np.ndarray:
+  def z_to_depth(self, z: ArrayLike, region: Optional[Region] = None) -> np.ndarray:
     # not sure if depth is even well defined in orthographic
     # for now just return the z value
     return z
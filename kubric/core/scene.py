@@ -132,11 +132,22 @@ class Scene(tl.HasTraits):
     for asset in self._assets:
       view.remove(asset)
 
-  def add(self, asset: Union[Asset, List[Asset]]):
-    # --- if list, unroll list and call itself on elements
+  def add(self, asset: Union[Asset, List[Asset]], batch: bool = False):
+    """Adds an asset (or a list of assets) to the scene and to all linked views.
+
+    Args:
+      asset: the asset or a (nested) list of assets.
+      batch: if True, all new assets of a list are handed to each view at once (see
+        `View.add_all`), so that e.g. PyBullet can create identical objects in batches. Note that
+        this changes the order (and thus the ids) of the created simulator bodies.
+    """
+    # --- if list, either add all (new) elements at once or unroll list and call itself on elements
     if isinstance(asset, (list, tuple)):
-      for a in asset:
-        self.add(a)
+      if batch:
+        self._add_all(asset)
+      else:
+        for a in asset:
+          self.add(a)
       return
 
     if isinstance(asset, UndefinedAsset):
@@ -156,6 +167,34 @@ class Scene(tl.HasTraits):
     if isinstance(asset, Camera):
       self.camera = asset
 
+  def _add_all(self, assets: Union[List, Tuple]):
+    def flatten(items):
+      for item in items:
+        if isinstance(item, (list, tuple)):
+          yield from flatten(item)
+        else:
+          yield item
+
+    known_assets = set(self._assets)
+    new_assets = []
+    for asset in flatten(assets):
+      if not isinstance(asset, UndefinedAsset) and asset not in known_assets:
+        known_assets.add(asset)
+        new_assets.append(asset)
+
+    for asset in new_assets:
+      self._assets.append(asset)
+      assert self not in asset.scenes
+      asset.scenes.append(self)
+
+    for view in self._views:
+      view.add_all(new_assets)
+
+    # --- set the last added camera as the camera (as when adding them one by one)
+    for asset in new_assets:
+      if isinstance(asset, Camera):
+        self.camera = asset
+
   def __iadd__(self, asset: Union[Asset, List[Asset]]):
     """Adds assets to the scene with a 'scene+=asset' coding pattern."""
     self.add(asset)
@@ -13,7 +13,7 @@
 # limitations under the License.
 
 import abc
-from typing import Any, Callable, Dict, List
+from typing import Any, Callable, Dict, List, Sequence
 from types import MappingProxyType
 import munch
 
@@ -70,7 +70,17 @@ class View(abc.ABC):
     view_obj = self.add_asset(asset)
     if view_obj is None:
       return
+    self._link(asset, view_obj)
 
+  def add_all(self, assets: Sequence[Asset]) -> None:
+    """Adds multiple assets at once (see `add_assets`)."""
+    new_assets = [asset for asset in dict.fromkeys(assets)
+                  if self not in asset.linked_objects and not isinstance(asset, UndefinedAsset)]
+    for asset, view_obj in zip(new_assets, self.add_assets(new_assets)):
+      if view_obj is not None:
+        self._link(asset, view_obj)
+
+  def _link(self, asset: Asset, view_obj: Any) -> None:
     asset.linked_objects[self] = view_obj
 
     # trigger change notification for all fields (for initialization)
@@ -96,6 +106,13 @@ class View(abc.ABC):
   def add_asset(self, asset: Asset) -> Any:
     pass  # pragma: no cover
 
+  def add_assets(self, assets: Sequence[Asset]) -> List[Any]:
+    """Creates the view-objects of multiple assets (one per asset, or None if it is ignored).
+
+    Views can override this to create (e.g. identical) objects in batches.
+    """
+    return [self.add_asset(asset) for asset in assets]
+
   @abc.abstractmethod
   def remove_asset(self, asset: Asset) -> None:
     pass  # pragma: no cover
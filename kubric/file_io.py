@@ -12,13 +12,18 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import concurrent.futures
 import contextlib
+import dataclasses
 import functools
 import logging
 import json
 import multiprocessing
+import os
 import pickle
-from typing import Any, Dict
+import threading
+import time
+from typing import Any, Dict, List
 
 from etils import epath
 import imageio
@@ -54,6 +59,61 @@ def gopen(filename: PathLike, mode: str = "w"):
     yield fp
 
 
+@dataclasses.dataclass
+class CopyResult:
+  source: str
+  target: str
+  size_bytes: int
+  duration: float  # in seconds
+
+
+def copy_file(source: PathLike, target: PathLike, remove_source: bool = False) -> CopyResult:
+  """Copies a (local) file to a possibly remote path (and ensures the parent dir exists)."""
+  start = time.perf_counter()
+  size_bytes = os.path.getsize(source)
+  target = as_path(target)
+  target.parent.mkdir(parents=True, exist_ok=True)
+  tf.io.gfile.copy(str(source), str(target), overwrite=True)
+  if remove_source:
+    os.remove(source)
+  result = CopyResult(str(source), str(target), size_bytes, time.perf_counter() - start)
+  logger.info("Copied '%s' to '%s' (%.1f MiB in %.2fs)", source, target, size_bytes / 2**20,
+              result.duration)
+  return result
+
+
+_BACKGROUND_COPY_LOCK = threading.Lock()
+_BACKGROUND_COPY_EXECUTOR = None
+_PENDING_COPIES: List[concurrent.futures.Future] = []
+
+
+def copy_file_in_background(source: PathLike, target: PathLike,
+                            remove_source: bool = False) -> concurrent.futures.Future:
+  """Like `copy_file`, but runs on a background thread and returns a Future of the CopyResult.
+
+  The source must not be modified until the copy is done (see `wait_for_background_copies`).
+  """
+  global _BACKGROUND_COPY_EXECUTOR
+  with _BACKGROUND_COPY_LOCK:
+    if _BACKGROUND_COPY_EXECUTOR is None:
+      _BACKGROUND_COPY_EXECUTOR = concurrent.futures.ThreadPoolExecutor(
+          max_workers=2, thread_name_prefix="kubric_copy")
+    future = _BACKGROUND_COPY_EXECUTOR.submit(copy_file, source, target, remove_source)
+    _PENDING_COPIES.append(future)
+  return future
+
+
+def wait_for_background_copies() -> List[CopyResult]:
+  """Blocks until all background copies are done and returns their results.
+
+  Re-raises the first exception of a failed copy.
+  """
+  with _BACKGROUND_COPY_LOCK:
+    futures = list(_PENDING_COPIES)
+    _PENDING_COPIES.clear()
+  return [future.result() for future in futures]
+
+
 def write_pkl(data: Any, filename: PathLike) -> None:
   with gopen(filename, "wb") as fp:
     pickle.dump(data, fp)
@@ -14,7 +14,7 @@
 
 """Kubric type annotations."""
 
-from typing import Any, Callable, Union, Sequence
+from typing import Any, Callable, Union, Sequence, Tuple
 from etils import epath
 import numpy as np
 import pyquaternion as pyquat
@@ -27,4 +27,7 @@ PathLike = Union[str, epath.Path]
 
 ArrayLike = Union[Sequence[float], np.ndarray]
 
+# An image region (y_min, x_min, y_max, x_max) in pixels (the max values are exclusive)
+Region = Tuple[int, int, int, int]
+
 Quaternion = pyquat.Quaternion
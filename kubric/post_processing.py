@@ -13,7 +13,8 @@
 # limitations under the License.
 
 import numpy as np
-from typing import Sequence
+import sklearn.utils
+from typing import Dict, Sequence
 from kubric import core
 from kubric.kubric_typing import ArrayLike
 
@@ -31,6 +32,31 @@ def compute_visibility(segmentation: np.ndarray, assets: Sequence[core.Asset]):
                                     for t in range(segmentation.shape[0])]
 
 
+def min_visible_foreground_objects(min_objects: int = 1, min_visible_fraction: float = 0.001):
+  """Returns a predicate for `Blender.check_preview` that rejects scenes with few visible objects.
+
+  Args:
+    min_objects: minimum number of foreground assets that need to be visible.
+    min_visible_fraction: a foreground asset counts as visible if it covers at least this fraction
+      of the image in at least one frame.
+  """
+  def predicate(layers: Dict[str, np.ndarray], scene: core.Scene) -> bool:
+    segmentation = layers["segmentation"]
+    num_pixels = segmentation.shape[1] * segmentation.shape[2]
+    num_visible = 0
+    for i, asset in enumerate(scene.assets, start=1):
+      if asset not in scene.foreground_assets:
+        continue
+      # same ids as in replace_cryptomatte_hashes_by_asset_index
+      segmentation_id = getattr(asset, "segmentation_id", None)
+      segmentation_id = i if segmentation_id is None else segmentation_id
+      visibility = np.sum(segmentation == segmentation_id, axis=(1, 2, 3)) / num_pixels
+      if np.max(visibility) >= min_visible_fraction:
+        num_visible += 1
+    return num_visible >= min_objects
+  return predicate
+
+
 def adjust_segmentation_idxs(
     segmentation: ArrayLike,
     old_assets_list: Sequence[core.Asset],
@@ -67,3 +93,129 @@ def compute_bboxes(segmentation: ArrayLike, asset_list: Sequence[core.Asset]):
         asset.metadata["bboxes"].append((y_min, x_min, y_max, x_max))
         asset.metadata["bbox_frames"].append(t)
 
+
+def mm3hash(name):
+  """ Compute the uint32 hash that Blenders Cryptomatte uses.
+  https://github.com/Psyop/Cryptomatte/blob/master/specification/cryptomatte_specification.pdf
+  """
+  hash_32 = sklearn.utils.murmurhash3_32(name, positive=True)
+  exp = hash_32 >> 23 & 255
+  if exp in (0, 255):
+    hash_32 ^= 1 << 23
+  return hash_32
+
+
+def replace_cryptomatte_hashes_by_asset_index(
+    segmentation_ids: ArrayLike,
+    assets: Sequence[core.assets.Asset]):
+  """Replace (inplace) the cryptomatte hash (from Blender) by the index of each asset + 1.
+  (the +1 is to ensure that the 0 for background does not interfere with asset index 0)
+
+  Args:
+    segmentation_ids: Segmentation array of cryptomatte hashes as returned by Blender.
+    assets: List of assets to use for replacement.
+  """
+  # replace crypto-ids with asset index
+  new_segmentation_ids = np.zeros_like(segmentation_ids)
+  for idx, asset in enumerate(assets, start=1):
+    asset_hash = mm3hash(asset.uid)
+    if hasattr(asset, "segmentation_id") and asset.segmentation_id is not None:
+      uid = asset.segmentation_id
+    else:
+      uid = idx
+    new_segmentation_ids[segmentation_ids == asset_hash] = uid
+  return new_segmentation_ids
+
+
+# --------------------------------------------------------------------------------------------------
+# Post-processors that convert raw render layers (see `blender_utils.get_render_layers_from_exr`)
+# into the final output format. Shared by the Blender renderer and the Rasterizer.
+# --------------------------------------------------------------------------------------------------
+
+def process_depth(exr_layers, scene):
+  # blender returns z values (distance to camera plane)
+  # convert them into depth (distance to camera center)
+  # (for border renderings the layers contain the region they cover)
+  return scene.camera.z_to_depth(exr_layers["depth"], region=exr_layers.get("region"))
+
+
+def process_z(exr_layers, scene):  # pylint: disable=unused-argument
+  # blender returns z values (distance to camera plane)
+  return exr_layers["depth"]
+
+
+def process_backward_flow(exr_layers, scene):  # pylint: disable=unused-argument
+  return exr_layers["backward_flow"]
+
+
+def process_forward_flow(exr_layers, scene):  # pylint: disable=unused-argument
+  return exr_layers["forward_flow"]
+
+
+def process_uv(exr_layers, scene):  # pylint: disable=unused-argument
+  # convert range [0, 1] to uint16
+  return (exr_layers["uv"].clip(0.0, 1.0) * 65535).astype(np.uint16)
+
+
+def process_normal(exr_layers, scene):  # pylint: disable=unused-argument
+  # convert range [-1, 1] to uint16
+  return ((exr_layers["normal"].clip(-1.0, 1.0) + 1) * 65535 / 2
+          ).astype(np.uint16)
+
+
+def process_object_coordinates(exr_layers, scene):  # pylint: disable=unused-argument
+  # sometimes these values can become ever so slightly negative (e.g. 1e-10)
+  # we clip them to [0, 1] to guarantee this range for further processing.
+  return (exr_layers["object_coordinates"].clip(0.0, 1.0) * 65535
+          ).astype(np.uint16)
+
+
+def process_segementation(exr_layers, scene):  # pylint: disable=unused-argument
+  # map the Blender cryptomatte hashes to asset indices
+  return replace_cryptomatte_hashes_by_asset_index(
+      exr_layers["segmentation_indices"][:, :, :1], scene.assets)
+
+
+def linear_to_srgb(linear: ArrayLike) -> np.ndarray:
+  """The sRGB transfer function (IEC 61966-2-1) applied to linear values (clipped to [0, 1])."""
+  linear = np.clip(linear, 0., 1.)
+  return np.where(linear <= 0.0031308, 12.92 * linear,
+                  1.055 * np.power(linear, 1 / 2.4) - 0.055)
+
+
+def tonemap_linear_rgba(linear_rgba: ArrayLike, exposure: float = 0., gamma: float = 1.,
+                        bit_depth: int = 8) -> np.ndarray:
+  """Converts the linear (premultiplied) EXR Image layer to the RGBA values of the PNG output.
+
+  Matches what Blender writes to (8 or 16 bit) PNG files for the "Standard" view transform without
+  a look, curve mapping or dithering: colors are un-premultiplied (PNG uses straight alpha),
+  scaled by the exposure, converted to sRGB, raised to 1/gamma and quantized.
+
+  Args:
+    linear_rgba: premultiplied scene-linear RGBA. shape = (..., 4)
+    exposure: the exposure of the view settings (in stops).
+    gamma: the gamma of the view settings.
+    bit_depth: 8 or 16.
+
+  Returns:
+    The RGBA image as uint8 (or uint16 for bit_depth=16).
+  """
+  linear_rgba = np.asarray(linear_rgba, dtype=np.float32)
+  alpha = np.clip(linear_rgba[..., 3:], 0., 1.)
+  rgb = np.divide(linear_rgba[..., :3], alpha, out=np.zeros_like(linear_rgba[..., :3]),
+                  where=alpha > 0)
+  rgb = linear_to_srgb(rgb * 2.**exposure)
+  if gamma != 1.:
+    rgb = np.power(rgb, 1. / gamma)
+  rgba = np.concatenate([rgb, alpha], axis=-1)
+  max_value = 2**bit_depth - 1
+  return np.floor(rgba * max_value + 0.5).astype(np.uint8 if bit_depth == 8 else np.uint16)
+
+
+def process_rgba(exr_layers, scene):  # pylint: disable=unused-argument
+  # map the Blender cryptomatte hashes to asset indices
+  return exr_layers["rgba"]
+
+
+def process_rgb(exr_layers, scene):  # pylint: disable=unused-argument
+  return exr_layers["rgba"][..., :3]
@@ -12,4 +12,11 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
-from kubric.renderer.blender import Blender
+
+def __getattr__(name):  # pylint: disable=invalid-name
+  # Blender is imported lazily, so that the bpy-free renderer modules (e.g. the rasterizer) can be
+  # used in a plain python environment.
+  if name == "Blender":
+    from kubric.renderer.blender import Blender  # pylint: disable=import-outside-toplevel
+    return Blender
+  raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
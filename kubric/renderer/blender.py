@@ -13,28 +13,59 @@
 # limitations under the License.
 
 import collections
+import contextlib
 from contextlib import redirect_stdout
 import functools
 import io
+import json
 import logging
 import os
+import shutil
 import sys
 import tempfile
-from typing import Any, Dict, Optional, Sequence, Union
+import time
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple, Union
 
 import kubric as kb
 from kubric import core
 from kubric import file_io
+from kubric import post_processing
 from kubric.core.assets import UndefinedAsset
 from kubric.file_io import PathLike
+from kubric.kubric_typing import Region
 from kubric.redirect_io import RedirectStream
 from kubric.renderer import blender_utils
+from kubric.renderer import hdri
+from kubric.renderer import lod
+from kubric.renderer import optical_flow
+from kubric.renderer import profiling
+from kubric.renderer import rasterizer
+from kubric.renderer import render_cache as render_cache_lib
+from kubric.renderer.render_cache import RenderCache
 from kubric.safeimport.bpy import bpy
 import numpy as np
-import tensorflow as tf
 
 logger = logging.getLogger(__name__)
 
+# Decides from the preview layers (see `Blender.preview_pass`) whether a scene should be rendered.
+PreviewPredicate = Callable[[Dict[str, np.ndarray], core.Scene], bool]
+
+# custom property that stores the source file of (cached) environment map images
+_SOURCE_FILEPATH_PROPERTY = "kubric_source_filepath"
+
+# trait name -> input of the Principled BSDF node
+_PRINCIPLED_BSDF_INPUTS = {
+    "color": "Base Color",
+    "roughness": "Roughness",
+    "metallic": "Metallic",
+    "specular": "Specular",
+    "specular_tint": "Specular Tint",
+    "ior": "IOR",
+    "transmission": "Transmission",
+    "transmission_roughness": "Transmission Roughness",
+    "emission": "Emission",
+}
+
 
 def add_top_level_empty_parent(name: str = "Empty") -> bpy.types.Object:
   """Adds an empty parent to scene and makes it the parent of all objects.
@@ -68,6 +99,18 @@ class Blender(core.View):
                verbose: bool = False,
                custom_scene: Optional[str] = None,
                motion_blur: Optional[float] = None,
+               annotation_backend: str = "cycles",
+               flow_backend: str = "vector",
+               render_cache: Optional[RenderCache] = None,
+               static_scene_fast_path: bool = False,
+               share_materials: bool = False,
+               select_hdri_variant: bool = False,
+               cache_hdri_images: bool = False,
+               lod_max_error: Optional[float] = None,
+               exr_half_float_layers: Sequence[str] = (),
+               exr_codec: str = "ZIP",
+               exr_half_float_codec: str = "ZIP",
+               rgba_source: str = "png",
                ):
     """
     Args:
@@ -89,7 +132,83 @@ class Blender(core.View):
         If this argument is set to the path for a `.blend` file, then that scene is loaded instead.
         Note that this scene only affects the rendering output. It is not accessible from Kubric and
         not taken into account by the simulator.
+      motion_blur: Strength of the (compositor based) motion blur. None disables motion blur.
+      annotation_backend: Which engine produces the annotation layers (depth, segmentation, normal,
+        object_coordinates and flow). With "cycles" (default) they are path-traced in a separate
+        1spp view layer. With "rasterizer" that view layer is disabled, Cycles only renders the
+        image and the annotations are computed by `kubric.renderer.rasterizer` instead.
+        The rasterizer does not support the "uv" layer, motion blur or custom scenes.
+      flow_backend: How the optical flow is computed when using the "cycles" annotation_backend.
+        With "vector" (default) it is read from the Vector pass of Cycles. With "analytic" the
+        Vector pass is skipped and the flow is computed from the object coordinates,
+        the segmentation and the object / camera keyframes (see `kubric.renderer.optical_flow`).
+        Analytic flow is incompatible with motion blur (which needs the Vector pass). Scenes with
+        render files that the rasterizer cannot load (e.g. fbx or blend files) fall back to the
+        Vector pass.
+      render_cache: If set, `render` returns cached frames whose scene content hash matches (see
+        `kubric.renderer.render_cache`) and stores newly rendered frames in the cache.
+        Frames with identical content (e.g. of static scenes) are then only rendered once.
+      static_scene_fast_path: If nothing but the camera is animated (see
+        `is_camera_only_animation`), then Cycles keeps the scene data and BVH in memory across
+        frames (persistent data) and the Vector pass is skipped unless flow is requested.
+        This does not change the rendered outputs, but increases the memory usage of Cycles.
+      share_materials: If True, kubric materials of the same type and with identical trait values
+        share a single Blender material (and node tree). Shared materials are split
+        (copy-on-write) when one of their users is changed or keyframed. Note that this changes
+        the Blender materials of the scene (and of saved .blend files).
+      select_hdri_variant: If True, environment maps (see `_set_ambient_light_hdri` and
+        `_set_background_hdri`) are loaded at render time in the smallest resolution variant that
+        is adequate for the resolution and field of view of the camera (see
+        `kubric.renderer.hdri`). Variants are created by `kubric.scripts.download_hdri_haven`.
+      cache_hdri_images: If True, the decoded pixels of environment maps are kept in the
+        process-wide `hdri.IMAGE_CACHE` (of up to 2 GiB), so that subsequent scenes of the same
+        process do not need to read and decode the same files again.
+      lod_max_error: If set, file based objects with decimated level-of-detail meshes (listed in
+        their "lods" metadata, see `kubric.renderer.lod`) are rendered with the coarsest LOD
+        whose geometric error projected to the image stays below this many pixels in all
+        rendered frames. None (default) always uses the original render meshes.
+      exr_half_float_layers: Render layers (EXR slots, e.g. `blender_utils.HALF_FLOAT_LAYERS`)
+        that are written with 16 instead of 32 bits per channel, which reduces the size of the
+        intermediate EXR files and their decoding time. They are written to a separate file,
+        because Blender uses a single precision per (multilayer) EXR file.
+        Cryptomatte ("CryptoObject00") has to remain float32.
+      exr_codec: EXR compression codec of the float32 layers (e.g. "ZIP", "PIZ").
+      exr_half_float_codec: EXR compression codec of the half-float layers (e.g. "ZIP", "PIZ" or
+        the lossy "DWAA").
+      rgba_source: Where the "rgba" layer comes from. With "png" (default) Blender writes a
+        tonemapped PNG per frame, which is read back by `postprocess`. With "exr" no PNG is written
+        and the Image layer of the EXR is converted in numpy instead (see
+        `post_processing.tonemap_linear_rgba`). The conversion implements the "Standard" view
+        transform, which is therefore selected instead of Blender's default (e.g. Filmic).
     """
+    if rgba_source not in ("png", "exr"):
+      raise ValueError(f"Unknown rgba_source '{rgba_source}'")
+    if annotation_backend not in ("cycles", "rasterizer"):
+      raise ValueError(f"Unknown annotation_backend '{annotation_backend}'")
+    if flow_backend not in ("vector", "analytic"):
+      raise ValueError(f"Unknown flow_backend '{flow_backend}'")
+    self.annotation_backend = annotation_backend
+    self.rgba_source = rgba_source
+    self.flow_backend = flow_backend
+    self.render_cache = render_cache
+    self.static_scene_fast_path = static_scene_fast_path
+    self.share_materials = share_materials
+    self.select_hdri_variant = select_hdri_variant
+    self.cache_hdri_images = cache_hdri_images
+    # {world node name: requested environment map file}
+    self._hdri_filepaths = {}
+    self.lod_max_error = lod_max_error
+    # {asset uid: LOD level of the currently imported render mesh}
+    self._lod_levels = {}
+    # {interning key: Blender material} and {material uid: MaterialBinding}
+    self._shared_materials = {}
+    self._material_bindings = {}
+    # number of Blender materials created / kubric materials using a shared one / copies made
+    self.material_statistics = collections.Counter(created=0, shared=0, split=0)
+    # timing and memory profile of the last call to render (see `kubric.renderer.profiling`)
+    self.last_render_profile = profiling.RenderProfile()
+    self.motion_blur = motion_blur
+    self.custom_scene = custom_scene
     self.scratch_dir = tempfile.mkdtemp() if scratch_dir is None else scratch_dir
     self.ambient_node = None
     self.ambient_hdri_node = None
@@ -98,16 +217,27 @@ class Blender(core.View):
     self.bg_hdri_node = None
     self.bg_mapping_node = None
     self.verbose = verbose
+    # number of scenes checked / rejected by `check_preview`
+    self.preview_statistics = collections.Counter(checked=0, rejected=0)
 
     # blender has a default scene on load, so we clear everything first
     self.clear_and_reset_blender_scene(self.verbose, custom_scene=custom_scene)
     self.blender_scene = bpy.context.scene
 
+    if rgba_source == "exr":
+      self.blender_scene.view_settings.view_transform = "Standard"
+      self.blender_scene.view_settings.look = "None"
+
     # the ray-tracing engine is set here because it affects the availability of some features
     bpy.context.scene.render.engine = "CYCLES"
     self.use_gpu = os.getenv("KUBRIC_USE_GPU", "False").lower() in ("true", "1", "t")
 
-    blender_utils.activate_render_passes(normal=True, optical_flow=True, segmentation=True, uv=True)
+    use_aux_view_layer = annotation_backend == "cycles"
+    use_vector_pass = use_aux_view_layer and flow_backend == "vector"
+    blender_utils.activate_render_passes(normal=True, optical_flow=use_vector_pass,
+                                         segmentation=True, uv=True,
+                                         depth=use_aux_view_layer,
+                                         aux_view_layer=use_aux_view_layer)
     self._setup_scene_shading()
 
     self.adaptive_sampling = adaptive_sampling  # speeds up rendering
@@ -115,19 +245,31 @@ class Blender(core.View):
     self.samples_per_pixel = samples_per_pixel
     self.background_transparency = background_transparency
 
-    self.exr_output_node = blender_utils.set_up_exr_output_node(motion_blur=motion_blur)
+    self.exr_half_float_layers = tuple(exr_half_float_layers)
+    exr_kwargs = {"motion_blur": motion_blur, "half_float_layers": self.exr_half_float_layers,
+                  "codec": exr_codec, "half_float_codec": exr_half_float_codec}
+    if use_aux_view_layer:
+      # the Vector layer is also exported with analytic flow, since `render` enables the Vector
+      # pass for scenes with objects that the analytic flow does not support
+      self.exr_output_node = blender_utils.set_up_exr_output_node(optical_flow=True,
+                                                                  **exr_kwargs)
+    else:
+      self.exr_output_node = blender_utils.set_up_exr_output_node(
+          default_layers=("Image",), aux_layers=(), optical_flow=False, **exr_kwargs)
+    # writes the half-float layers (if any) to a separate EXR file
+    self.exr_half_output_node = self.blender_scene.node_tree.nodes.get("File Output Half")
 
     self.post_processors = {
-        "backward_flow": blender_utils.process_backward_flow,
-        "forward_flow": blender_utils.process_forward_flow,
-        "depth": blender_utils.process_depth,
-        "z": blender_utils.process_z,
-        "uv": blender_utils.process_uv,
-        "normal": blender_utils.process_normal,
-        "object_coordinates": blender_utils.process_object_coordinates,
-        "segmentation": blender_utils.process_segementation,
-        "rgb": blender_utils.process_rgb,
-        "rgba": blender_utils.process_rgba,
+        "backward_flow": post_processing.process_backward_flow,
+        "forward_flow": post_processing.process_forward_flow,
+        "depth": post_processing.process_depth,
+        "z": post_processing.process_z,
+        "uv": post_processing.process_uv,
+        "normal": post_processing.process_normal,
+        "object_coordinates": post_processing.process_object_coordinates,
+        "segmentation": post_processing.process_segementation,
+        "rgb": post_processing.process_rgb,
+        "rgba": post_processing.process_rgba,
     }
 
     super().__init__(scene, scene_observers={
@@ -216,22 +358,54 @@ class Blender(core.View):
     else:
       self.exr_output_node.mute = False
       self.exr_output_node.base_path = str(path_prefix)
-
-  def save_state(self, path: PathLike, pack_textures: bool = True):
+    if self.exr_half_output_node is not None:
+      # the half-float layers are written to "{dir}/half/{prefix}{frame_nr:04d}.exr"
+      self.exr_half_output_node.mute = path_prefix is None
+      if path_prefix is not None:
+        path_prefix = kb.as_path(path_prefix)
+        self.exr_half_output_node.base_path = str(
+            path_prefix.parent / blender_utils.HALF_FLOAT_EXR_DIR / path_prefix.name)
+
+  def save_state(self, path: PathLike, pack_textures: bool = True, background: bool = False
+                 ) -> Dict[str, Any]:
     """Saves the '.blend' blender file to disk.
 
     If a file with the same path exists, it is overwritten.
+
+    Args:
+      path: Where to save the file (can be a remote path, e.g. on GCS).
+      pack_textures: Whether to pack all external files (textures, meshes, ...) into the file.
+        Packing can take long for scenes with large textures. Without it, the absolute paths and
+        SHA-256 digests of the external files are stored in the "kubric_external_files" property of
+        the scene (as JSON) instead, so that the file can be verified and restored later.
+      background: Whether to copy the file to its target path on a background thread, so that
+        rendering can proceed in the meantime (see `kubric.file_io.wait_for_background_copies`,
+        which is also called by `kubric.done`).
+
+    Returns:
+      A report with the "path", the "size_bytes" of the file, the "save_duration" (in seconds),
+      the recorded "external_files" and the `file_io.CopyResult` of the "copy" (or a Future of it
+      if background is set).
     """
+    start = time.perf_counter()
     # first write to a temporary file, and later copy
     # (because blender cannot write to gcs buckets etc.)
-    tmp_path = self.scratch_dir / "scene.blend"
+    # a unique name is used, because background copies of previous states might still be running
+    with tempfile.NamedTemporaryFile(dir=self.scratch_dir, prefix="scene_", suffix=".blend",
+                                     delete=False) as f:
+      tmp_path = kb.as_path(f.name)
     # ensure file does NOT exist (as otherwise "scene.blend1" is created instead of "scene.blend")
-    kb.as_path(tmp_path).unlink(missing_ok=True)
+    tmp_path.unlink(missing_ok=True)
 
-    # --- ensure directory exists
-    parent = kb.as_path(tmp_path).parent
-    if not parent.exists():
-      parent.mkdir(parents=True)
+    _restore_hdri_image_files()
+    external_files = []
+    if pack_textures:
+      self.blender_scene.pop("kubric_external_files", None)
+    else:
+      external_files = [{"path": filepath, "sha256": render_cache_lib.file_digest(filepath)}
+                        for filepath in sorted(set(bpy.utils.blend_paths(absolute=True)))
+                        if os.path.isfile(filepath)]
+      self.blender_scene["kubric_external_files"] = json.dumps(external_files)
 
     # --- save the file; see https://github.com/google-research/kubric/issues/96
     with RedirectStream(stream=sys.stdout, disabled=self.verbose):
@@ -242,12 +416,21 @@ class Blender(core.View):
           bpy.ops.wm.save_mainfile(filepath=str(tmp_path))
         if self.verbose:
           print(fstdout.getvalue())
+    report = {
+        "path": str(path),
+        "size_bytes": tmp_path.stat().st_size,
+        "save_duration": time.perf_counter() - start,
+        "external_files": external_files,
+    }
+    logger.info("Saving '%s' (%.1f MiB, written in %.2fs, %d external files)", path,
+                report["size_bytes"] / 2**20, report["save_duration"], len(external_files))
 
     # copy to target path
-    path = kb.as_path(path)
-    path.parent.mkdir(parents=True, exist_ok=True)  # ensure directory exists
-    logger.info("Saving '%s'", path)
-    tf.io.gfile.copy(tmp_path, path, overwrite=True)
+    if background:
+      report["copy"] = file_io.copy_file_in_background(tmp_path, path, remove_source=True)
+    else:
+      report["copy"] = file_io.copy_file(tmp_path, path, remove_source=True)
+    return report
 
   def render(self,
              frames: Optional[Sequence[int]] = None,
@@ -256,6 +439,7 @@ class Blender(core.View):
                                              "forward_flow", "depth",
                                              "normal", "object_coordinates",
                                              "segmentation"),
+             region: Union[Region, Dict[int, Region], None] = None,
              ) -> Dict[str, np.ndarray]:
     """Renders all frames (or a subset) of the animation and returns images as a dict of arrays.
 
@@ -266,6 +450,15 @@ class Blender(core.View):
       return_layers: list of layers to return. For possible values refer to
         the Blender.post_processors dict. Defaults to ("backward_flow",
         "forward_flow", "depth", "normal", "object_coordinates", "segmentation").
+      region: only render the image region (y_min, x_min, y_max, x_max) given in pixels
+        (max exclusive), using Cycles border rendering. Either a single region for all frames or
+        a dict {frame: region} (all regions need to have the same size). The returned layers
+        then have the size of the region. Use `camera.intrinsics_for_region` or
+        `kb.get_camera_info(camera, region=region)` for the matching intrinsics.
+        Regions require a resolution_percentage of 100 (otherwise a ValueError is raised).
+
+    A per-frame timing and memory profile of the call is recorded in `last_render_profile`
+    (e.g. use `renderer.last_render_profile.save_chrome_trace("trace.json")`).
 
     Returns:
       A dictionary with one entry for each return layer. By default:
@@ -277,25 +470,388 @@ class Blender(core.View):
         - "object_coordinates": shape = (nr_frames, height, width, 3) (uint16)
         - "normal": shape = (nr_frames, height, width, 3) (uint16)
     """
+    return self._render_views(None, frames, ignore_missing_textures, return_layers, region)[0]
+
+  def _render_views(self, cameras, frames, ignore_missing_textures, return_layers, region
+                    ) -> List[Dict[str, np.ndarray]]:
+    """Renders the frames from each camera (defaults to the scene camera), using the render cache.
+
+    Returns:
+      The layers of each camera in the format returned by `render`.
+    """
     logger.info("Using scratch rendering folder: '%s'", self.scratch_dir)
+    self.last_render_profile = profiling.RenderProfile()
+    self._update_hdri_images(cameras)
     if not ignore_missing_textures:
       self._check_missing_textures()
-    self.set_exr_output_path(self.scratch_dir / "exr" / "frame_")
-    # --- starts rendering
     if frames is None:
       frames = range(self.scene.frame_start, self.scene.frame_end + 1)
-    with RedirectStream(stream=sys.stdout, disabled=self.verbose):
+    frames = list(frames)
+    self._update_lods(frames, cameras)
+    regions = self._get_frame_regions(region, frames)
+    use_region = region is not None
+    cameras = [None] if cameras is None else list(cameras)
+    if self.render_cache is None:
+      return self._render_frames(cameras, [frames] * len(cameras), return_layers, regions,
+                                 use_region)
+
+    # --- look up the frames of each camera in the cache
+    with self.last_render_profile.span("cache/lookup"):
+      cache_settings = self._get_cache_settings()
+      keys = []
+      for camera in cameras:
+        with self._scene_camera(camera):
+          keys.append(render_cache_lib.frame_keys(self.scene, frames, cache_settings,
+                                                  frame_settings=regions))
+      frame_layers = [{frame_nr: self.render_cache.get(camera_keys[frame_nr], return_layers)
+                       for frame_nr in frames}
+                      for camera_keys in keys]
+    # frames with the same key (e.g. of a static scene) only need to be rendered once
+    render_frames = []
+    for camera_keys, camera_layers in zip(keys, frame_layers):
+      missing = {}
       for frame_nr in frames:
-        bpy.context.scene.frame_set(frame_nr)
-        # When writing still images Blender doesn't append the frame number to the png path.
-        # (but for exr it does, so we only adjust the png path)
-        bpy.context.scene.render.filepath = str(
-            self.scratch_dir / "images" / f"frame_{frame_nr:04d}.png")
-        bpy.ops.render.render(animation=False, write_still=True)
-        logger.info("Rendered frame '%s'", bpy.context.scene.render.filepath)
+        if camera_layers[frame_nr] is None:
+          missing.setdefault(camera_keys[frame_nr], frame_nr)
+      render_frames.append(sorted(missing.values()))
+    logger.info("Found %d of %d frames in the render cache, rendering %d frames.",
+                sum(layers is not None for camera_layers in frame_layers
+                    for layers in camera_layers.values()),
+                len(frames) * len(cameras), sum(len(f) for f in render_frames))
+    if any(render_frames):
+      rendered = self._render_frames(cameras, render_frames, return_layers, regions, use_region)
+      for camera_keys, camera_layers, camera_frames, camera_rendered in zip(
+          keys, frame_layers, render_frames, rendered):
+        for i, frame_nr in enumerate(camera_frames):
+          layers = {key: value[i] for key, value in camera_rendered.items()}
+          with self.last_render_profile.span("cache/store", frame=frame_nr):
+            self.render_cache.put(camera_keys[frame_nr], layers)
+          for other_frame_nr in frames:
+            if camera_keys[other_frame_nr] == camera_keys[frame_nr]:
+              camera_layers[other_frame_nr] = layers
+    return [{key: np.stack([camera_layers[frame_nr][key] for frame_nr in frames], axis=0)
+             for key in return_layers}
+            for camera_layers in frame_layers]
+
+  def _render_frames(self, cameras, camera_frames, return_layers, regions, use_region):
+    """Renders the given frames of each camera with Cycles and post-processes them.
+
+    Each frame is evaluated only once and then rendered from all cameras that need it.
+    The outputs of a camera are written to scratch_dir / camera.uid (or to scratch_dir for the
+    scene camera, given as None).
+    """
+    render_settings = self.blender_scene.render
+    aux_view_layer = self.blender_scene.view_layers.get("AuxOutputs")
+    settings = (render_settings.use_persistent_data,
+                aux_view_layer.use_pass_vector if aux_view_layer else None,
+                bpy.context.scene.camera)
+    if len(cameras) > 1:
+      # Cycles can reuse the scene geometry (BVH) across the views of the same frame
+      render_settings.use_persistent_data = True
+    if self.static_scene_fast_path and self.is_camera_only_animation():
+      logger.info("Only the camera is animated: reusing the scene data across frames.")
+      # Cycles keeps the synchronized scene and the BVH between renders with persistent data
+      render_settings.use_persistent_data = True
+      flow_requested = {"backward_flow", "forward_flow"} & set(return_layers)
+      if aux_view_layer and not flow_requested and self.motion_blur is None:
+        aux_view_layer.use_pass_vector = False  # the Vector pass also requires motion data
+    if (aux_view_layer and self.flow_backend == "analytic" and
+        {"backward_flow", "forward_flow"} & set(return_layers) and not self._use_analytic_flow()):
+      logger.info("The analytic flow does not support all render files: using the Vector pass.")
+      aux_view_layer.use_pass_vector = True
+    output_dirs = [self.scratch_dir if camera is None else self.scratch_dir / camera.uid
+                   for camera in cameras]
+    try:
+      with RedirectStream(stream=sys.stdout, disabled=self.verbose):
+        for frame_nr in sorted(set().union(*camera_frames)):
+          with self.last_render_profile.span("frame_set", frame=frame_nr):
+            bpy.context.scene.frame_set(frame_nr)
+          self._set_render_border(regions[frame_nr])
+          for camera, output_dir, frames in zip(cameras, output_dirs, camera_frames):
+            if frame_nr not in frames:
+              continue
+            profile_args = {}
+            if camera is not None:
+              # switch the camera directly in Blender to avoid re-evaluating the scene
+              bpy.context.scene.camera = camera.linked_objects[self]
+              profile_args["camera"] = camera.uid
+            self.set_exr_output_path(output_dir / "exr" / "frame_")
+            # When writing still images Blender doesn't append the frame number to the png path.
+            # (but for exr it does, so we only adjust the png path)
+            render_settings.filepath = str(output_dir / "images" / f"frame_{frame_nr:04d}.png")
+            with self._profile_cycles(frame_nr, **profile_args):
+              bpy.ops.render.render(animation=False, write_still=self.rgba_source == "png")
+            logger.info("Rendered frame '%s'", render_settings.filepath)
+    finally:
+      self._set_render_border(None)
+      render_settings.use_persistent_data = settings[0]
+      if aux_view_layer:
+        aux_view_layer.use_pass_vector = settings[1]
+      bpy.context.scene.camera = settings[2]
+
+    # --- post process the rendered frames (the post-processors depend on scene.camera)
+    results = []
+    for camera, output_dir, frames in zip(cameras, output_dirs, camera_frames):
+      with self._scene_camera(camera):
+        results.append(self.postprocess(output_dir, return_layers=return_layers,
+                                        region=regions if use_region else None, frames=frames))
+    return results
+
+  @contextlib.contextmanager
+  def _scene_camera(self, camera: Optional[core.Camera]):
+    """Temporarily makes camera the scene camera (None keeps the current scene camera)."""
+    scene_camera = self.scene.camera
+    if camera is not None:
+      self.scene.camera = camera
+    try:
+      yield
+    finally:
+      self.scene.camera = scene_camera
+
+  @contextlib.contextmanager
+  def _profile_cycles(self, frame_nr: int, **args):
+    """Records the phases of a Cycles render (based on its render stats) in the profile.
+
+    Cycles reports its progress via status strings. The phases are derived from these as:
+      - "cycles/sync": from the start until the BVH build (scene and geometry synchronization)
+      - "cycles/bvh": from the BVH build until the first sample
+      - "cycles/sampling": from the first to the last sample
+      - "compositor_and_write": the compositor, including EXR and PNG output
+    """
+    events = []
+
+    def on_stats(stats, *unused_args):
+      events.append((time.perf_counter(), str(stats)))
+
+    bpy.app.handlers.render_stats.append(on_stats)
+    start = time.perf_counter()
+    try:
+      yield
+    finally:
+      end = time.perf_counter()
+      bpy.app.handlers.render_stats.remove(on_stats)
+      sample_times = [t for t, stats in events if "Sample" in stats] or [end]
+      bvh_times = [t for t, stats in events if "BVH" in stats and t <= sample_times[0]]
+      bvh_start = bvh_times[0] if bvh_times else sample_times[0]
+      profile = self.last_render_profile
+      profile.add_span("cycles/sync", start, bvh_start - start, frame=frame_nr, **args)
+      profile.add_span("cycles/bvh", bvh_start, sample_times[0] - bvh_start, frame=frame_nr,
+                       **args)
+      profile.add_span("cycles/sampling", sample_times[0], sample_times[-1] - sample_times[0],
+                       frame=frame_nr, **args)
+      profile.add_span("compositor_and_write", sample_times[-1], end - sample_times[-1],
+                       frame=frame_nr, **args)
+      cycles_peaks = [profiling.parse_cycles_peak_memory(stats) for _, stats in events]
+      cycles_peaks = [peak for peak in cycles_peaks if peak is not None]
+      if cycles_peaks:
+        profile.record_memory(frame_nr, cycles_peak_memory=max(cycles_peaks))
+      else:
+        profile.record_memory(frame_nr)
+
+  def is_camera_only_animation(self) -> bool:
+    """Whether nothing but the camera is animated (based on the kubric keyframes).
+
+    In that case all frames are views of the same static scene, which is the case for many
+    multi-view (e.g. NeRF) datasets.
+    """
+    if self.custom_scene is not None:
+      return False  # the custom scene may contain animations that kubric does not know about
+    for asset in self.scene.assets:
+      if isinstance(asset, core.Camera):
+        continue
+      if any(asset.keyframes.values()):
+        return False
+      material = getattr(asset, "material", None)
+      if material is not None and any(material.keyframes.values()):
+        return False
+    return True
+
+  def _get_cache_settings(self) -> Dict[str, Any]:
+    """All renderer settings that influence the output (used for render cache keys)."""
+    return {
+        "blender_version": bpy.app.version_string,
+        "samples_per_pixel": self.samples_per_pixel,
+        "use_denoising": self.use_denoising,
+        "adaptive_sampling": self.adaptive_sampling,
+        "background_transparency": self.background_transparency,
+        "resolution_percentage": self.blender_scene.render.resolution_percentage,
+        "motion_blur": self.motion_blur,
+        "custom_scene": self.custom_scene,
+        "annotation_backend": self.annotation_backend,
+        "flow_backend": self.flow_backend,
+        "lod_max_error": self.lod_max_error,
+        "exr_half_float_layers": self.exr_half_float_layers,
+        "rgba_source": self.rgba_source,
+        "view_transform": self.blender_scene.view_settings.view_transform,
+        # covers e.g. environment maps that are set directly on the renderer
+        "images": sorted(bpy.path.abspath(img.filepath) or img.get(_SOURCE_FILEPATH_PROPERTY, "")
+                         for img in bpy.data.images
+                         if img.filepath or _SOURCE_FILEPATH_PROPERTY in img),
+    }
+
+  def _output_resolution(self, resolution_percentage: Optional[int] = None) -> Tuple[int, int]:
+    """The (width, height) of the rendered images.
+
+    That is scene.resolution scaled by resolution_percentage (defaults to the percentage of the
+    render settings).
+    """
+    if resolution_percentage is None:
+      resolution_percentage = self.blender_scene.render.resolution_percentage
+    width, height = self.scene.resolution
+    return (int(width * resolution_percentage / 100), int(height * resolution_percentage / 100))
+
+  def _get_frame_regions(self, region, frames) -> Dict[int, Optional[Region]]:
+    """Returns the (validated) region for each frame (None for full frame rendering)."""
+    if region is None:
+      return {frame_nr: None for frame_nr in frames}
+    self._check_region_resolution()
+    regions = region if isinstance(region, dict) else {frame_nr: region for frame_nr in frames}
+    width, height = self.scene.resolution
+    sizes = set()
+    for frame_nr in frames:
+      if frame_nr not in regions:
+        raise ValueError(f"No region specified for frame {frame_nr}.")
+      y_min, x_min, y_max, x_max = regions[frame_nr]
+      if not (0 <= y_min < y_max <= height and 0 <= x_min < x_max <= width):
+        raise ValueError(f"Invalid region {regions[frame_nr]} for resolution {(width, height)}.")
+      sizes.add((y_max - y_min, x_max - x_min))
+    if len(sizes) > 1:
+      raise ValueError(f"All regions need to have the same size, but got {sorted(sizes)}.")
+    return {frame_nr: tuple(regions[frame_nr]) for frame_nr in frames}
+
+  def _check_region_resolution(self):
+    """Regions are given in pixels of scene.resolution and can't be combined with scaling."""
+    resolution_percentage = self.blender_scene.render.resolution_percentage
+    if resolution_percentage != 100:
+      raise ValueError("Rendering a region requires a resolution_percentage of 100, but got "
+                       f"{resolution_percentage}.")
+
+  def _set_render_border(self, region: Optional[Region]):
+    """Restricts rendering to region (or disables border rendering for None)."""
+    render_settings = self.blender_scene.render
+    if region is None:
+      render_settings.use_border = False
+      render_settings.use_crop_to_border = False
+      return
+    width, height = self.scene.resolution
+    y_min, x_min, y_max, x_max = region
+    # Blender uses normalized border coordinates with the y-axis pointing up
+    render_settings.border_min_x = x_min / width
+    render_settings.border_max_x = x_max / width
+    render_settings.border_min_y = 1. - y_max / height
+    render_settings.border_max_y = 1. - y_min / height
+    render_settings.use_border = True
+    render_settings.use_crop_to_border = True
+
+  def render_multiview(
+      self,
+      cameras: Sequence[core.Camera],
+      frames: Optional[Sequence[int]] = None,
+      ignore_missing_textures: bool = False,
+      return_layers: Sequence[str] = ("rgba", "backward_flow", "forward_flow", "depth",
+                                      "normal", "object_coordinates", "segmentation"),
+      region: Union[Region, Dict[int, Region], None] = None,
+  ) -> Dict[str, Dict[str, np.ndarray]]:
+    """Renders the scene from several cameras and returns one dict of arrays per camera.
+
+    This is equivalent to calling `render` once per camera (including the render cache, regions
+    and the static scene fast path), except that each frame is evaluated only once and then
+    rendered from all cameras. Persistent render data is enabled while rendering, so that Cycles
+    can reuse the scene geometry (BVH) across views of the same frame.
+    The outputs of each camera are written to scratch_dir / camera.uid and post-processed as by
+    `render` (with the camera as scene.camera).
 
-    # --- post process the rendered frames
-    return self.postprocess(self.scratch_dir, return_layers=return_layers)
+    Args:
+      cameras: the cameras to render from (they need to be part of the scene).
+      frames: list of frames to render (defaults to range(scene.frame_start, scene.frame_end+1)).
+      ignore_missing_textures: if False then raise a RuntimeError when missing textures are
+        detected. Otherwise, proceed to render (with purple color instead of missing texture).
+      return_layers: list of layers to return (see `render`).
+      region: the image region(s) to render for all cameras (see `render`).
+
+    Returns:
+      A dictionary {camera.uid: layers} where layers is in the format returned by `render`.
+    """
+    for camera in cameras:
+      if self not in camera.linked_objects:
+        raise ValueError(f"{camera!r} is not part of the scene.")
+    if len({camera.uid for camera in cameras}) != len(cameras):
+      raise ValueError("Each camera can only be rendered once.")
+    results = self._render_views(cameras, frames, ignore_missing_textures, return_layers, region)
+    return {camera.uid: layers for camera, layers in zip(cameras, results)}
+
+  def preview_pass(
+      self,
+      frames: Optional[Sequence[int]] = None,
+      resolution_percentage: int = 25,
+      return_layers: Sequence[str] = ("segmentation", "depth"),
+  ) -> Dict[str, np.ndarray]:
+    """Cheaply renders a low resolution preview of the annotation layers.
+
+    Uses 1 sample per pixel, no denoising and a fraction of the resolution, which makes it a small
+    fraction of the cost of a full render. This is intended for rejecting bad scenes (e.g. with
+    too few visible objects) before the full render (see `check_preview`).
+    All render settings are restored afterwards.
+
+    Args:
+      frames: list of frames to render (defaults to range(scene.frame_start, scene.frame_end+1)).
+      resolution_percentage: the preview resolution in percent of scene.resolution.
+      return_layers: list of layers to return (see `render`).
+
+    Returns:
+      A dictionary with one entry for each return layer in the format returned by `render`
+      (but at the preview resolution).
+    """
+    if frames is None:
+      frames = range(self.scene.frame_start, self.scene.frame_end + 1)
+    if self.annotation_backend == "rasterizer":
+      # the annotations do not need Cycles at all
+      resolution = self._output_resolution(resolution_percentage)
+      source_layers = [rasterizer.rasterize_frame(self.scene, frame_nr, resolution=resolution)
+                       for frame_nr in frames]
+      return {key: np.stack([self.post_processors[key](layers, self.scene)
+                             for layers in source_layers], axis=0)
+              for key in return_layers}
+
+    render_settings = self.blender_scene.render
+    settings = (self.scratch_dir, self.samples_per_pixel, self.use_denoising,
+                self.adaptive_sampling, render_settings.resolution_percentage)
+    preview_dir = self.scratch_dir / "preview"
+    shutil.rmtree(preview_dir, ignore_errors=True)
+    try:
+      self.scratch_dir = preview_dir
+      self.samples_per_pixel = 1
+      self.use_denoising = False
+      self.adaptive_sampling = False
+      render_settings.resolution_percentage = resolution_percentage
+      return self.render(frames=frames, ignore_missing_textures=True,
+                         return_layers=return_layers)
+    finally:
+      (self.scratch_dir, self.samples_per_pixel, self.use_denoising,
+       self.adaptive_sampling, render_settings.resolution_percentage) = settings
+
+  def check_preview(self, predicate: PreviewPredicate, **preview_kwargs) -> bool:
+    """Renders a preview (see `preview_pass`) and decides whether the scene is worth rendering.
+
+    The number of checked and rejected scenes (i.e. avoided full renders) is counted in
+    `preview_statistics`.
+
+    Args:
+      predicate: a function (preview_layers, scene) -> bool that returns True to accept the scene.
+        See for example `kubric.post_processing.min_visible_foreground_objects`.
+      **preview_kwargs: passed on to `preview_pass`.
+
+    Returns:
+      Whether the scene was accepted.
+    """
+    accepted = bool(predicate(self.preview_pass(**preview_kwargs), self.scene))
+    self.preview_statistics["checked"] += 1
+    if not accepted:
+      self.preview_statistics["rejected"] += 1
+    logger.info("Preview %s the scene (%d of %d checked scenes rejected so far).",
+                "accepted" if accepted else "rejected",
+                self.preview_statistics["rejected"], self.preview_statistics["checked"])
+    return accepted
 
   def _check_missing_textures(self):
     missing_textures = sorted({img.filepath for img in bpy.data.images
@@ -310,6 +866,7 @@ class Blender(core.View):
       return_layers: Sequence[str] = ("rgba", "backward_flow", "forward_flow",
                                       "depth", "normal", "object_coordinates",
                                       "segmentation"),
+      region: Optional[Region] = None,
   ):
     """Render a single frame (first frame by default).
 
@@ -320,6 +877,7 @@ class Blender(core.View):
     return_layers: list of layers to return. For possible values refer to
       the Blender.post_processors dict. Defaults to ("backward_flow",
       "forward_flow", "depth", "normal", "object_coordinates", "segmentation").
+    region: only render this image region (y_min, x_min, y_max, x_max) (see `render`).
     Returns:
     A dictionary with one entry for each return layer. By default:
         - "rgba": shape = (height, width, 4)
@@ -334,33 +892,116 @@ class Blender(core.View):
 
     result = self.render(frames=[frame],
                          ignore_missing_textures=ignore_missing_textures,
-                         return_layers=return_layers)
+                         return_layers=return_layers,
+                         region=region)
     return {k: v[0] for k, v in result.items()}
 
   def postprocess(
       self,
       from_dir: PathLike,
-      return_layers: Sequence[str]):
+      return_layers: Sequence[str],
+      region: Optional[Dict[int, Region]] = None,
+      frames: Optional[Sequence[int]] = None):
 
     from_dir = kb.as_path(from_dir)
-    # --- collect all layers for all frames
+    if region is not None:
+      self._check_region_resolution()
+    # --- collect all layers for all frames (or only for the given frames)
     data_stack = collections.defaultdict(list)
     exr_frames = sorted((from_dir / "exr").glob("*.exr"))
+    if frames is not None:
+      frames = set(frames)
+      exr_frames = [exr_filename for exr_filename in exr_frames
+                    if int(exr_filename.stem.rpartition("_")[2]) in frames]
     png_frames = [from_dir / "images" / (exr_filename.stem + ".png")
                   for exr_filename in exr_frames]
 
-    for exr_filename, png_filename in zip(exr_frames, png_frames):
-      source_layers = blender_utils.get_render_layers_from_exr(exr_filename)
-      # Use the contrast-normalized PNG instead of the EXR for RGBA.
-      source_layers["rgba"] = file_io.read_png(png_filename)
-
+    frame_nrs = [int(exr_filename.stem.rpartition("_")[2]) for exr_filename in exr_frames]
+
+    profile = self.last_render_profile
+    resolution = self._output_resolution()
+    all_source_layers = []
+    for exr_filename, png_filename, frame_nr in zip(exr_frames, png_frames, frame_nrs):
+      with profile.span("postprocess/exr_decode", frame=frame_nr):
+        source_layers = blender_utils.get_render_layers_from_exr(exr_filename)
+        half_exr_filename = (exr_filename.parent / blender_utils.HALF_FLOAT_EXR_DIR /
+                             exr_filename.name)
+        if half_exr_filename.exists():
+          source_layers.update(blender_utils.get_render_layers_from_exr(half_exr_filename))
+      if self.rgba_source == "exr":
+        with profile.span("postprocess/tonemap", frame=frame_nr):
+          source_layers["rgba"] = self._tonemap(source_layers["linear_rgba"])
+      else:
+        # Use the contrast-normalized PNG instead of the EXR for RGBA.
+        with profile.span("postprocess/png_decode", frame=frame_nr):
+          source_layers["rgba"] = file_io.read_png(png_filename)
+      if self.annotation_backend == "rasterizer":
+        with profile.span("postprocess/rasterizer", frame=frame_nr):
+          raster_layers = rasterizer.rasterize_frame(self.scene, frame_nr, resolution=resolution)
+        if region is not None:
+          y_min, x_min, y_max, x_max = region[frame_nr]
+          raster_layers = {k: v[y_min:y_max, x_min:x_max] for k, v in raster_layers.items()}
+        source_layers.update(raster_layers)
+      if region is not None:
+        source_layers["region"] = region[frame_nr]
+      all_source_layers.append(source_layers)
+
+    if (self.annotation_backend == "cycles" and self._use_analytic_flow() and
+        {"backward_flow", "forward_flow"} & set(return_layers)):
+      with profile.span("postprocess/analytic_flow"):
+        self._add_analytic_flow(all_source_layers, frame_nrs)
+
+    for source_layers, frame_nr in zip(all_source_layers, frame_nrs):
       for key in return_layers:
         post_processor = self.post_processors[key]
-        data_stack[key].append(post_processor(source_layers, self.scene))
+        with profile.span(f"postprocess/{key}", frame=frame_nr):
+          data_stack[key].append(post_processor(source_layers, self.scene))
 
     return {key: np.stack(data_stack[key], axis=0)
             for key in data_stack}
 
+  def _tonemap(self, linear_rgba: np.ndarray) -> np.ndarray:
+    """Converts the EXR Image layer to the RGBA values Blender would write to the PNG."""
+    view_settings = self.blender_scene.view_settings
+    if (view_settings.view_transform != "Standard" or view_settings.look != "None" or
+        view_settings.use_curve_mapping or
+        self.blender_scene.display_settings.display_device != "sRGB"):
+      raise ValueError("rgba_source='exr' only supports the 'Standard' view transform on an sRGB "
+                       "display (without look or curve mapping).")
+    image_settings = self.blender_scene.render.image_settings
+    return post_processing.tonemap_linear_rgba(linear_rgba,
+                                               exposure=view_settings.exposure,
+                                               gamma=view_settings.gamma,
+                                               bit_depth=int(image_settings.color_depth))
+
+  def _use_analytic_flow(self) -> bool:
+    """Whether the flow is computed analytically (instead of by the Vector pass).
+
+    That is the case for flow_backend="analytic", unless the meshes of some objects cannot be
+    loaded by the rasterizer (e.g. fbx or blend files), in which case the Vector pass is used.
+    """
+    if self.flow_backend != "analytic":
+      return False
+    return all(rasterizer.is_rasterizable(asset) for asset in self.scene.assets
+               if rasterizer.is_drawable(asset))
+
+  def _add_analytic_flow(self, all_source_layers, frame_nrs):
+    """Computes the flow of all frames at once and adds it to the (raw) source layers."""
+    assets = [asset for asset in self.scene.assets if rasterizer.is_drawable(asset)]
+    hashes = np.stack([layers["segmentation_indices"][..., :1] for layers in all_source_layers])
+    segmentation = np.zeros(hashes.shape, dtype=np.int64)
+    for i, asset in enumerate(assets, start=1):
+      segmentation[hashes == post_processing.mm3hash(asset.uid)] = i
+    object_coordinates = np.stack([layers["object_coordinates"] for layers in all_source_layers])
+
+    backward_flow, forward_flow = optical_flow.compute_optical_flow(
+        object_coordinates, segmentation, self.scene, frame_nrs, assets,
+        [rasterizer.get_mesh(asset, self._lod_filename(asset)).bounds for asset in assets],
+        resolution=self._output_resolution())
+    for layers, backward, forward in zip(all_source_layers, backward_flow, forward_flow):
+      layers["backward_flow"] = backward
+      layers["forward_flow"] = forward
+
   @staticmethod
   def clear_and_reset_blender_scene(verbose: bool = False, custom_scene: str = None):
     """ Resets Blender to an entirely empty scene (or a custom one)."""
@@ -383,7 +1024,8 @@ class Blender(core.View):
         if isinstance(blender_obj, bpy.types.Object):
           bpy.data.objects.remove(blender_obj, do_unlink=True)
         elif isinstance(blender_obj, bpy.types.Material):
-          bpy.data.materials.remove(blender_obj, do_unlink=True)
+          if not self._release_material(asset):
+            bpy.data.materials.remove(blender_obj, do_unlink=True)
         else:
           raise NotImplementedError(f"Cannot remove {asset!r}")
       except ReferenceError:
@@ -421,16 +1063,83 @@ class Blender(core.View):
   def _add_asset(self, obj: core.FileBasedObject):
     if obj.render_filename is None:
       return None  # if there is no render file, then ignore this object
-    _, _, extension = obj.render_filename.rpartition(".")
+    blender_obj = self._import_render_file(obj, obj.render_filename)
+
+    register_object3d_setters(obj, blender_obj)
+    obj.observe(AttributeSetter(blender_obj, "active_material",
+                                converter=self._convert_to_blender_object), "material")
+    obj.observe(AttributeSetter(blender_obj, "scale"), "scale")
+    obj.observe(KeyframeSetter(blender_obj, "scale"), "scale", type="keyframe")
+    return blender_obj
+
+  def _update_lods(self, frames: Sequence[int],
+                   cameras: Optional[Sequence[core.Camera]] = None):
+    """Swaps the render meshes of objects to the coarsest adequate LOD (see `lod_max_error`)."""
+    if self.lod_max_error is None:
+      return
+    cameras = [self.scene.camera] if cameras is None else cameras
+    cameras = [camera for camera in cameras if isinstance(camera, core.PerspectiveCamera)]
+    render_settings = self.blender_scene.render
+    resolution = (render_settings.resolution_x * render_settings.resolution_percentage / 100,
+                  render_settings.resolution_y * render_settings.resolution_percentage / 100)
+    for asset in self.scene.assets:
+      if (not isinstance(asset, core.FileBasedObject) or self not in asset.linked_objects or
+          not asset.metadata.get("lods") or asset.use_parenting_instead_of_join):
+        continue
+      level = 0
+      if cameras:
+        level = lod.select_lod(asset, asset.metadata["lods"], cameras, frames, resolution,
+                               max_error=self.lod_max_error)
+      if self._lod_levels.get(asset.uid, 0) != level:
+        self._set_lod(asset, level)
+
+  def _lod_filename(self, asset: core.Asset, level: Optional[int] = None) -> Optional[str]:
+    """The render file of the given (defaults to the current) LOD level of an asset."""
+    if not isinstance(asset, core.FileBasedObject):
+      return None
+    level = self._lod_levels.get(asset.uid, 0) if level is None else level
+    if level == 0:
+      return asset.render_filename
+    return os.path.join(os.path.dirname(asset.render_filename),
+                        asset.metadata["lods"][level - 1]["filename"])
+
+  def _set_lod(self, asset: core.FileBasedObject, level: int):
+    """Replaces the mesh data of an object by the given LOD level of its render file."""
+    with self.last_render_profile.span("lod/import", level=level, asset=asset.uid):
+      render_filename = self._lod_filename(asset, level)
+      blender_obj = asset.linked_objects[self]
+      lod_obj = self._import_render_file(asset, render_filename)
+      old_mesh, new_mesh = blender_obj.data, lod_obj.data
+      bpy.data.objects.remove(lod_obj, do_unlink=True)
+      if len(old_mesh.materials) == len(new_mesh.materials):
+        # keep the (possibly modified) materials and avoid loading the textures again
+        imported_materials = list(new_mesh.materials)
+        for i, material in enumerate(old_mesh.materials):
+          new_mesh.materials[i] = material
+        for material in imported_materials:
+          if material is not None and material.users == 0:
+            bpy.data.materials.remove(material)
+      blender_obj.data = new_mesh
+      if old_mesh.users == 0:
+        bpy.data.meshes.remove(old_mesh)
+    material = getattr(asset, "material", None)
+    if isinstance(material, core.Material) and self in material.linked_objects:
+      blender_obj.active_material = material.linked_objects[self]
+    self._lod_levels[asset.uid] = level
+    logger.info("Using LOD %d for %s", level, asset.uid)
+
+  def _import_render_file(self, obj: core.FileBasedObject, render_filename: str):
+    """Imports a render file of obj and returns the (selected) resulting Blender object."""
+    _, _, extension = render_filename.rpartition(".")
     with RedirectStream(stream=sys.stdout, disabled=self.verbose):  # reduce the logging noise
       with io.StringIO() as fstdout:  # < scratch stdout buffer
         with redirect_stdout(fstdout):  # < also suppresses python stdout
           if extension == "obj":
-            bpy.ops.import_scene.obj(filepath=obj.render_filename,
+            bpy.ops.import_scene.obj(filepath=render_filename,
                                      use_split_objects=False,
                                      **obj.render_import_kwargs)
           elif extension in ["glb", "gltf"]:
-            bpy.ops.import_scene.gltf(filepath=obj.render_filename,
+            bpy.ops.import_scene.gltf(filepath=render_filename,
                                       **obj.render_import_kwargs)
 
             # Apply all transforms on objects before subselecting the mesh.
@@ -482,10 +1191,10 @@ class Blender(core.View):
               bpy.ops.object.transform_apply(location=False, rotation=True, scale=False)
 
           elif extension == "fbx":
-            bpy.ops.import_scene.fbx(filepath=obj.render_filename,
+            bpy.ops.import_scene.fbx(filepath=render_filename,
                                      **obj.render_import_kwargs)
           elif extension in ["x3d", "wrl"]:
-            bpy.ops.import_scene.x3d(filepath=obj.render_filename,
+            bpy.ops.import_scene.x3d(filepath=render_filename,
                                      **obj.render_import_kwargs)
 
           elif extension == "blend":
@@ -506,11 +1215,6 @@ class Blender(core.View):
     if hasattr(blender_obj.data, "use_auto_smooth"):
       blender_obj.data.use_auto_smooth = False
 
-    register_object3d_setters(obj, blender_obj)
-    obj.observe(AttributeSetter(blender_obj, "active_material",
-                                converter=self._convert_to_blender_object), "material")
-    obj.observe(AttributeSetter(blender_obj, "scale"), "scale")
-    obj.observe(KeyframeSetter(blender_obj, "scale"), "scale", type="keyframe")
     return blender_obj
 
   @add_asset.register(core.DirectionalLight)
@@ -617,89 +1321,129 @@ class Blender(core.View):
     return camera_obj
 
   @add_asset.register(core.PrincipledBSDFMaterial)
-  @blender_utils.prepare_blender_object
   def _add_asset(self, obj: core.PrincipledBSDFMaterial):
-    mat = bpy.data.materials.new(obj.uid)
-    mat.use_nodes = True
-    bsdf_node = mat.node_tree.nodes["Principled BSDF"]
+    def new_material():
+      mat = bpy.data.materials.new(obj.uid)
+      mat.use_nodes = True
+      return mat
 
-    obj.observe(AttributeSetter(bsdf_node.inputs["Base Color"], "default_value"), "color")
-    obj.observe(KeyframeSetter(bsdf_node.inputs["Base Color"], "default_value"), "color",
-                type="keyframe")
-    obj.observe(AttributeSetter(bsdf_node.inputs["Roughness"], "default_value"), "roughness")
-    obj.observe(KeyframeSetter(bsdf_node.inputs["Roughness"], "default_value"), "roughness",
-                type="keyframe")
-    obj.observe(AttributeSetter(bsdf_node.inputs["Metallic"], "default_value"), "metallic")
-    obj.observe(KeyframeSetter(bsdf_node.inputs["Metallic"], "default_value"), "metallic",
-                type="keyframe")
-    obj.observe(AttributeSetter(bsdf_node.inputs["Specular"], "default_value"), "specular")
-    obj.observe(KeyframeSetter(bsdf_node.inputs["Specular"], "default_value"), "specular",
-                type="keyframe")
-    obj.observe(AttributeSetter(bsdf_node.inputs["Specular Tint"],
-                                "default_value"), "specular_tint")
-    obj.observe(KeyframeSetter(bsdf_node.inputs["Specular Tint"], "default_value"), "specular_tint",
-                type="keyframe")
-    obj.observe(AttributeSetter(bsdf_node.inputs["IOR"], "default_value"), "ior")
-    obj.observe(KeyframeSetter(bsdf_node.inputs["IOR"], "default_value"), "ior",
-                type="keyframe")
-    obj.observe(AttributeSetter(bsdf_node.inputs["Transmission"], "default_value"), "transmission")
-    obj.observe(KeyframeSetter(bsdf_node.inputs["Transmission"], "default_value"), "transmission",
-                type="keyframe")
-    obj.observe(AttributeSetter(bsdf_node.inputs["Transmission Roughness"], "default_value"),
-                "transmission_roughness")
-    obj.observe(KeyframeSetter(bsdf_node.inputs["Transmission Roughness"], "default_value"),
-                "transmission_roughness", type="keyframe")
-    obj.observe(AttributeSetter(bsdf_node.inputs["Emission"], "default_value"), "emission")
-    obj.observe(KeyframeSetter(bsdf_node.inputs["Emission"], "default_value"), "emission",
-                type="keyframe")
-    return mat
+    sockets = {trait_name: [("Principled BSDF", input_name)]
+               for trait_name, input_name in _PRINCIPLED_BSDF_INPUTS.items()}
+    return self._add_material(obj, new_material, sockets)
 
   @add_asset.register(core.FlatMaterial)
-  @blender_utils.prepare_blender_object
   def _add_asset(self, obj: core.FlatMaterial):
-    # --- Create node-based material
-    mat = bpy.data.materials.new("Holdout")
-    mat.use_nodes = True
-    tree = mat.node_tree
-    tree.nodes.remove(tree.nodes["Principled BSDF"])  # remove the default shader
-
-    output_node = tree.nodes["Material Output"]
-
-    # This material is constructed from three different shaders:
-    #  1. if holdout=False then emission_node is responsible for giving the object a uniform color
-    #  2. if holdout=True, then the holdout_node is responsible for making the object transparent
-    #  3. if indirect_visibility=False then transparent_node makes the node invisible for indirect
-    #     effects such as shadows or reflections
-
-    light_path_node = tree.nodes.new(type="ShaderNodeLightPath")
-    holdout_node = tree.nodes.new(type="ShaderNodeHoldout")
-    transparent_node = tree.nodes.new(type="ShaderNodeBsdfTransparent")
-    holdout_mix_node = tree.nodes.new(type="ShaderNodeMixShader")
-    indirect_mix_node = tree.nodes.new(type="ShaderNodeMixShader")
-    overall_mix_node = tree.nodes.new(type="ShaderNodeMixShader")
-
-    emission_node = tree.nodes.new(type="ShaderNodeEmission")
-
-    tree.links.new(transparent_node.outputs["BSDF"], indirect_mix_node.inputs[1])
-    tree.links.new(emission_node.outputs["Emission"], indirect_mix_node.inputs[2])
-    tree.links.new(emission_node.outputs["Emission"], holdout_mix_node.inputs[1])
-    tree.links.new(holdout_node.outputs["Holdout"], holdout_mix_node.inputs[2])
-    tree.links.new(light_path_node.outputs["Is Camera Ray"], overall_mix_node.inputs["Fac"])
-    tree.links.new(indirect_mix_node.outputs["Shader"], overall_mix_node.inputs[1])
-    tree.links.new(holdout_mix_node.outputs["Shader"], overall_mix_node.inputs[2])
-    tree.links.new(overall_mix_node.outputs["Shader"], output_node.inputs["Surface"])
-
-    obj.observe(AttributeSetter(emission_node.inputs["Color"], "default_value"), "color")
-    obj.observe(KeyframeSetter(emission_node.inputs["Color"], "default_value"), "color",
-                type="keyframe")
-    obj.observe(AttributeSetter(holdout_mix_node.inputs["Fac"], "default_value"), "holdout")
-    obj.observe(KeyframeSetter(holdout_mix_node.inputs["Fac"], "default_value"), "holdout",
-                type="keyframe")
-    obj.observe(AttributeSetter(indirect_mix_node.inputs["Fac"], "default_value"),
-                "indirect_visibility")
-    obj.observe(KeyframeSetter(indirect_mix_node.inputs["Fac"], "default_value"),
-                "indirect_visibility", type="keyframe")
-    return mat
+    def new_material():
+      # --- Create node-based material
+      mat = bpy.data.materials.new(obj.uid)
+      mat.use_nodes = True
+      tree = mat.node_tree
+      tree.nodes.remove(tree.nodes["Principled BSDF"])  # remove the default shader
+
+      output_node = tree.nodes["Material Output"]
+
+      # This material is constructed from three different shaders:
+      #  1. if holdout=False then emission_node is responsible for giving the object a uniform
+      #     color
+      #  2. if holdout=True, then the holdout_node is responsible for making the object transparent
+      #  3. if indirect_visibility=False then transparent_node makes the node invisible for
+      #     indirect effects such as shadows or reflections
+
+      light_path_node = tree.nodes.new(type="ShaderNodeLightPath")
+      holdout_node = tree.nodes.new(type="ShaderNodeHoldout")
+      transparent_node = tree.nodes.new(type="ShaderNodeBsdfTransparent")
+      holdout_mix_node = tree.nodes.new(type="ShaderNodeMixShader")
+      holdout_mix_node.name = "Holdout Mix"
+      indirect_mix_node = tree.nodes.new(type="ShaderNodeMixShader")
+      indirect_mix_node.name = "Indirect Mix"
+      overall_mix_node = tree.nodes.new(type="ShaderNodeMixShader")
+
+      emission_node = tree.nodes.new(type="ShaderNodeEmission")
+      emission_node.name = "Emission"
+
+      tree.links.new(transparent_node.outputs["BSDF"], indirect_mix_node.inputs[1])
+      tree.links.new(emission_node.outputs["Emission"], indirect_mix_node.inputs[2])
+      tree.links.new(emission_node.outputs["Emission"], holdout_mix_node.inputs[1])
+      tree.links.new(holdout_node.outputs["Holdout"], holdout_mix_node.inputs[2])
+      tree.links.new(light_path_node.outputs["Is Camera Ray"], overall_mix_node.inputs["Fac"])
+      tree.links.new(indirect_mix_node.outputs["Shader"], overall_mix_node.inputs[1])
+      tree.links.new(holdout_mix_node.outputs["Shader"], overall_mix_node.inputs[2])
+      tree.links.new(overall_mix_node.outputs["Shader"], output_node.inputs["Surface"])
+      return mat
+
+    sockets = {
+        "color": [("Emission", "Color")],
+        "holdout": [("Holdout Mix", "Fac")],
+        "indirect_visibility": [("Indirect Mix", "Fac")],
+    }
+    return self._add_material(obj, new_material, sockets)
+
+  def _add_material(self, asset: core.Material, new_material: Callable[[], Any],
+                    sockets: Dict[str, Sequence[Tuple[str, str]]]):
+    """Returns a Blender material for the given kubric material (sharing it if possible).
+
+    Kubric materials of the same type with identical (and non-animated) trait values share a
+    single Blender material, which avoids building and compiling the same node tree many times.
+    A shared material is copied (copy-on-write) as soon as one of its users changes or
+    keyframes one of its traits (see `MaterialBinding`).
+
+    Args:
+      asset: the kubric material.
+      new_material: creates a new (node-based) Blender material.
+      sockets: {trait_name: [(node_name, input_name), ...]} the node inputs controlled by each
+        trait of the kubric material.
+
+    Returns:
+      The (possibly shared) Blender material.
+    """
+    key = None
+    if self.share_materials and not any(asset.keyframes.values()):
+      key = _material_key(asset, sockets)
+
+    if key in self._shared_materials:
+      binding = MaterialBinding(self, asset, self._shared_materials[key], sockets, key)
+      self.material_statistics["shared"] += 1
+    else:
+      binding = MaterialBinding(self, asset, new_material(), sockets, key)
+      binding.material.name = asset.uid
+      binding.set_all_values()
+      self.material_statistics["created"] += 1
+      if key is not None:
+        self._shared_materials[key] = binding.material
+    self._material_bindings[asset.uid] = binding
+
+    asset.observe(binding.on_change, list(sockets))
+    asset.observe(binding.on_keyframe, list(sockets), type="keyframe")
+    return binding.material
+
+  def _material_users(self) -> Dict[Any, int]:
+    return collections.Counter(binding.key for binding in self._material_bindings.values())
+
+  def _make_material_exclusive(self, binding: "MaterialBinding"):
+    """Gives a kubric material its own copy of a shared Blender material."""
+    if binding.key is None:
+      return  # already exclusive
+    if self._material_users()[binding.key] > 1:
+      binding.material = binding.material.copy()
+      binding.material.name = binding.asset.uid
+      binding.asset.linked_objects[self] = binding.material
+      for asset in self.scene.assets:
+        if getattr(asset, "material", None) is binding.asset and self in asset.linked_objects:
+          asset.linked_objects[self].active_material = binding.material
+      self.material_statistics["split"] += 1
+    else:  # the only user takes over the shared material
+      del self._shared_materials[binding.key]
+    binding.key = None
+
+  def _release_material(self, asset: core.Material) -> bool:
+    """Unregisters a kubric material and returns whether its Blender material is still in use."""
+    binding = self._material_bindings.pop(asset.uid, None)
+    if binding is None or binding.key is None:
+      return False
+    if self._material_users()[binding.key]:
+      return True
+    del self._shared_materials[binding.key]
+    return False
 
   def _setup_scene_shading(self):
     self.blender_scene.world.use_nodes = True
@@ -753,13 +1497,14 @@ class Blender(core.View):
     # disconnect incoming links from hdri node (if any)
     for link in self.ambient_node.inputs["Color"].links:
       self.blender_scene.world.node_tree.links.remove(link)
+    self._hdri_filepaths.pop(self.ambient_hdri_node.name, None)
     self.ambient_node.inputs["Color"].default_value = color
 
   def _set_ambient_light_hdri(self, hdri_filepath=None, hdri_rotation=(0., 0., 0.), strength=1.0):
     # ensure hdri_node is connected
     self.blender_scene.world.node_tree.links.new(self.ambient_hdri_node.outputs.get("Color"),
                                                  self.ambient_node.inputs.get("Color"))
-    self.ambient_hdri_node.image = bpy.data.images.load(hdri_filepath, check_existing=True)
+    self._set_hdri_image(self.ambient_hdri_node, hdri_filepath)
     self.ambient_node.inputs["Strength"].default_value = strength
 
     self.illum_mapping_node.inputs.get("Rotation").default_value = hdri_rotation
@@ -768,6 +1513,7 @@ class Blender(core.View):
     # disconnect incoming links from hdri node (if any)
     for link in self.bg_node.inputs["Color"].links:
       self.blender_scene.world.node_tree.links.remove(link)
+    self._hdri_filepaths.pop(self.bg_hdri_node.name, None)
     # set color
     self.bg_node.inputs["Color"].default_value = color
 
@@ -775,9 +1521,39 @@ class Blender(core.View):
     # ensure hdri_node is connected
     self.blender_scene.world.node_tree.links.new(self.bg_hdri_node.outputs.get("Color"),
                                                  self.bg_node.inputs.get("Color"))
-    self.bg_hdri_node.image = bpy.data.images.load(hdri_filepath, check_existing=True)
+    self._set_hdri_image(self.bg_hdri_node, hdri_filepath)
     self.bg_mapping_node.inputs.get("Rotation").default_value = hdri_rotation
 
+  def _set_hdri_image(self, node, hdri_filepath: PathLike):
+    self._hdri_filepaths[node.name] = str(hdri_filepath)
+    if not self.select_hdri_variant:
+      node.image = _load_hdri_image(str(hdri_filepath), use_cache=self.cache_hdri_images)
+    # otherwise the variant is chosen by _update_hdri_images once the camera is known
+
+  def _update_hdri_images(self, cameras: Optional[Sequence[core.Camera]] = None):
+    """Loads the smallest adequate variant of each environment map (see `kubric.renderer.hdri`).
+
+    Args:
+      cameras: the cameras that will be rendered from (defaults to the scene camera).
+    """
+    if not self.select_hdri_variant:
+      return
+    cameras = [self.scene.camera] if cameras is None else cameras
+    fields_of_view = [camera.field_of_view for camera in cameras
+                      if isinstance(camera, core.PerspectiveCamera)]
+    render_settings = self.blender_scene.render
+    resolution_x = render_settings.resolution_x * render_settings.resolution_percentage / 100
+    nodes = self.blender_scene.world.node_tree.nodes
+    for node_name, filepath in self._hdri_filepaths.items():
+      if fields_of_view:
+        filepath = hdri.select_mip_variant(filepath, min(fields_of_view), resolution_x)
+      image = _load_hdri_image(filepath, use_cache=self.cache_hdri_images)
+      previous_image = nodes[node_name].image
+      if previous_image != image:
+        nodes[node_name].image = image
+        if previous_image is not None and previous_image.users == 0:
+          bpy.data.images.remove(previous_image)
+
   def _convert_to_blender_object(self, asset: core.Asset):
     return asset.linked_objects[self]
 
@@ -810,7 +1586,132 @@ class KeyframeSetter:
     self.blender_obj = blender_obj
 
   def __call__(self, change):
-    self.blender_obj.keyframe_insert(self.attribute_path, frame=change.frame)
+    if "frames" in change:
+      self._insert_many(change.frames, change.values)
+    else:
+      self.blender_obj.keyframe_insert(self.attribute_path, frame=change.frame)
+
+  def _insert_many(self, frames, values):
+    """Writes the keyframes of a whole trajectory directly into the F-curves."""
+    if not frames:
+      return
+    # the first keyframe is inserted as usual, to create the action and F-curves as needed
+    self.blender_obj.keyframe_insert(self.attribute_path, frame=frames[0])
+    fcurves = self.blender_obj.animation_data.action.fcurves
+    values = np.asarray(values, dtype=np.float64).reshape(len(frames), -1)
+    for index in range(values.shape[1]):
+      fcurve = fcurves.find(self.attribute_path, index=index)
+      if fcurve is None:
+        continue
+      for frame, value in zip(frames, values[:, index]):
+        fcurve.keyframe_points.insert(frame, value, options={"FAST"})
+      fcurve.update()
+
+
+def _get_image_pixels(image) -> np.ndarray:
+  pixels = np.empty(len(image.pixels), dtype=np.float32)
+  image.pixels.foreach_get(pixels)
+  return pixels.reshape((image.size[1], image.size[0], image.channels))
+
+
+def _load_hdri_image(filepath: str, use_cache: bool = False):
+  """Loads an environment map.
+
+  Args:
+    filepath: the image file.
+    use_cache: whether to reuse the decoded pixels of previous scenes (see `hdri.IMAGE_CACHE`).
+  """
+  filepath = os.path.abspath(filepath)
+  for image in bpy.data.images:
+    if image.get(_SOURCE_FILEPATH_PROPERTY) == filepath:
+      return image  # already loaded in this scene
+
+  pixels = hdri.IMAGE_CACHE.get(filepath) if use_cache else None
+  if pixels is None:
+    image = bpy.data.images.load(filepath, check_existing=True)
+    if use_cache:
+      hdri.IMAGE_CACHE.put(filepath, _get_image_pixels(image))
+  else:
+    # Blender data is reset for every scene, but the decoded pixels are still cached
+    height, width, channels = pixels.shape
+    image = bpy.data.images.new(os.path.basename(filepath), width=width, height=height,
+                                alpha=channels == 4, float_buffer=True)
+    image.pixels.foreach_set(pixels.ravel())
+    # keep the file as reference (filepath_raw does not reload the image)
+    image.filepath_raw = filepath
+  image[_SOURCE_FILEPATH_PROPERTY] = filepath
+  return image
+
+
+def _restore_hdri_image_files():
+  """Turns the environment maps created from cached pixels back into images of their files.
+
+  Otherwise a saved .blend file would contain (or, without packing, lose) them as generated
+  images.
+  """
+  for image in bpy.data.images:
+    if _SOURCE_FILEPATH_PROPERTY in image and image.source == "GENERATED":
+      image.filepath_raw = image[_SOURCE_FILEPATH_PROPERTY]
+      image.source = "FILE"
+
+
+def _material_key(asset: core.Material, sockets: Dict[str, Any]):
+  """Interning key of a kubric material: its type and the values of its shader traits."""
+  return (type(asset).__name__,
+          tuple((name, tuple(np.ravel(np.asarray(getattr(asset, name), dtype=np.float64))))
+                for name in sorted(sockets)))
+
+
+class MaterialBinding:
+  """Connects the traits of a kubric material to the node inputs of a (shared) Blender material.
+
+  Replaces the AttributeSetter / KeyframeSetter observers for materials. As long as `key` is set,
+  the Blender material is shared with all other kubric materials with the same key and is copied
+  before the first change (or keyframe) that would otherwise affect those other materials.
+  """
+
+  def __init__(self, view: "Blender", asset: core.Material, material,
+               sockets: Dict[str, Sequence[Tuple[str, str]]], key=None):
+    self.view = view
+    self.asset = asset
+    self.material = material
+    self.sockets = sockets
+    self.key = key  # None for materials that are not shared
+
+  def _inputs(self, trait_name: str):
+    nodes = self.material.node_tree.nodes
+    return [nodes[node_name].inputs[input_name]
+            for node_name, input_name in self.sockets[trait_name]]
+
+  def _set_value(self, trait_name: str, value):
+    for node_input in self._inputs(trait_name):
+      node_input.default_value = value
+
+  def set_all_values(self):
+    for trait_name in self.sockets:
+      self._set_value(trait_name, getattr(self.asset, trait_name))
+
+  def on_change(self, change):
+    if isinstance(change.new, UndefinedAsset):
+      return  # ignore any Undefined values
+    if self.key is not None:
+      if _material_key(self.asset, self.sockets) == self.key:
+        return  # the shared material already has this value
+      self.view._make_material_exclusive(self)  # pylint: disable=protected-access
+    self._set_value(change.name, change.new)
+
+  def on_keyframe(self, change):
+    self.view._make_material_exclusive(self)  # pylint: disable=protected-access
+    if "frames" in change:
+      # the sockets are set to the value of each keyframe before inserting it
+      for frame, value in zip(change.frames, change.values):
+        self._set_value(change.name, value)
+        for node_input in self._inputs(change.name):
+          node_input.keyframe_insert("default_value", frame=frame)
+      self._set_value(change.name, getattr(self.asset, change.name))
+      return
+    for node_input in self._inputs(change.name):
+      node_input.keyframe_insert("default_value", frame=change.frame)
 
 
 def register_object3d_setters(obj, blender_obj):
@@ -21,11 +21,25 @@ from typing import Dict, Sequence, Tuple, Union
 import numpy as np
 import OpenEXR
 import Imath
-import sklearn.utils
 import trimesh
 
 from kubric import core
-from kubric.kubric_typing import AddAssetFunction, ArrayLike
+from kubric.kubric_typing import AddAssetFunction
+# pylint: disable=unused-import
+# the post-processors moved to kubric.post_processing (re-exported for backwards compatibility)
+from kubric.post_processing import mm3hash
+from kubric.post_processing import process_backward_flow
+from kubric.post_processing import process_depth
+from kubric.post_processing import process_forward_flow
+from kubric.post_processing import process_normal
+from kubric.post_processing import process_object_coordinates
+from kubric.post_processing import process_rgb
+from kubric.post_processing import process_rgba
+from kubric.post_processing import process_segementation
+from kubric.post_processing import process_uv
+from kubric.post_processing import process_z
+from kubric.post_processing import replace_cryptomatte_hashes_by_asset_index
+# pylint: enable=unused-import
 from kubric.redirect_io import RedirectStream
 from kubric.safeimport.bpy import bpy
 
@@ -64,15 +78,37 @@ def prepare_blender_object(func: AddAssetFunction) -> AddAssetFunction:
   return _func
 
 
+# subdirectory (of the EXR output directory) for the half-float EXR files
+HALF_FLOAT_EXR_DIR = "half"
+# layers that can be written as half-float without a significant loss of precision, since they
+# are quantized to 8 or 16 bit afterwards (or not used, in the case of Image)
+HALF_FLOAT_LAYERS = ("Image", "Normal", "UV", "ObjectCoordinates")
+
+
 def set_up_exr_output_node(default_layers=("Image", "Depth"),
                            aux_layers=("UV", "Normal", "CryptoObject00", "ObjectCoordinates"),
-                           motion_blur=None):
+                           motion_blur=None,
+                           optical_flow=True,
+                           half_float_layers=(),
+                           codec="ZIP",
+                           half_float_codec="ZIP"):
   """ Set up the blender compositor nodes required for exporting EXR files.
 
   The filename can then be set with:
   out_node.base_path = "my/custom/path/prefix_"
 
+  If optical_flow is False, then the "Vector" layer is not exported.
+
+  Blender uses the same precision for all layers of a multilayer EXR file. So the layers listed
+  in half_float_layers are written to a second (16 bit) multilayer EXR file by the output node
+  named "File Output Half", whose base_path has to be set separately (see
+  `Blender.set_exr_output_path`). Cryptomatte layers store hashes and have to remain float32.
+  The codecs are Blender EXR codecs, e.g. "ZIP", "PIZ" or (lossy) "DWAA".
   """
+  if motion_blur is not None and not optical_flow:
+    raise ValueError("motion_blur requires the optical_flow (Vector) pass.")
+  if any(layer_name.startswith("CryptoObject") for layer_name in half_float_layers):
+    raise ValueError("Cryptomatte layers need to be stored as float32.")
   bpy.context.scene.use_nodes = True
   tree = bpy.context.scene.node_tree
   links = tree.links
@@ -83,23 +119,47 @@ def set_up_exr_output_node(default_layers=("Image", "Depth"),
 
   # the render node has outputs for all the rendered layers
   render_node = tree.nodes.new(type="CompositorNodeRLayers")
-  render_node_aux = tree.nodes.new(type="CompositorNodeRLayers")
-  render_node_aux.name = "Render Layers Aux"
-  render_node_aux.layer = "AuxOutputs"
 
   # create a new FileOutput node
   out_node = tree.nodes.new(type="CompositorNodeOutputFile")
   # set the format to EXR (multilayer)
   out_node.format.file_format = "OPEN_EXR_MULTILAYER"
-
+  out_node.format.color_depth = "32"
+  out_node.format.exr_codec = codec
   out_node.file_slots.clear()
+
+  half_out_node = None
+  if half_float_layers:
+    half_out_node = tree.nodes.new(type="CompositorNodeOutputFile")
+    half_out_node.name = "File Output Half"
+    half_out_node.format.file_format = "OPEN_EXR_MULTILAYER"
+    half_out_node.format.color_depth = "16"
+    half_out_node.format.exr_codec = half_float_codec
+    half_out_node.file_slots.clear()
+
+  def output_node_for(layer_name):
+    return half_out_node if layer_name in half_float_layers else out_node
+
+  def add_slot(layer_name, socket):
+    node = output_node_for(layer_name)
+    node.file_slots.new(layer_name)
+    links.new(socket, node.inputs.get(layer_name))
+
   for layer_name in default_layers:
-    out_node.file_slots.new(layer_name)
-    links.new(render_node.outputs.get(layer_name), out_node.inputs.get(layer_name))
+    add_slot(layer_name, render_node.outputs.get(layer_name))
+
+  if not aux_layers and not optical_flow:
+    return out_node  # the aux view layer is not used
+
+  render_node_aux = tree.nodes.new(type="CompositorNodeRLayers")
+  render_node_aux.name = "Render Layers Aux"
+  render_node_aux.layer = "AuxOutputs"
 
   for layer_name in aux_layers:
-    out_node.file_slots.new(layer_name)
-    links.new(render_node_aux.outputs.get(layer_name), out_node.inputs.get(layer_name))
+    add_slot(layer_name, render_node_aux.outputs.get(layer_name))
+
+  if not optical_flow:
+    return out_node
 
   # manually convert to RGBA. See:
   # https://blender.stackexchange.com/questions/175621/incorrect-vector-pass-output-no-alpha-zero-values/175646#175646
@@ -107,9 +167,8 @@ def set_up_exr_output_node(default_layers=("Image", "Depth"),
   combine_rgba = tree.nodes.new(type="CompositorNodeCombRGBA")
   for channel in "RGBA":
     links.new(split_rgba.outputs.get(channel), combine_rgba.inputs.get(channel))
-  out_node.file_slots.new("Vector")
   links.new(render_node_aux.outputs.get("Vector"), split_rgba.inputs.get("Image"))
-  links.new(combine_rgba.outputs.get("Image"), out_node.inputs.get("Vector"))
+  add_slot("Vector", combine_rgba.outputs.get("Image"))
 
   if motion_blur is not None:
     assert isinstance(motion_blur, float), motion_blur
@@ -121,8 +180,9 @@ def set_up_exr_output_node(default_layers=("Image", "Depth"),
     links.new(render_node.outputs.get("Image"), motion_blur_node.inputs.get("Image"))
     links.new(render_node.outputs.get("Depth"), motion_blur_node.inputs.get("Z"))
     links.new(render_node_aux.outputs.get("Vector"), motion_blur_node.inputs.get("Speed"))
-    links.remove(out_node.inputs.get("Image").links[0])
-    links.new(motion_blur_node.outputs.get("Image"), out_node.inputs.get("Image"))
+    image_input = output_node_for("Image").inputs.get("Image")
+    links.remove(image_input.links[0])
+    links.new(motion_blur_node.outputs.get("Image"), image_input)
     links.new(motion_blur_node.outputs.get("Image"), composite_out.inputs.get("Image"))
 
   return out_node
@@ -156,18 +216,24 @@ def activate_render_passes(
     optical_flow: bool = True,
     segmentation: bool = True,
     uv: bool = True,
-    depth: bool = True
+    depth: bool = True,
+    aux_view_layer: bool = True,
 ):
 
   # We use two separate view layers
   # 1) the default view layer renders the image and uses many samples per pixel
   # 2) the aux view layer uses only 1 sample per pixel to avoid anti-aliasing
+  # If aux_view_layer is False, then the second view layer is not created at all
+  # (e.g. because the annotations are computed by the rasterizer instead).
 
   # Starting in Blender 3.0 the depth-pass must be activated separately
   if depth:
     default_view_layer = bpy.context.scene.view_layers[0]
     default_view_layer.use_pass_z = True
 
+  if not aux_view_layer:
+    return
+
   aux_view_layer = bpy.context.scene.view_layers.new("AuxOutputs")
   aux_view_layer.samples = 1  # only use 1 ray per pixel to disable anti-aliasing
   aux_view_layer.use_pass_z = False  # no need for a separate z-pass
@@ -272,40 +338,9 @@ def get_render_layers_from_exr(filename) -> Dict[str, np.ndarray]:
   if "ObjectCoordinates" in layer_names:
     output["object_coordinates"] = read_channels_from_exr(exr,
       ["ObjectCoordinates.R", "ObjectCoordinates.G", "ObjectCoordinates.B"])
-  return output
-
-
-def replace_cryptomatte_hashes_by_asset_index(
-    segmentation_ids: ArrayLike,
-    assets: Sequence[core.assets.Asset]):
-  """Replace (inplace) the cryptomatte hash (from Blender) by the index of each asset + 1.
-  (the +1 is to ensure that the 0 for background does not interfere with asset index 0)
-
-  Args:
-    segmentation_ids: Segmentation array of cryptomatte hashes as returned by Blender.
-    assets: List of assets to use for replacement.
-  """
-  # replace crypto-ids with asset index
-  new_segmentation_ids = np.zeros_like(segmentation_ids)
-  for idx, asset in enumerate(assets, start=1):
-    asset_hash = mm3hash(asset.uid)
-    if hasattr(asset, "segmentation_id") and asset.segmentation_id is not None:
-      uid = asset.segmentation_id
-    else:
-      uid = idx
-    new_segmentation_ids[segmentation_ids == asset_hash] = uid
-  return new_segmentation_ids
-
-
-def mm3hash(name):
-  """ Compute the uint32 hash that Blenders Cryptomatte uses.
-  https://github.com/Psyop/Cryptomatte/blob/master/specification/cryptomatte_specification.pdf
-  """
-  hash_32 = sklearn.utils.murmurhash3_32(name, positive=True)
-  exp = hash_32 >> 23 & 255
-  if exp in (0, 255):
-    hash_32 ^= 1 << 23
-  return hash_32
+  # convert half-float layers, such that post-processing (e.g. scaling to uint16) cannot overflow
+  return {key: value.astype(np.float32) if value.dtype == np.float16 else value
+          for key, value in output.items()}
 
 
 @contextlib.contextmanager
@@ -424,55 +459,3 @@ def center_mesh_around_center_of_mass(obj):
     vert.co[0] -= tmesh.center_mass[0]
     vert.co[1] -= tmesh.center_mass[1]
     vert.co[2] -= tmesh.center_mass[2]
-
-
-def process_depth(exr_layers, scene):
-  # blender returns z values (distance to camera plane)
-  # convert them into depth (distance to camera center)
-  return scene.camera.z_to_depth(exr_layers["depth"])
-
-
-def process_z(exr_layers, scene):  # pylint: disable=unused-argument
-  # blender returns z values (distance to camera plane)
-  return exr_layers["depth"]
-
-
-def process_backward_flow(exr_layers, scene):  # pylint: disable=unused-argument
-  return exr_layers["backward_flow"]
-
-
-def process_forward_flow(exr_layers, scene):  # pylint: disable=unused-argument
-  return exr_layers["forward_flow"]
-
-
-def process_uv(exr_layers, scene):  # pylint: disable=unused-argument
-  # convert range [0, 1] to uint16
-  return (exr_layers["uv"].clip(0.0, 1.0) * 65535).astype(np.uint16)
-
-
-def process_normal(exr_layers, scene):  # pylint: disable=unused-argument
-  # convert range [-1, 1] to uint16
-  return ((exr_layers["normal"].clip(-1.0, 1.0) + 1) * 65535 / 2
-          ).astype(np.uint16)
-
-
-def process_object_coordinates(exr_layers, scene):  # pylint: disable=unused-argument
-  # sometimes these values can become ever so slightly negative (e.g. 1e-10)
-  # we clip them to [0, 1] to guarantee this range for further processing.
-  return (exr_layers["object_coordinates"].clip(0.0, 1.0) * 65535
-          ).astype(np.uint16)
-
-
-def process_segementation(exr_layers, scene):  # pylint: disable=unused-argument
-  # map the Blender cryptomatte hashes to asset indices
-  return replace_cryptomatte_hashes_by_asset_index(
-      exr_layers["segmentation_indices"][:, :, :1], scene.assets)
-
-
-def process_rgba(exr_layers, scene):  # pylint: disable=unused-argument
-  # map the Blender cryptomatte hashes to asset indices
-  return exr_layers["rgba"]
-
-
-def process_rgb(exr_layers, scene):  # pylint: disable=unused-argument
-  return exr_layers["rgba"][..., :3]
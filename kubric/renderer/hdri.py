@@ -0,0 +1,154 @@
+# Copyright 2024 The Kubric Authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Resolution variants ("mips") of HDRI environment maps and a process-wide pixel cache.
+
+`kubric.scripts.download_hdri_haven` stores downscaled copies of every environment map next to
+the original (e.g. "environment_4k.mip1024.exr" for "environment_4k.hdr").
+With `Blender(..., select_hdri_variant=True)` the renderer then loads the smallest variant whose
+texel density is sufficient for the output resolution and field of view of the camera.
+With `Blender(..., cache_hdri_images=True)` the decoded pixels are kept in `IMAGE_CACHE`, so that
+subsequent scenes of a warm process do not need to read and decode the same files again.
+This module does not depend on bpy.
+"""
+
+import collections
+import logging
+import os
+import pathlib
+import re
+from typing import Callable, Dict, Optional
+
+import numpy as np
+
+from kubric.kubric_typing import PathLike
+
+logger = logging.getLogger(__name__)
+
+# widths (in pixels) of the variants generated by default
+MIP_WIDTHS = (1024, 2048)
+
+
+def mip_variant_path(filename: PathLike, width: int) -> pathlib.Path:
+  """The path of the variant of an environment map that is `width` pixels wide."""
+  path = pathlib.Path(filename)
+  return path.with_name(f"{path.stem}.mip{width}.exr")
+
+
+def find_mip_variants(filename: PathLike) -> Dict[int, pathlib.Path]:
+  """Returns all existing variants of an environment map as {width: path}."""
+  path = pathlib.Path(filename)
+  pattern = re.compile(re.escape(path.stem) + r"\.mip(\d+)\.exr")
+  variants = {}
+  for candidate in path.parent.glob(f"{path.stem}.mip*.exr"):
+    match = pattern.fullmatch(candidate.name)
+    if match:
+      variants[int(match.group(1))] = candidate
+  return dict(sorted(variants.items()))
+
+
+def required_width(field_of_view: float, resolution_x: float) -> float:
+  """The width of an equirectangular map whose texels are no larger than the image pixels.
+
+  A pinhole camera with a horizontal field of view `fov` has a focal length of
+  resolution_x / (2 tan(fov / 2)) pixels, i.e. that many pixels per radian at the image center
+  (where the angular pixel density is highest). An equirectangular map that is w pixels wide has
+  w / (2 pi) texels per radian.
+
+  Args:
+    field_of_view: horizontal field of view of the camera in radians.
+    resolution_x: horizontal resolution of the rendered image in pixels.
+
+  Returns:
+    The required width of the environment map in pixels.
+  """
+  return np.pi * resolution_x / np.tan(field_of_view / 2)
+
+
+def select_mip_variant(filename: PathLike, field_of_view: float, resolution_x: float,
+                       oversampling: float = 1.) -> str:
+  """Returns the smallest variant of an environment map that is adequate for the given camera.
+
+  Args:
+    filename: path of the full resolution environment map.
+    field_of_view: horizontal field of view of the camera in radians.
+    resolution_x: horizontal resolution of the rendered image in pixels.
+    oversampling: factor applied to the required width (values > 1 trade memory for sharpness).
+
+  Returns:
+    The path of the selected variant, or `filename` if none of the variants is large enough.
+  """
+  min_width = oversampling * required_width(field_of_view, resolution_x)
+  for width, path in find_mip_variants(filename).items():
+    if width >= min_width:
+      logger.debug("Using the %d pixels wide variant of '%s' (%d required)", width, filename,
+                   min_width)
+      return str(path)
+  return str(filename)
+
+
+class ImageCache:
+  """Keeps decoded image pixels in memory (across scenes) with LRU eviction."""
+
+  def __init__(self, max_size_bytes: int = 2 * 2**30):
+    """
+    Args:
+      max_size_bytes: the least recently used images are evicted once the cache exceeds this size.
+    """
+    self.max_size_bytes = max_size_bytes
+    self.statistics = collections.Counter(hits=0, misses=0, evictions=0)
+    self._entries = collections.OrderedDict()
+
+  @property
+  def size_bytes(self) -> int:
+    return sum(pixels.nbytes for pixels in self._entries.values())
+
+  @staticmethod
+  def _key(filename: PathLike):
+    stat = os.stat(filename)
+    return os.path.abspath(filename), stat.st_size, stat.st_mtime_ns
+
+  def get(self, filename: PathLike) -> Optional[np.ndarray]:
+    """Returns the cached pixels of an image file (or None if they are not cached)."""
+    key = self._key(filename)
+    if key in self._entries:
+      self._entries.move_to_end(key)
+      self.statistics["hits"] += 1
+      return self._entries[key]
+    self.statistics["misses"] += 1
+    return None
+
+  def put(self, filename: PathLike, pixels: np.ndarray):
+    """Stores the pixels of an image file and evicts the least recently used images."""
+    key = self._key(filename)
+    self._entries[key] = pixels
+    self._entries.move_to_end(key)
+    while self.size_bytes > self.max_size_bytes and len(self._entries) > 1:
+      (evicted_filename, _, _), _ = self._entries.popitem(last=False)
+      self.statistics["evictions"] += 1
+      logger.debug("Evicted '%s' from the image cache", evicted_filename)
+
+  def get_or_load(self, filename: PathLike, load: Callable[[str], np.ndarray]) -> np.ndarray:
+    pixels = self.get(filename)
+    if pixels is None:
+      pixels = load(str(filename))
+      self.put(filename, pixels)
+    return pixels
+
+  def clear(self):
+    self._entries.clear()
+
+
+# shared by all Blender renderers of this process
+IMAGE_CACHE = ImageCache()
@@ -0,0 +1,167 @@
+# Copyright 2024 The Kubric Authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Decimated level-of-detail (LOD) variants of render meshes, chosen by screen-space error.
+
+At preprocessing time `make_lod_variants` writes quadric-decimated copies of a render mesh next
+to the original (e.g. "visual_geometry.lod1.glb") and measures their geometric error. The
+resulting list is stored in the "lods" metadata of the asset. With `Blender(..., lod_max_error=1.)`
+the renderer then uses, for each object, the coarsest LOD whose error projected to the image
+stays below the given number of pixels in all rendered frames (see `select_lod`).
+Decimation requires the optional `fast_simplification` package (used by trimesh).
+This module does not depend on bpy.
+"""
+
+import itertools
+import logging
+import pathlib
+from typing import Any, Dict, List, Sequence, Tuple
+
+import numpy as np
+import trimesh
+
+from kubric import core
+from kubric.kubric_typing import PathLike
+from kubric.renderer import optical_flow
+
+logger = logging.getLogger(__name__)
+
+# fraction of faces kept by each LOD level (level 0 is the original mesh)
+DEFAULT_FACE_RATIOS = (0.25, 0.0625)
+
+
+def lod_variant_path(filename: PathLike, level: int) -> pathlib.Path:
+  """The path of the given LOD level of a render mesh (e.g. "visual_geometry.lod1.glb")."""
+  path = pathlib.Path(filename)
+  return path.with_name(f"{path.stem}.lod{level}{path.suffix}")
+
+
+def decimate(mesh: trimesh.Trimesh, face_ratio: float) -> trimesh.Trimesh:
+  """Quadric decimation that keeps (approximately) the texture coordinates and vertex colors."""
+  face_count = max(4, int(len(mesh.faces) * face_ratio))
+  decimated = mesh.simplify_quadric_decimation(face_count=face_count)
+  # the decimation drops the visuals, so they are copied from the closest original vertices
+  _, closest = mesh.kdtree.query(decimated.vertices)
+  if isinstance(mesh.visual, trimesh.visual.TextureVisuals) and mesh.visual.uv is not None:
+    decimated.visual = trimesh.visual.TextureVisuals(uv=mesh.visual.uv[closest],
+                                                     material=mesh.visual.material)
+  elif mesh.visual.kind == "vertex":
+    decimated.visual.vertex_colors = mesh.visual.vertex_colors[closest]
+  return decimated
+
+
+def geometric_error(original: trimesh.Trimesh, simplified: trimesh.Trimesh,
+                    num_samples: int = 10000) -> float:
+  """Approximates the (symmetric) Hausdorff distance between two meshes via surface samples."""
+  def one_sided(source, target):
+    points, _ = trimesh.sample.sample_surface(source, num_samples, seed=0)
+    _, distances, _ = trimesh.proximity.closest_point(target, points)
+    return float(distances.max())
+  return max(one_sided(original, simplified), one_sided(simplified, original))
+
+
+def make_lod_variants(filename: PathLike,
+                      face_ratios: Sequence[float] = DEFAULT_FACE_RATIOS) -> List[Dict[str, Any]]:
+  """Writes decimated variants of a render mesh (in the same file format) next to it.
+
+  Args:
+    filename: the render mesh (any format that trimesh can read and write, e.g. glb or obj).
+    face_ratios: the fraction of faces to keep for each LOD level.
+
+  Returns:
+    The LOD levels as a list (to be stored as "lods" in the asset metadata) of dicts with
+      - "filename": name of the variant (in the directory of the render mesh)
+      - "face_ratio": the fraction of faces kept
+      - "num_faces": the number of faces of the variant
+      - "error": the geometric error in object coordinates (see `geometric_error`)
+  """
+  filename = pathlib.Path(filename)
+  source = trimesh.load(str(filename))
+  geometries = source.geometry if isinstance(source, trimesh.Scene) else {None: source}
+
+  lods = []
+  for level, face_ratio in enumerate(sorted(face_ratios, reverse=True), start=1):
+    decimated = {name: decimate(mesh, face_ratio) for name, mesh in geometries.items()}
+    if isinstance(source, trimesh.Scene):
+      variant = source.copy()
+      for name, mesh in decimated.items():
+        variant.geometry[name] = mesh
+    else:
+      variant = decimated[None]
+    path = lod_variant_path(filename, level)
+    variant.export(str(path))
+    lods.append({
+        "filename": path.name,
+        "face_ratio": face_ratio,
+        "num_faces": sum(len(mesh.faces) for mesh in decimated.values()),
+        "error": max(geometric_error(geometries[name], mesh) for name, mesh in decimated.items()),
+    })
+    logger.info("Wrote LOD %d of '%s' with %d faces (error=%f)", level, filename,
+                lods[-1]["num_faces"], lods[-1]["error"])
+  return lods
+
+
+def screen_space_scale(asset: core.PhysicalObject,
+                       cameras: Sequence[core.Camera],
+                       frames: Sequence[int],
+                       resolution: Tuple[int, int]) -> float:
+  """The largest size (in pixels) of one unit in object coordinates across cameras and frames.
+
+  Computed for the point of the (3D) bounding box of the asset that is closest to the camera.
+  Frames in which the object is entirely behind a camera are ignored, and the result is infinite
+  if a camera is inside (or at the level of) the bounding box.
+  """
+  corners = np.array(list(itertools.product(*np.asarray(asset.bounds, dtype=np.float64).T)))
+  max_scale = 0.
+  for frame in frames:
+    transform = optical_flow.object_transform(asset, frame)
+    points = corners @ transform[:3, :3].T + transform[:3, 3]
+    object_scale = np.max(np.abs(asset.get_value_at("scale", frame)))
+    for camera in cameras:
+      world_to_cam, intrinsics = optical_flow.camera_projection(camera, frame, resolution)
+      _, depth = optical_flow.project(points, world_to_cam, intrinsics)
+      if np.all(depth <= 0):
+        continue  # not visible
+      if np.any(depth <= 0):
+        return np.inf
+      # depth is linear, so its minimum over the bounding box is attained at one of the corners
+      max_scale = max(max_scale, object_scale * intrinsics[0, 0] / depth.min())
+  return max_scale
+
+
+def select_lod(asset: core.PhysicalObject,
+               lods: Sequence[Dict[str, Any]],
+               cameras: Sequence[core.Camera],
+               frames: Sequence[int],
+               resolution: Tuple[int, int],
+               max_error: float = 1.) -> int:
+  """Returns the coarsest LOD level whose screen-space error stays below max_error pixels.
+
+  Args:
+    asset: the object (with its keyframes).
+    lods: the LOD levels of the render mesh (as returned by `make_lod_variants`).
+    cameras: the cameras the object will be rendered from.
+    frames: the frames that will be rendered.
+    resolution: the (width, height) of the rendered images in pixels.
+    max_error: the largest acceptable geometric error projected to the image in pixels.
+
+  Returns:
+    The selected level (0 for the original mesh, i for lods[i - 1]).
+  """
+  scale = screen_space_scale(asset, cameras, frames, resolution)
+  level = 0
+  for i, lod in enumerate(lods, start=1):
+    if lod["error"] * scale <= max_error:
+      level = i
+  return level
@@ -0,0 +1,166 @@
+# Copyright 2024 The Kubric Authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Analytic optical flow computed from object and camera transforms.
+
+Instead of relying on the Vector pass of Cycles, the flow of a pixel is obtained by mapping its
+object coordinates back to the object's local space and projecting that point with the object and
+camera poses of the previous / next frame. Flow uses the (delta_row, delta_column) convention of
+`Blender.render`: backward_flow = previous - current and forward_flow = next - current.
+This module does not depend on bpy.
+"""
+
+from typing import Optional, Sequence, Tuple
+
+import numpy as np
+import pyquaternion as pyquat
+
+from kubric import core
+from kubric.kubric_typing import ArrayLike
+
+
+def object_transform(asset: core.PhysicalObject, frame: int) -> np.ndarray:
+  """Homogeneous transformation (including scale) from object to world coordinates at frame."""
+  position = asset.get_value_at("position", frame)
+  quaternion = asset.get_value_at("quaternion", frame)
+  scale = asset.get_value_at("scale", frame)
+  transformation = np.eye(4)
+  transformation[:3, :3] = pyquat.Quaternion(*quaternion).rotation_matrix * np.asarray(scale)
+  transformation[:3, 3] = position
+  return transformation
+
+
+def camera_projection(camera: core.Camera, frame: int,
+                      resolution: Tuple[int, int]) -> Tuple[np.ndarray, np.ndarray]:
+  """Returns the world-to-camera transformation and the pixel-space intrinsics at frame."""
+  if not isinstance(camera, core.PerspectiveCamera):
+    raise NotImplementedError(f"Cannot rasterize with {camera!r}")
+  width, height = resolution
+  position = camera.get_value_at("position", frame)
+  quaternion = camera.get_value_at("quaternion", frame)
+  focal_length = camera.get_value_at("focal_length", frame)
+  sensor_width = camera.get_value_at("sensor_width", frame)
+
+  cam_to_world = np.eye(4)
+  cam_to_world[:3, :3] = pyquat.Quaternion(*quaternion).rotation_matrix
+  cam_to_world[:3, 3] = position
+  # same as camera.intrinsics but scaled to pixels (x=column, y=row)
+  f_x = focal_length / sensor_width * width
+  f_y = focal_length / (sensor_width / width * height) * height
+  intrinsics = np.array([
+      [f_x, 0, -width / 2.],
+      [0, -f_y, -height / 2.],
+      [0, 0, -1],
+  ])
+  return np.linalg.inv(cam_to_world), intrinsics
+
+
+def project(points: np.ndarray, world_to_cam: np.ndarray,
+            intrinsics: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+  """Projects world points (N, 3) to pixel coordinates (N, 2) as (column, row) and depth (N,)."""
+  cam_points = points @ world_to_cam[:3, :3].T + world_to_cam[:3, 3]
+  projected = cam_points @ intrinsics.T
+  depth = projected[:, 2]
+  with np.errstate(divide="ignore", invalid="ignore"):
+    pixels = projected[:, :2] / depth[:, None]
+  return pixels, depth
+
+
+def project_batched(local_points: np.ndarray, transforms: np.ndarray,
+                    world_to_cam: np.ndarray, intrinsics: np.ndarray) -> np.ndarray:
+  """Projects points in object coordinates with a separate camera and transform per point.
+
+  Args:
+    local_points: the points in (unscaled) object coordinates. shape = (N, 3)
+    transforms: the object-to-world transformation of each point. shape = (N, 4, 4)
+    world_to_cam: the world-to-camera transformation of each point. shape = (N, 4, 4)
+    intrinsics: the pixel-space intrinsics of each point. shape = (N, 3, 3)
+
+  Returns:
+    The pixel coordinates as (column, row). shape = (N, 2)
+  """
+  world_points = np.einsum("nij,nj->ni", transforms[:, :3, :3], local_points) + transforms[:, :3, 3]
+  cam_points = (np.einsum("nij,nj->ni", world_to_cam[:, :3, :3], world_points) +
+                world_to_cam[:, :3, 3])
+  projected = np.einsum("nij,nj->ni", intrinsics, cam_points)
+  with np.errstate(divide="ignore", invalid="ignore"):
+    return projected[:, :2] / projected[:, 2:]
+
+
+def compute_optical_flow(
+    object_coordinates: ArrayLike,
+    segmentation: ArrayLike,
+    scene: core.Scene,
+    frames: Sequence[int],
+    assets: Sequence[core.PhysicalObject],
+    bounds: Sequence[Tuple[ArrayLike, ArrayLike]],
+    camera: Optional[core.Camera] = None,
+    resolution: Optional[Tuple[int, int]] = None,
+) -> Tuple[np.ndarray, np.ndarray]:
+  """Computes the backward and forward optical flow for a stack of frames.
+
+  Args:
+    object_coordinates: object coordinates normalized to the bounds of each object, either as float
+      in [0, 1] or as uint16 (as returned by `Blender.render`). shape = (F, H, W, 3)
+    segmentation: index of the visible asset for each pixel, starting at 1 for assets[0]
+      (0 for background). shape = (F, H, W, 1)
+    scene: the kubric scene.
+    frames: the frame number of each entry in the stack. len(frames) = F
+    assets: the assets referenced by the segmentation.
+    bounds: for each asset the (min, max) corners of the bounding box (in unscaled object space)
+      that the object coordinates are normalized to.
+    camera: the camera used for rendering (defaults to scene.camera).
+    resolution: the (width, height) of the rendered images (defaults to scene.resolution).
+
+  Returns:
+    (backward_flow, forward_flow) in pixels as (delta_row, delta_column). shape = (F, H, W, 2)
+  """
+  camera = scene.camera if camera is None else camera
+  resolution = scene.resolution if resolution is None else resolution
+  object_coordinates = np.asarray(object_coordinates)
+  if object_coordinates.dtype == np.uint16:
+    object_coordinates = object_coordinates / 65535.
+  segmentation = np.asarray(segmentation)[..., 0]
+  frames = np.asarray(frames)
+
+  backward_flow = np.zeros(segmentation.shape + (2,), dtype=np.float32)
+  forward_flow = np.zeros(segmentation.shape + (2,), dtype=np.float32)
+
+  # world-to-camera and pixel intrinsics for the previous, current and next frame
+  projections = {
+      offset: [np.stack(m) for m in zip(*[camera_projection(camera, frame + offset, resolution)
+                                          for frame in frames])]
+      for offset in (-1, 0, 1)
+  }
+
+  for i, (asset, (lower, upper)) in enumerate(zip(assets, bounds), start=1):
+    stack_idx, rows, cols = np.nonzero(segmentation == i)
+    if stack_idx.size == 0:
+      continue
+    lower = np.asarray(lower, dtype=np.float64)
+    upper = np.asarray(upper, dtype=np.float64)
+    local_points = lower + object_coordinates[stack_idx, rows, cols] * (upper - lower)
+
+    def project_at(offset, asset=asset, stack_idx=stack_idx, local_points=local_points):
+      transforms = np.stack([object_transform(asset, frame + offset) for frame in frames])
+      world_to_cam, intrinsics = projections[offset]
+      return project_batched(local_points, transforms[stack_idx],
+                             world_to_cam[stack_idx], intrinsics[stack_idx])
+
+    current = project_at(0)
+    for flow, offset in ((backward_flow, -1), (forward_flow, 1)):
+      # (column, row) -> (delta_row, delta_column)
+      flow[stack_idx, rows, cols] = (project_at(offset) - current)[:, ::-1]
+
+  return backward_flow, forward_flow
@@ -0,0 +1,145 @@
+# Copyright 2024 The Kubric Authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Structured timing and memory profiles of rendering (exportable as Chrome trace).
+
+A `RenderProfile` records named spans (e.g. "frame_set", "cycles/sampling", "postprocess/depth")
+and memory counters for each frame. `Blender.render` records one profile per call (see
+`Blender.last_render_profile`), which can be summarized or saved as a Chrome trace JSON file
+that can be inspected with chrome://tracing or https://ui.perfetto.dev.
+This module does not depend on bpy.
+"""
+
+import collections
+import contextlib
+import dataclasses
+import json
+import re
+import resource
+import sys
+import time
+from typing import Any, Dict, List, Optional
+
+from kubric.kubric_typing import PathLike
+
+_MEMORY_UNITS = {"K": 2**10, "M": 2**20, "G": 2**30}
+
+
+@dataclasses.dataclass
+class Span:
+  name: str
+  start: float  # in seconds (time.perf_counter)
+  duration: float  # in seconds
+  frame: Optional[int] = None
+  args: Dict[str, Any] = dataclasses.field(default_factory=dict)
+
+
+def peak_memory_bytes() -> int:
+  """The peak resident set size of this process so far."""
+  max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+  # ru_maxrss is in bytes on macOS and in kilobytes on Linux
+  return max_rss if sys.platform == "darwin" else max_rss * 2**10
+
+
+def parse_cycles_peak_memory(stats: str) -> Optional[int]:
+  """Parses the peak memory (in bytes) from a Cycles render stats string.
+
+  e.g. "Fra:1 | Mem:24.51M (Peak 31.02M) | Time:00:01.27 | Sample 12/64" -> 32526336
+  """
+  match = re.search(r"Peak:? ?([\d.]+)([KMG])", stats)
+  if match is None:
+    return None
+  return int(float(match.group(1)) * _MEMORY_UNITS[match.group(2)])
+
+
+class RenderProfile:
+  """Records timing spans and memory usage of a rendering run."""
+
+  def __init__(self):
+    self.spans: List[Span] = []
+    # {frame: {counter_name: value}}
+    self.counters = collections.defaultdict(dict)
+    self._origin = time.perf_counter()
+
+  @contextlib.contextmanager
+  def span(self, name: str, frame: Optional[int] = None, **args):
+    """Context manager that records the duration of its body as a span."""
+    start = time.perf_counter()
+    try:
+      yield
+    finally:
+      self.add_span(name, start, time.perf_counter() - start, frame=frame, **args)
+
+  def add_span(self, name: str, start: float, duration: float, frame: Optional[int] = None,
+               **args):
+    self.spans.append(Span(name, start, duration, frame, args))
+
+  def record_memory(self, frame: Optional[int] = None, **counters: int):
+    """Records the process peak memory (and optional other memory counters in bytes)."""
+    self.counters[frame].update(counters, process_peak_memory=peak_memory_bytes())
+
+  @property
+  def peak_memory(self) -> int:
+    """The largest recorded memory counter in bytes."""
+    return max((value for counters in self.counters.values() for value in counters.values()),
+               default=0)
+
+  def summary(self) -> Dict[str, float]:
+    """Total duration (in seconds) of all spans of each name."""
+    totals = collections.defaultdict(float)
+    for span in self.spans:
+      totals[span.name] += span.duration
+    return dict(totals)
+
+  def frame_summary(self) -> Dict[int, Dict[str, float]]:
+    """Total duration (in seconds) of all spans of each name for each frame."""
+    totals = collections.defaultdict(lambda: collections.defaultdict(float))
+    for span in self.spans:
+      totals[span.frame][span.name] += span.duration
+    return {frame: dict(spans) for frame, spans in totals.items()}
+
+  def to_chrome_trace(self) -> Dict[str, Any]:
+    """Converts the profile into the Chrome trace event format."""
+    events = []
+    for span in self.spans:
+      args = dict(span.args)
+      if span.frame is not None:
+        args["frame"] = span.frame
+      events.append({
+          "name": span.name,
+          "cat": span.name.partition("/")[0],
+          "ph": "X",
+          "ts": (span.start - self._origin) * 1e6,  # in microseconds
+          "dur": span.duration * 1e6,
+          "pid": 0,
+          "tid": 0,
+          "args": args,
+      })
+    frame_ends = {}
+    for span in self.spans:
+      frame_ends[span.frame] = max(frame_ends.get(span.frame, 0.), span.start + span.duration)
+    for frame, counters in self.counters.items():
+      events.append({
+          "name": "memory",
+          "ph": "C",
+          "ts": (frame_ends.get(frame, self._origin) - self._origin) * 1e6,
+          "pid": 0,
+          "args": {name: value / 2**20 for name, value in counters.items()},  # in MiB
+      })
+    return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+  def save_chrome_trace(self, filename: PathLike):
+    """Writes the profile to a Chrome trace JSON file."""
+    with open(filename, "w", encoding="utf-8") as f:
+      json.dump(self.to_chrome_trace(), f)
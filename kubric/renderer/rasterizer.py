@@ -0,0 +1,573 @@
+# Copyright 2024 The Kubric Authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""A z-buffer rasterizer (pure numpy) for the annotation layers of a kubric scene.
+
+The layers are returned in the same format as `blender_utils.get_render_layers_from_exr`, so the
+post-processors of `kubric.post_processing` can be applied to them unchanged. This module does not
+depend on bpy: it serves as annotation backend for the Blender renderer and, via the `Rasterizer`
+view, as a standalone CPU renderer for scenes that only need annotations.
+"""
+
+import collections
+import functools
+import logging
+import multiprocessing.pool
+import pathlib
+from typing import Any, Dict, Optional, Sequence, Tuple
+
+import numpy as np
+import trimesh
+
+try:
+  import numba
+except ImportError:
+  numba = None  # numba is optional and only needed for Rasterizer(use_numba=True)
+
+from kubric import core
+from kubric import post_processing
+from kubric.post_processing import mm3hash
+from kubric.renderer import optical_flow
+from kubric.renderer.optical_flow import camera_projection
+from kubric.renderer.optical_flow import object_transform
+from kubric.renderer.optical_flow import project
+
+logger = logging.getLogger(__name__)
+
+# Cycles uses this value for the Z-pass of background pixels
+BACKGROUND_DEPTH = 1e10
+# render file formats that `get_mesh` can load (like the Blender importers)
+MESH_FILE_EXTENSIONS = (".obj", ".glb", ".gltf")
+
+
+class Mesh:
+  """Triangle mesh of an asset in (unscaled) object coordinates."""
+
+  def __init__(self, vertices: np.ndarray, faces: np.ndarray, smooth: bool):
+    self.vertices = np.asarray(vertices, dtype=np.float64)
+    self.faces = np.asarray(faces, dtype=np.int64)
+    tmesh = trimesh.Trimesh(vertices=self.vertices, faces=self.faces, process=False)
+    # Blender shades meshes smooth by interpolating vertex normals, otherwise face normals are used
+    self.normals = np.asarray(tmesh.vertex_normals if smooth else tmesh.face_normals,
+                              dtype=np.float64)
+    self.smooth = smooth
+    # Blender "Generated" texture coordinates are normalized to the bounding box of the mesh
+    self.bounds = np.array([self.vertices.min(axis=0), self.vertices.max(axis=0)])
+
+
+_MESH_CACHE = {}
+
+
+def _axis_conversion(forward: str = "-Z", up: str = "Y") -> np.ndarray:
+  """Rotation from a file's (forward, up) axes to the Blender (Y, Z) axes (like bpy_extras)."""
+  front = core.objects.convert_str_direction_to_vector(forward)
+  up = core.objects.convert_str_direction_to_vector(up)
+  return np.stack([np.cross(front, up), front, up])
+
+
+def is_drawable(asset: core.Asset) -> bool:
+  """Whether the asset has a surface that can be rasterized."""
+  if isinstance(asset, core.FileBasedObject):
+    return asset.render_filename is not None
+  return isinstance(asset, (core.Cube, core.Sphere))
+
+
+def is_rasterizable(asset: core.Asset) -> bool:
+  """Whether `get_mesh` supports the asset (i.e. the file format of its render file)."""
+  if isinstance(asset, core.FileBasedObject):
+    return (asset.render_filename is not None and
+            pathlib.Path(asset.render_filename).suffix.lower() in MESH_FILE_EXTENSIONS)
+  return isinstance(asset, (core.Cube, core.Sphere))
+
+
+def get_mesh(asset: core.PhysicalObject, render_filename: Optional[str] = None) -> Mesh:
+  """Returns the (cached) geometry of an asset as it would be imported by the Blender renderer.
+
+  Args:
+    asset: a Cube, Sphere or FileBasedObject.
+    render_filename: a file to load instead of asset.render_filename (e.g. a LOD variant).
+  """
+  if isinstance(asset, core.Cube):
+    key = ("Cube",)
+  elif isinstance(asset, core.Sphere):
+    key = ("Sphere",)
+  elif isinstance(asset, core.FileBasedObject):
+    render_filename = asset.render_filename if render_filename is None else render_filename
+    key = (render_filename, tuple(sorted(asset.render_import_kwargs.items())),
+           asset.do_not_rotate_glb_90_degrees_after_import)
+  else:
+    raise NotImplementedError(f"Cannot rasterize {asset!r}")
+
+  if key not in _MESH_CACHE:
+    if isinstance(asset, core.Cube):
+      # same as bpy.ops.mesh.primitive_cube_add()
+      box = trimesh.creation.box(extents=(2., 2., 2.))
+      _MESH_CACHE[key] = Mesh(box.vertices, box.faces, smooth=False)
+    elif isinstance(asset, core.Sphere):
+      # same as bpy.ops.mesh.primitive_ico_sphere_add(subdivisions=5) + shade_smooth
+      sphere = trimesh.creation.icosphere(subdivisions=4)
+      _MESH_CACHE[key] = Mesh(sphere.vertices, sphere.faces, smooth=True)
+    else:
+      _MESH_CACHE[key] = _load_file_mesh(asset, render_filename)
+  return _MESH_CACHE[key]
+
+
+def _load_file_mesh(asset: core.FileBasedObject, render_filename: Optional[str]) -> Mesh:
+  if render_filename is None:
+    raise ValueError(f"{asset!r} has no render_filename")
+  extension = pathlib.Path(render_filename).suffix.lower()
+  tmesh = trimesh.load(render_filename, force="mesh")
+  vertices = np.asarray(tmesh.vertices, dtype=np.float64)
+  if extension == ".obj":
+    kwargs = asset.render_import_kwargs
+    rotation = _axis_conversion(kwargs.get("axis_forward", "-Z"), kwargs.get("axis_up", "Y"))
+    vertices = vertices @ rotation.T
+  elif extension in (".glb", ".gltf"):
+    # the Y-up to Z-up conversion of the gltf importer is undone by the renderer unless disabled
+    if asset.do_not_rotate_glb_90_degrees_after_import:
+      vertices = vertices @ _axis_conversion("-Z", "Y").T
+  else:
+    raise ValueError(f"Unsupported file-type '{extension}' for rasterizing {asset}")
+  return Mesh(vertices, tmesh.faces, smooth=True)
+
+
+def rasterize_triangles(pixels: np.ndarray, depth: np.ndarray, faces: np.ndarray,
+                        resolution: Tuple[int, int], near: float = 0.,
+                        max_fragments: int = 2**22, num_threads: int = 1,
+                        use_numba: bool = False):
+  """Vectorized z-buffer rasterization of a triangle soup.
+
+  A pixel is covered by a triangle if its center lies within the triangle. Triangles are clipped
+  against the near plane (see `clip_triangles`), and the returned face indices and barycentric
+  coordinates refer to the original (unclipped) triangles.
+  The image is split into horizontal tiles that are rasterized in parallel by num_threads threads.
+
+  Args:
+    pixels: vertex positions in pixel coordinates (column, row). shape = (N, 2)
+    depth: vertex distances to the camera plane. shape = (N,)
+    faces: vertex indices of the triangles. shape = (F, 3)
+    resolution: (width, height) of the image.
+    near: the depth of the near clipping plane.
+    max_fragments: upper bound on the number of candidate pixels that are processed at once.
+    num_threads: number of threads (and tiles) used for rasterization.
+    use_numba: use the numba compiled kernel instead of the vectorized numpy implementation
+      (requires numba to be installed).
+
+  Returns:
+    face_idx: index of the visible triangle for each pixel (-1 for background). shape = (H*W,)
+    barycentric: perspective correct barycentric coordinates. shape = (H*W, 3)
+    z: depth of each pixel (inf for background). shape = (H*W,)
+  """
+  if use_numba and numba is None:
+    raise ImportError("use_numba=True requires the numba package to be installed.")
+  width, height = resolution
+  z_buffer = np.full(width * height, np.inf)
+  face_idx = np.full(width * height, -1, dtype=np.int64)
+  barycentric = np.zeros((width * height, 3))
+
+  tri_xy, tri_z, tri_face, tri_barycentric = clip_triangles(pixels[faces], depth[faces], near)
+  valid = np.all(np.isfinite(tri_xy), axis=(1, 2))
+
+  def rasterize_tile(rows):
+    row_start, row_stop = rows
+    if use_numba:
+      _rasterize_tile_numba(tri_xy, tri_z, valid, width, row_start, row_stop,
+                            z_buffer, face_idx, barycentric)
+    else:
+      _rasterize_tile(tri_xy, tri_z, valid, width, row_start, row_stop,
+                      z_buffer, face_idx, barycentric, max_fragments)
+
+  # tiles write to disjoint rows of the buffers, so they can be processed concurrently
+  bounds = np.linspace(0, height, min(num_threads, height) + 1).astype(np.int64)
+  tiles = list(zip(bounds[:-1], bounds[1:]))
+  if len(tiles) == 1:
+    rasterize_tile(tiles[0])
+  else:
+    with multiprocessing.pool.ThreadPool(len(tiles)) as pool:
+      pool.map(rasterize_tile, tiles)
+
+  # --- map the clipped triangles back to the original ones
+  hit = face_idx >= 0
+  barycentric[hit] = np.einsum("nk,nkd->nd", barycentric[hit], tri_barycentric[face_idx[hit]])
+  face_idx[hit] = tri_face[face_idx[hit]]
+  return face_idx, barycentric, z_buffer
+
+
+def clip_triangles(tri_xy: np.ndarray, tri_z: np.ndarray, near: float):
+  """Clips triangles against the near plane (Sutherland-Hodgman) and re-triangulates them.
+
+  Triangles entirely in front of the near plane are kept unchanged, those entirely behind it are
+  dropped, and the others are clipped to a triangle (one vertex in front) or to a quad that is
+  split into two triangles (two vertices in front). The clipped vertices are interpolated in
+  homogeneous (pixel * depth) coordinates, which are linear in camera space.
+
+  Args:
+    tri_xy: vertex positions of the triangles in pixel coordinates. shape = (F, 3, 2)
+    tri_z: vertex depths of the triangles. shape = (F, 3)
+    near: the depth of the near clipping plane.
+
+  Returns:
+    tri_xy: vertex positions of the clipped triangles. shape = (S, 3, 2)
+    tri_z: vertex depths of the clipped triangles. shape = (S, 3)
+    face: index of the original triangle of each clipped triangle. shape = (S,)
+    barycentric: barycentric coordinates of the vertices of each clipped triangle with respect to
+      its original triangle. shape = (S, 3, 3)
+  """
+  inside = tri_z > near
+  num_inside = inside.sum(axis=1)
+  keep = np.nonzero(num_inside == 3)[0]
+  all_xy, all_z = [tri_xy[keep]], [tri_z[keep]]
+  all_faces = [keep]
+  all_barycentric = [np.broadcast_to(np.eye(3), (keep.size, 3, 3))]
+  for count in (1, 2):
+    clipped = np.nonzero(num_inside == count)[0]
+    if clipped.size == 0:
+      continue
+    # rotate the vertices, such that the first one is the single vertex on its side of the plane
+    single = inside[clipped] if count == 1 else ~inside[clipped]
+    order = (np.argmax(single, axis=1)[:, None] + np.arange(3)) % 3
+    z = np.take_along_axis(tri_z[clipped], order, axis=1)
+    v_0, v_1, v_2 = (np.eye(3)[order[:, i]] for i in range(3))
+    # the intersections of the edges (v_0, v_1) and (v_0, v_2) with the near plane
+    p_1 = v_0 + ((near - z[:, 0]) / (z[:, 1] - z[:, 0]))[:, None] * (v_1 - v_0)
+    p_2 = v_0 + ((near - z[:, 0]) / (z[:, 2] - z[:, 0]))[:, None] * (v_2 - v_0)
+    if count == 1:
+      triangles = [np.stack([v_0, p_1, p_2], axis=1)]
+    else:
+      # the quad (p_1, v_1, v_2, p_2) as a triangle fan
+      triangles = [np.stack([p_1, v_1, v_2], axis=1), np.stack([p_1, v_2, p_2], axis=1)]
+    with np.errstate(invalid="ignore"):  # vertices at depth 0 have infinite pixel coordinates
+      homogeneous = tri_xy[clipped] * tri_z[clipped][..., None]
+    for barycentric in triangles:
+      new_z = np.einsum("fkj,fj->fk", barycentric, tri_z[clipped])
+      with np.errstate(divide="ignore", invalid="ignore"):
+        new_xy = np.einsum("fkj,fjd->fkd", barycentric, homogeneous) / new_z[..., None]
+      all_xy.append(new_xy)
+      all_z.append(new_z)
+      all_faces.append(clipped)
+      all_barycentric.append(barycentric)
+  return (np.concatenate(all_xy), np.concatenate(all_z), np.concatenate(all_faces),
+          np.concatenate(all_barycentric))
+
+
+def _rasterize_tile(tri_xy, tri_z, valid, width, row_start, row_stop,
+                    z_buffer, face_idx, barycentric, max_fragments):
+  """Rasterizes the rows [row_start, row_stop) of the image (numpy implementation)."""
+  # range of pixels whose centers (i + 0.5) may lie within the triangle
+  with np.errstate(invalid="ignore"):
+    x_min = np.ceil(tri_xy[..., 0].min(axis=1) - 0.5).clip(0, width)
+    x_max = np.floor(tri_xy[..., 0].max(axis=1) - 0.5).clip(-1, width - 1)
+    y_min = np.ceil(tri_xy[..., 1].min(axis=1) - 0.5).clip(row_start, row_stop)
+    y_max = np.floor(tri_xy[..., 1].max(axis=1) - 0.5).clip(row_start - 1, row_stop - 1)
+  x_min = np.where(valid, x_min, 0).astype(np.int64)
+  y_min = np.where(valid, y_min, 0).astype(np.int64)
+  nr_x = np.where(valid, x_max - x_min + 1, 0).clip(0).astype(np.int64)
+  nr_y = np.where(valid, y_max - y_min + 1, 0).clip(0).astype(np.int64)
+  counts = nr_x * nr_y
+
+  candidates = np.nonzero(counts)[0]
+  # split into chunks of at most max_fragments candidate pixels (but at least one triangle)
+  chunk_ids = np.cumsum(counts[candidates]) // max_fragments
+  for chunk in np.split(candidates, np.nonzero(np.diff(chunk_ids))[0] + 1):
+    if chunk.size == 0:
+      continue
+    chunk_counts = counts[chunk]
+    frag_face = np.repeat(chunk, chunk_counts)
+    offsets = np.arange(frag_face.size) - np.repeat(np.cumsum(chunk_counts) - chunk_counts,
+                                                    chunk_counts)
+    frag_x = x_min[frag_face] + offsets % nr_x[frag_face]
+    frag_y = y_min[frag_face] + offsets // nr_x[frag_face]
+
+    # barycentric coordinates from edge functions
+    a, b, c = (tri_xy[frag_face, i] for i in range(3))
+    center_x, center_y = frag_x + 0.5, frag_y + 0.5
+    area = (b[:, 0] - a[:, 0]) * (c[:, 1] - a[:, 1]) - (b[:, 1] - a[:, 1]) * (c[:, 0] - a[:, 0])
+    with np.errstate(divide="ignore", invalid="ignore"):
+      w_a = ((b[:, 0] - center_x) * (c[:, 1] - center_y) -
+             (b[:, 1] - center_y) * (c[:, 0] - center_x)) / area
+      w_b = ((c[:, 0] - center_x) * (a[:, 1] - center_y) -
+             (c[:, 1] - center_y) * (a[:, 0] - center_x)) / area
+    w_c = 1. - w_a - w_b
+    inside = (w_a >= 0) & (w_b >= 0) & (w_c >= 0) & (np.abs(area) > 1e-12)
+
+    frag_face, frag_x, frag_y = frag_face[inside], frag_x[inside], frag_y[inside]
+    weights = np.stack([w_a[inside], w_b[inside], w_c[inside]], axis=-1)
+    # perspective correct interpolation
+    weights /= tri_z[frag_face]
+    frag_z = 1. / weights.sum(axis=-1)
+    weights *= frag_z[:, None]
+
+    # keep the closest fragment for each pixel (within chunk and against the z-buffer)
+    frag_pixel = frag_y * width + frag_x
+    order = np.lexsort((frag_z, frag_pixel))
+    first = np.ones(order.size, dtype=bool)
+    first[1:] = frag_pixel[order[1:]] != frag_pixel[order[:-1]]
+    order = order[first]
+    order = order[frag_z[order] < z_buffer[frag_pixel[order]]]
+    z_buffer[frag_pixel[order]] = frag_z[order]
+    face_idx[frag_pixel[order]] = frag_face[order]
+    barycentric[frag_pixel[order]] = weights[order]
+
+
+def _rasterize_tile_python(tri_xy, tri_z, valid, width, row_start, row_stop,
+                           z_buffer, face_idx, barycentric):
+  """Rasterizes the rows [row_start, row_stop) of the image (scalar kernel compiled by numba)."""
+  for f in range(tri_xy.shape[0]):
+    if not valid[f]:
+      continue
+    ax, ay = tri_xy[f, 0, 0], tri_xy[f, 0, 1]
+    bx, by = tri_xy[f, 1, 0], tri_xy[f, 1, 1]
+    cx, cy = tri_xy[f, 2, 0], tri_xy[f, 2, 1]
+    area = (bx - ax) * (cy - ay) - (by - ay) * (cx - ax)
+    if abs(area) <= 1e-12:
+      continue
+    x_min = max(int(np.ceil(min(ax, bx, cx) - 0.5)), 0)
+    x_max = min(int(np.floor(max(ax, bx, cx) - 0.5)), width - 1)
+    y_min = max(int(np.ceil(min(ay, by, cy) - 0.5)), row_start)
+    y_max = min(int(np.floor(max(ay, by, cy) - 0.5)), row_stop - 1)
+    for y in range(y_min, y_max + 1):
+      center_y = y + 0.5
+      for x in range(x_min, x_max + 1):
+        center_x = x + 0.5
+        w_a = ((bx - center_x) * (cy - center_y) - (by - center_y) * (cx - center_x)) / area
+        w_b = ((cx - center_x) * (ay - center_y) - (cy - center_y) * (ax - center_x)) / area
+        w_c = 1. - w_a - w_b
+        if w_a < 0 or w_b < 0 or w_c < 0:
+          continue
+        # perspective correct interpolation
+        w_a /= tri_z[f, 0]
+        w_b /= tri_z[f, 1]
+        w_c /= tri_z[f, 2]
+        z = 1. / (w_a + w_b + w_c)
+        pixel = y * width + x
+        if z < z_buffer[pixel]:
+          z_buffer[pixel] = z
+          face_idx[pixel] = f
+          barycentric[pixel, 0] = w_a * z
+          barycentric[pixel, 1] = w_b * z
+          barycentric[pixel, 2] = w_c * z
+
+
+if numba is not None:
+  _rasterize_tile_numba = numba.njit(nogil=True, cache=True)(_rasterize_tile_python)
+else:
+  _rasterize_tile_numba = None
+
+
+def rasterize_frame(scene: core.Scene, frame: int,
+                    camera: Optional[core.Camera] = None,
+                    assets: Optional[Sequence[core.PhysicalObject]] = None,
+                    num_threads: int = 1,
+                    use_numba: bool = False,
+                    resolution: Optional[Tuple[int, int]] = None) -> Dict[str, np.ndarray]:
+  """Rasterizes the annotation layers of all physical objects in the scene at a given frame.
+
+  Args:
+    scene: the kubric scene (only assets of type Cube, Sphere and FileBasedObject are drawn).
+    frame: the frame to rasterize.
+    camera: the camera to use (defaults to scene.camera).
+    assets: the assets to draw (defaults to all drawable assets of the scene).
+    num_threads: number of threads used by `rasterize_triangles`.
+    use_numba: use the numba compiled rasterization kernel.
+    resolution: the (width, height) of the output (defaults to scene.resolution).
+
+  Returns:
+    A dict in the format of `blender_utils.get_render_layers_from_exr` with the entries
+    "depth", "backward_flow", "forward_flow", "normal", "object_coordinates",
+    "segmentation_indices" and "segmentation_alphas".
+  """
+  camera = scene.camera if camera is None else camera
+  resolution = tuple(scene.resolution) if resolution is None else tuple(resolution)
+  width, height = resolution
+  world_to_cam, intrinsics = camera_projection(camera, frame, resolution)
+
+  if assets is None:
+    assets = [asset for asset in scene.assets if is_drawable(asset)]
+  meshes = [get_mesh(asset) for asset in assets]
+  transforms = [object_transform(asset, frame) for asset in assets]
+
+  # --- concatenate all meshes into a single triangle soup
+  vertex_offsets = np.cumsum([0] + [len(m.vertices) for m in meshes])
+  face_offsets = np.cumsum([0] + [len(m.faces) for m in meshes])
+  world_vertices = np.concatenate(
+      [m.vertices @ t[:3, :3].T + t[:3, 3] for m, t in zip(meshes, transforms)] +
+      [np.zeros((0, 3))])
+  faces = np.concatenate([m.faces + o for m, o in zip(meshes, vertex_offsets)] +
+                         [np.zeros((0, 3), dtype=np.int64)])
+  face_asset = np.concatenate([np.full(len(m.faces), i) for i, m in enumerate(meshes)] +
+                              [np.zeros(0, dtype=np.int64)]).astype(np.int64)
+
+  pixels, depth = project(world_vertices, world_to_cam, intrinsics)
+  face_idx, barycentric, z_buffer = rasterize_triangles(
+      pixels, depth, faces, resolution, near=camera.min_render_distance,
+      num_threads=num_threads, use_numba=use_numba)
+  z_buffer[z_buffer > camera.max_render_distance] = np.inf
+  hit = np.nonzero(np.isfinite(z_buffer))[0]
+  hit_face = face_idx[hit]
+  hit_asset = face_asset[hit_face]
+  weights = barycentric[hit]
+
+  output = {
+      "depth": np.full((height * width, 1), BACKGROUND_DEPTH, dtype=np.float32),
+      "normal": np.zeros((height * width, 3), dtype=np.float32),
+      "object_coordinates": np.zeros((height * width, 3), dtype=np.float32),
+      "segmentation_indices": np.zeros((height * width, 2), dtype=np.uint32),
+      "segmentation_alphas": np.zeros((height * width, 2), dtype=np.float32),
+  }
+  output["depth"][hit, 0] = z_buffer[hit]
+  output["segmentation_alphas"][hit, 0] = 1.
+
+  for i, (asset, mesh, transform) in enumerate(zip(assets, meshes, transforms)):
+    sel = np.nonzero(hit_asset == i)[0]
+    if sel.size == 0:
+      continue
+    pix = hit[sel]
+    local_faces = faces[hit_face[sel]] - vertex_offsets[i]
+    w = weights[sel]
+    local_points = np.einsum("nk,nkd->nd", w, mesh.vertices[local_faces])
+
+    output["segmentation_indices"][pix, 0] = mm3hash(asset.uid)
+    extent = mesh.bounds[1] - mesh.bounds[0]
+    output["object_coordinates"][pix] = (local_points - mesh.bounds[0]) / np.where(extent > 0,
+                                                                                   extent, 1.)
+
+    # normals: transform by the inverse transpose and make them face the camera
+    if mesh.smooth:
+      local_normals = np.einsum("nk,nkd->nd", w, mesh.normals[local_faces])
+    else:
+      local_normals = mesh.normals[hit_face[sel] - face_offsets[i]]
+    normals = local_normals @ np.linalg.inv(transform[:3, :3])
+    normals /= np.linalg.norm(normals, axis=-1, keepdims=True).clip(1e-12)
+    world_points = local_points @ transform[:3, :3].T + transform[:3, 3]
+    cam_position = np.linalg.inv(world_to_cam)[:3, 3]
+    facing_away = np.sum(normals * (world_points - cam_position), axis=-1) > 0
+    normals[facing_away] *= -1
+    output["normal"][pix] = normals
+
+  output = {k: v.reshape((height, width, -1)) for k, v in output.items()}
+  segmentation = np.zeros(height * width, dtype=np.int64)
+  segmentation[hit] = hit_asset + 1
+  # flow: where the same surface point is visible in the previous / next frame
+  backward_flow, forward_flow = optical_flow.compute_optical_flow(
+      output["object_coordinates"][None], segmentation.reshape((1, height, width, 1)),
+      scene, [frame], assets, [mesh.bounds for mesh in meshes], camera=camera,
+      resolution=resolution)
+  output["backward_flow"] = backward_flow[0]
+  output["forward_flow"] = forward_flow[0]
+  return output
+
+
+class Rasterizer(core.View):
+  """A CPU renderer for the annotation layers (depth, segmentation, normals, flow, ...) of a scene.
+
+  Produces the same output as `Blender.render` (except for "rgba", "rgb" and "uv") without needing
+  bpy, which makes it useful for generating annotations at a large scale.
+  """
+
+  def __init__(self,
+               scene: core.Scene,
+               num_threads: int = 1,
+               use_numba: bool = False):
+    """
+    Args:
+      scene: the kubric scene to render.
+      num_threads: number of threads used for rasterization (the image is split into tiles).
+      use_numba: rasterize using a numba compiled kernel (requires numba).
+    """
+    if use_numba and numba is None:
+      raise ImportError("Rasterizer(use_numba=True) requires the numba package to be installed.")
+    self.num_threads = num_threads
+    self.use_numba = use_numba
+
+    self.post_processors = {
+        "backward_flow": post_processing.process_backward_flow,
+        "forward_flow": post_processing.process_forward_flow,
+        "depth": post_processing.process_depth,
+        "z": post_processing.process_z,
+        "normal": post_processing.process_normal,
+        "object_coordinates": post_processing.process_object_coordinates,
+        "segmentation": post_processing.process_segementation,
+    }
+    super().__init__(scene, scene_observers={})
+
+  def render(self,
+             frames: Optional[Sequence[int]] = None,
+             return_layers: Sequence[str] = ("backward_flow", "forward_flow", "depth",
+                                             "normal", "object_coordinates", "segmentation"),
+             ) -> Dict[str, np.ndarray]:
+    """Renders all frames (or a subset) of the animation and returns images as a dict of arrays.
+
+    Args:
+      frames: list of frames to render (defaults to range(scene.frame_start, scene.frame_end+1)).
+      return_layers: list of layers to return. For possible values refer to
+        the Rasterizer.post_processors dict.
+
+    Returns:
+      A dictionary with one entry for each return layer in the format of `Blender.render`.
+    """
+    if frames is None:
+      frames = range(self.scene.frame_start, self.scene.frame_end + 1)
+    assets = [asset for asset in self.scene.assets if self in asset.linked_objects]
+
+    data_stack = collections.defaultdict(list)
+    for frame_nr in frames:
+      source_layers = rasterize_frame(self.scene, frame_nr, assets=assets,
+                                      num_threads=self.num_threads, use_numba=self.use_numba)
+      logger.info("Rasterized frame %d", frame_nr)
+      for key in return_layers:
+        post_processor = self.post_processors[key]
+        data_stack[key].append(post_processor(source_layers, self.scene))
+
+    return {key: np.stack(data_stack[key], axis=0)
+            for key in data_stack}
+
+  def render_still(
+      self,
+      frame: Optional[int] = None,
+      return_layers: Sequence[str] = ("backward_flow", "forward_flow", "depth",
+                                      "normal", "object_coordinates", "segmentation"),
+  ) -> Dict[str, np.ndarray]:
+    """Render a single frame (first frame by default).
+
+    Args:
+      frame: Which frame to render (defaults to scene.frame_start).
+      return_layers: list of layers to return (see `render`).
+
+    Returns:
+      A dictionary with one entry for each return layer in the format of `Blender.render_still`.
+    """
+    frame = self.scene.frame_start if frame is None else frame
+    result = self.render(frames=[frame], return_layers=return_layers)
+    return {k: v[0] for k, v in result.items()}
+
+  @functools.singledispatchmethod
+  def add_asset(self, asset: core.Asset) -> Any:
+    raise NotImplementedError(f"Cannot add {asset!r}")
+
+  def remove_asset(self, asset: core.Asset) -> None:
+    pass  # meshes are shared through the module-level cache
+
+  @add_asset.register(core.Cube)
+  @add_asset.register(core.Sphere)
+  @add_asset.register(core.FileBasedObject)
+  def _add_asset(self, asset: core.PhysicalObject):
+    if not is_drawable(asset):
+      return None
+    return get_mesh(asset)
+
+  @add_asset.register(core.Camera)
+  @add_asset.register(core.Light)
+  @add_asset.register(core.Material)
+  def _add_asset(self, asset: core.Asset):  # pylint: disable=function-redefined
+    logger.debug("Ignoring %r (not needed for rasterization)", asset)
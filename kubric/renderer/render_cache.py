@@ -0,0 +1,178 @@
+# Copyright 2024 The Kubric Authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""A size-bounded on-disk cache for rendered frames, keyed by a hash of the scene content.
+
+The key of a frame covers everything in the kubric scene that can influence its rendering:
+the traits of all assets (and of the assets they reference, such as materials and textures),
+their values at the previous / current / next frame (for flow and motion blur), the render
+relevant metadata (the LOD levels), the digests of all referenced files (render files, textures,
+LOD variants and e.g. environment maps in the render settings), the scene settings and renderer
+specific settings.
+Frames with identical keys (e.g. frames of a static scene) produce identical outputs, which is
+used by `Blender.render` to render them only once.
+Note that modifications made directly to the renderer (e.g. via bpy) are not covered by the key.
+This module does not depend on bpy.
+"""
+
+import hashlib
+import json
+import os
+from typing import Any, Dict, Optional, Sequence
+
+import numpy as np
+
+from kubric import core
+from kubric.cache import ArrayCache
+from kubric.cache import file_digest
+from kubric.kubric_typing import PathLike
+
+# scene traits that do not influence the rendering of a single frame
+_IGNORED_SCENE_TRAITS = ("uid", "frame_start", "frame_end")
+# asset traits that do not influence rendering (uids are counted per process)
+_IGNORED_ASSET_TRAITS = ("uid", "metadata")
+# entries of the asset metadata that do influence rendering (see `kubric.renderer.lod`)
+_RENDER_METADATA_KEYS = ("lods",)
+# the traits, metadata entries and render settings whose values are file paths
+# (the digests of the files are part of the keys)
+_PATH_NAMES = ("render_filename", "simulation_filename", "filename", "custom_scene", "images")
+
+
+class _AssetReferences:
+  """Canonical ids of assets, which (unlike uids) do not depend on previously created assets.
+
+  The assets of the scene are referred to by their index in scene.assets, other assets (e.g.
+  materials and textures) by the order in which they are first referenced.
+  """
+
+  def __init__(self, scene_assets: Sequence[core.Asset]):
+    self.assets = list(scene_assets)
+    self._ids = {asset.uid: i for i, asset in enumerate(self.assets)}
+
+  def __call__(self, asset: core.Asset) -> int:
+    if asset.uid not in self._ids:
+      self._ids[asset.uid] = len(self.assets)
+      self.assets.append(asset)
+    return self._ids[asset.uid]
+
+
+def _canonical(value, references: _AssetReferences, is_path: bool = False):
+  """Converts a trait value into a JSON serializable form (collecting referenced assets).
+
+  Args:
+    value: the value to convert.
+    references: the canonical ids of the assets (collects the assets referenced by the value).
+    is_path: whether (string) values are file paths, in which case the digests of existing files
+      are included. Entries of dicts are paths if their key is in `_PATH_NAMES`.
+  """
+  if isinstance(value, core.Asset):
+    return {"asset": references(value)}
+  if isinstance(value, dict):
+    return {str(k): _canonical(v, references, is_path=k in _PATH_NAMES)
+            for k, v in sorted(value.items())}
+  if isinstance(value, (list, tuple, np.ndarray)):
+    return [_canonical(v, references, is_path=is_path) for v in value]
+  if isinstance(value, (bool, str)) or value is None:
+    if is_path and isinstance(value, str) and os.path.isfile(value):
+      return {"file": value, "sha256": file_digest(value)}
+    return value
+  if isinstance(value, (int, float, np.number)):
+    return float(value)
+  return repr(value)
+
+
+def _render_metadata(asset: core.Asset) -> Dict[str, Any]:
+  """The entries of the asset metadata that influence rendering (e.g. the LOD levels)."""
+  metadata = {key: asset.metadata[key] for key in _RENDER_METADATA_KEYS if key in asset.metadata}
+  render_filename = getattr(asset, "render_filename", None)
+  if metadata.get("lods") and render_filename:
+    # the LOD variants are stored in the directory of the render file
+    directory = os.path.dirname(render_filename)
+    metadata["lods"] = [dict(level, filename=os.path.join(directory, level["filename"]))
+                        for level in metadata["lods"]]
+  return metadata
+
+
+def _asset_state(asset: core.Asset, references: _AssetReferences):
+  """The static (non-keyframed) traits of an asset."""
+  return {
+      "type": type(asset).__name__,
+      "traits": {name: _canonical(getattr(asset, name), references, is_path=name in _PATH_NAMES)
+                 for name in sorted(asset.trait_names())
+                 if name not in _IGNORED_ASSET_TRAITS and not asset.keyframes.get(name)},
+      "metadata": _canonical(_render_metadata(asset), references),
+  }
+
+
+def _hash(data) -> str:
+  return hashlib.sha256(json.dumps(data, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+def frame_keys(scene: core.Scene,
+               frames: Sequence[int],
+               render_settings: Optional[Dict[str, Any]] = None,
+               frame_settings: Optional[Dict[int, Any]] = None) -> Dict[int, str]:
+  """Computes a deterministic content hash for each frame.
+
+  Args:
+    scene: the kubric scene.
+    frames: the frames to compute keys for.
+    render_settings: (JSON serializable) renderer settings that influence all frames.
+    frame_settings: optional (JSON serializable) renderer settings for each frame.
+
+  Returns:
+    A dict {frame: key} where key is a hex string.
+  """
+  references = _AssetReferences(scene.assets)
+  static_state = {
+      "scene": {name: _canonical(getattr(scene, name), references)
+                for name in sorted(scene.trait_names()) if name not in _IGNORED_SCENE_TRAITS},
+      "assets": [_asset_state(asset, references) for asset in scene.assets],
+      "render_settings": _canonical(render_settings, references),
+  }
+  # assets that are only referenced by other assets (e.g. materials and textures), which can in
+  # turn reference further assets
+  referenced_state = []
+  while len(scene.assets) + len(referenced_state) < len(references.assets):
+    asset = references.assets[len(scene.assets) + len(referenced_state)]
+    referenced_state.append(_asset_state(asset, references))
+  static_state["referenced_assets"] = referenced_state
+  static_hash = _hash(static_state)
+
+  animated_assets = [(i, asset) for i, asset in enumerate(references.assets)
+                     if any(asset.keyframes.values())]
+  frame_settings = {} if frame_settings is None else frame_settings
+  keys = {}
+  for frame in frames:
+    # include the neighbouring frames, since flow and motion blur depend on them
+    animated_state = [
+        [i, {name: [_canonical(asset.get_value_at(name, f), references)
+                    for f in (frame - 1, frame, frame + 1)]
+             for name in sorted(asset.keyframes) if asset.keyframes[name]}]
+        for i, asset in animated_assets]
+    keys[frame] = _hash([static_hash, animated_state,
+                         _canonical(frame_settings.get(frame), references)])
+  return keys
+
+
+class RenderCache(ArrayCache):
+  """Stores the (post-processed) layers of rendered frames on disk with LRU eviction."""
+
+  def __init__(self, directory: PathLike, max_size_bytes: int = 10 * 2**30):
+    """
+    Args:
+      directory: where to store the cached frames (can be shared across runs).
+      max_size_bytes: the least recently used frames are evicted once the cache exceeds this size.
+    """
+    super().__init__(directory, max_size_bytes=max_size_bytes)
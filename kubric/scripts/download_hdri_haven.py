@@ -29,6 +29,7 @@ import tqdm
 
 from kubric import file_io
 from kubric.kubric_typing import PathLike
+from kubric.renderer import hdri
 
 
 def collect_list_of_available_assets(
@@ -84,7 +85,45 @@ def download_all(assets_list, num_processes=16, download_dir='GSO_raw'):
         pbar.update(1)
 
 
-def kubricify(asset, source_dir, target_dir):
+def make_mip_variants(hdri_path, target_dir, widths=hdri.MIP_WIDTHS, half_float=False):
+  """Writes downscaled copies of an (equirectangular) HDRI as EXR files into target_dir.
+
+  The variants are named according to `hdri.mip_variant_path` and are used by the renderer when
+  `select_hdri_variant=True` (see `kubric.renderer.hdri`).
+
+  Args:
+    hdri_path: the full resolution environment map.
+    target_dir: the directory to write the variants to.
+    widths: the widths (in pixels) of the variants. Widths that are not smaller than the
+      original are skipped.
+    half_float: whether to store the variants with 16 instead of 32 bits per channel.
+
+  Returns:
+    A dict {width: filename} of the written variants.
+  """
+  # pylint: disable=import-outside-toplevel
+  from kubric.safeimport.bpy import bpy
+  hdri_path = file_io.as_path(hdri_path)
+  target_dir = file_io.as_path(target_dir)
+  image_settings = bpy.context.scene.render.image_settings
+  image_settings.file_format = "OPEN_EXR"
+  image_settings.color_depth = "16" if half_float else "32"
+  image_settings.exr_codec = "ZIP"
+
+  variants = {}
+  for width in sorted(widths):
+    image = bpy.data.images.load(str(hdri_path))
+    original_width, original_height = image.size
+    if width < original_width:
+      image.scale(width, max(1, round(original_height * width / original_width)))
+      filename = hdri.mip_variant_path(hdri_path, width).name
+      image.save_render(str(target_dir / filename), scene=bpy.context.scene)
+      variants[width] = filename
+    bpy.data.images.remove(image)
+  return variants
+
+
+def kubricify(asset, source_dir, target_dir, mip_widths=hdri.MIP_WIDTHS, half_float=False):
   name = asset["id"]
   source_dir = file_io.as_path(source_dir)
   target_dir = file_io.as_path(target_dir)
@@ -110,10 +149,18 @@ def kubricify(asset, source_dir, target_dir):
   del asset_entry["url"]
   asset_entry["kwargs"]["filename"] = "environment_4k.hdr"
 
+  # lower resolution variants (stored next to the original, see kubric.renderer.hdri)
+  hdri_path = tmp_dir / asset_entry["kwargs"]["filename"]
+  shutil.copyfile(hdri_source_path, hdri_path)
+  mip_variants = make_mip_variants(hdri_path, tmp_dir, widths=mip_widths, half_float=half_float)
+  asset_entry["metadata"]["mip_variants"] = mip_variants
+
   file_io.write_json(asset_entry, json_path)
 
   with tarfile.open(tar_path, "w:gz") as tar:
-    tar.add(hdri_source_path, asset_entry["kwargs"]["filename"])
+    tar.add(hdri_path, asset_entry["kwargs"]["filename"])
+    for filename in mip_variants.values():
+      tar.add(tmp_dir / filename, filename)
     tar.add(json_path, "data.json")
 
   shutil.rmtree(tmp_dir)
@@ -123,7 +170,9 @@ def kubricify(asset, source_dir, target_dir):
 def main(
     download_dir: PathLike = "GSO_raw",
     target_dir: PathLike = "GSO",
-    keep_raw_assets=False
+    keep_raw_assets=False,
+    mip_widths=hdri.MIP_WIDTHS,
+    half_float=False,
 ):
   download_dir = file_io.as_path(download_dir)
   target_dir = file_io.as_path(target_dir)
@@ -134,7 +183,9 @@ def main(
     with multiprocessing.Pool(32, maxtasksperchild=1) as pool:
       promise = pool.imap_unordered(functools.partial(kubricify,
                                                       source_dir=download_dir,
-                                                      target_dir=target_dir),
+                                                      target_dir=target_dir,
+                                                      mip_widths=mip_widths,
+                                                      half_float=half_float),
                                     catalogue)
       for name, entry in promise:
         assets[name] = entry
@@ -158,6 +209,9 @@ if __name__ == '__main__':
   parser.add_argument("--download_dir", type=str, default="HDRI_haven_raw")
   parser.add_argument("--target_dir", type=str, default="HDRI_haven")
   parser.add_argument("--keep_raw_assets", type=bool, default=False)
+  parser.add_argument("--mip_widths", type=int, nargs="*", default=list(hdri.MIP_WIDTHS))
+  parser.add_argument("--half_float", action="store_true")
   FLAGS, unused = parser.parse_known_args()
   main(download_dir=FLAGS.download_dir, target_dir=FLAGS.target_dir,
-       keep_raw_assets=FLAGS.keep_raw_assets)
+       keep_raw_assets=FLAGS.keep_raw_assets, mip_widths=FLAGS.mip_widths,
+       half_float=FLAGS.half_float)
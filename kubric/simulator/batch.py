@@ -0,0 +1,202 @@
+# Copyright 2024 The Kubric Authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Simulation of many scenes in a pool of worker processes (without a renderer).
+
+The physics of a scene is described by a JSON serializable spec (see `scene_spec`), e.g.
+
+  specs = [scene_spec(make_scene(seed)) for seed in range(1000)]
+  results = simulate_batch(specs)  # uses one process (and one pybullet client) per core
+
+Each result is a dict of compact arrays (the `SIMULATION_ARRAYS` of
+`kubric.simulator.simulation_cache`) with the states of the objects of the spec as arrays of
+shape (frames, objects, 3 / 4) and the contacts, which refer to the objects by their index.
+They can be stored (e.g. with np.savez) and later be transferred to the assets of a render job
+with `load_result`.
+"""
+
+import inspect
+import logging
+import multiprocessing
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from kubric import core
+from kubric.simulator.contacts import ContactBuffer
+from kubric.simulator.pybullet import PyBullet
+from kubric.simulator.simulation_cache import SIMULATION_TRAITS, STATE_ARRAYS
+
+logger = logging.getLogger(__name__)
+
+# the asset types that can be part of a spec
+SPEC_ASSET_TYPES = {cls.__name__: cls for cls in (core.Cube, core.Sphere, core.FileBasedObject)}
+# the arguments of PyBullet that influence the simulation
+SIMULATOR_SETTINGS = ("cache_urdf_shapes", "num_substeps", "solver_iterations")
+
+
+def _is_simulated(asset: core.Asset) -> bool:
+  """Whether PyBullet simulates the asset (file based objects need a simulation file)."""
+  if type(asset).__name__ not in SPEC_ASSET_TYPES:
+    return False
+  return not isinstance(asset, core.FileBasedObject) or bool(asset.simulation_filename)
+
+
+def scene_spec(scene: core.Scene,
+               assets: Optional[Sequence[core.PhysicalObject]] = None,
+               frame_start: Optional[int] = None,
+               frame_end: Optional[int] = None,
+               simulator: Optional[PyBullet] = None,
+               **run_kwargs) -> Dict[str, Any]:
+  """Describes the physics of a scene as a JSON serializable dict.
+
+  Args:
+    scene: the kubric scene (for the gravity, step rate, frame rate and frame range).
+    assets: the simulated objects (defaults to all cubes, spheres and file based objects with a
+      simulation file of the scene).
+    frame_start: the first simulated frame (defaults to scene.frame_start).
+    frame_end: the last simulated frame (defaults to scene.frame_end).
+    simulator: the simulator whose settings (`SIMULATOR_SETTINGS`) are used. Defaults to the
+      PyBullet view of the scene, or to the default settings if there is none.
+    **run_kwargs: further (JSON serializable) arguments of `PyBullet.run`, e.g. rest_threshold.
+
+  Returns:
+    The spec as a dict.
+  """
+  if simulator is None:
+    simulator = next((view for view in scene.views if isinstance(view, PyBullet)), None)
+  if simulator is None:
+    parameters = inspect.signature(PyBullet.__init__).parameters
+    settings = {name: parameters[name].default for name in SIMULATOR_SETTINGS}
+  else:
+    settings = {name: getattr(simulator, name) for name in SIMULATOR_SETTINGS}
+  if assets is None:
+    assets = [asset for asset in scene.assets if _is_simulated(asset)]
+  objects = []
+  for asset in assets:
+    if type(asset).__name__ not in SPEC_ASSET_TYPES:
+      raise ValueError(f"Cannot simulate {asset} in a batch (unsupported type).")
+    if not _is_simulated(asset):
+      raise ValueError(f"Cannot simulate {asset} in a batch (it has no simulation_filename).")
+    obj = {"type": type(asset).__name__, "name": asset.name}
+    obj.update({name: np.asarray(getattr(asset, name)).tolist() for name in SIMULATION_TRAITS})
+    if isinstance(asset, core.FileBasedObject):
+      obj["simulation_filename"] = asset.simulation_filename
+    objects.append(obj)
+  return {
+      "gravity": np.asarray(scene.gravity).tolist(),
+      "step_rate": scene.step_rate,
+      "frame_rate": scene.frame_rate,
+      "frame_start": scene.frame_start if frame_start is None else frame_start,
+      "frame_end": scene.frame_end if frame_end is None else frame_end,
+      "objects": objects,
+      "simulator": settings,
+      "run": run_kwargs,
+  }
+
+
+def build_scene(spec: Dict[str, Any]) -> Tuple[core.Scene, List[core.PhysicalObject]]:
+  """Creates a kubric scene and the objects (in the order of the spec) from a spec."""
+  scene = core.Scene(gravity=spec["gravity"], step_rate=spec["step_rate"],
+                     frame_rate=spec["frame_rate"], frame_start=spec["frame_start"],
+                     frame_end=spec["frame_end"])
+  assets = []
+  for obj in spec["objects"]:
+    traits = {name: value for name, value in obj.items() if name != "type"}
+    assets.append(SPEC_ASSET_TYPES[obj["type"]](**traits))
+  return scene, assets
+
+
+def simulate_spec(spec: Dict[str, Any]) -> Dict[str, np.ndarray]:
+  """Simulates the scene of a spec (in the current process).
+
+  Returns:
+    The states (as float32 arrays of shape (frames, objects, 3 / 4)) and the contacts (with the
+    objects as indices into spec["objects"]), as a dict with the keys `SIMULATION_ARRAYS`.
+  """
+  scene, assets = build_scene(spec)
+  simulator = PyBullet(scene, **spec["simulator"])
+  scene.add(assets)
+  animation, collisions = simulator.run(frame_start=spec["frame_start"],
+                                        frame_end=spec["frame_end"], **spec["run"])
+  index = {asset.linked_objects[simulator]: i for i, asset in enumerate(assets)}
+  result = {name: np.stack([animation[asset][name] for asset in assets], axis=1)
+            .astype(np.float32) for name in STATE_ARRAYS}
+  result["contact_body_a"] = np.array([index[i] for i in collisions.body_a], dtype=np.int32)
+  result["contact_body_b"] = np.array([index[i] for i in collisions.body_b], dtype=np.int32)
+  result["contact_position"] = collisions.position.astype(np.float32)
+  result["contact_normal"] = collisions.contact_normal.astype(np.float32)
+  result["contact_frame"] = collisions.frame.astype(np.float32)
+  result["contact_force"] = collisions.force.astype(np.float32)
+  return result
+
+
+def simulate_batch(specs: Sequence[Dict[str, Any]],
+                   processes: Optional[int] = None,
+                   start_method: Optional[str] = None) -> List[Dict[str, np.ndarray]]:
+  """Simulates many scenes in parallel, with one pybullet (DIRECT) client per worker process.
+
+  Args:
+    specs: the scenes to simulate (see `scene_spec`).
+    processes: the number of worker processes (defaults to the number of cores). With a single
+      process the scenes are simulated in the current process.
+    start_method: the multiprocessing start method (e.g. "spawn" if the calling process uses
+      threads), defaults to the one of the platform.
+
+  Returns:
+    The results of `simulate_spec` in the order of the specs.
+  """
+  processes = multiprocessing.cpu_count() if processes is None else processes
+  processes = min(processes, len(specs))
+  if processes <= 1:
+    return [simulate_spec(spec) for spec in specs]
+
+  results = []
+  context = multiprocessing.get_context(start_method)
+  with context.Pool(processes) as pool:
+    for result in pool.imap(simulate_spec, specs):
+      results.append(result)
+      logger.info("Simulated %d of %d scenes", len(results), len(specs))
+  return results
+
+
+def load_result(assets: Sequence[core.PhysicalObject],
+                result: Dict[str, np.ndarray],
+                frame_start: int) -> ContactBuffer:
+  """Transfers a simulation result to the assets (e.g. of a render job) as keyframes.
+
+  Like after `PyBullet.run`, the assets are left in the state of the last frame.
+
+  Args:
+    assets: the objects of the simulated spec (in the same order).
+    result: the result of `simulate_spec`.
+    frame_start: the first simulated frame (spec["frame_start"]).
+
+  Returns:
+    The contacts (with the given assets as their "instances"), e.g. for `kb.process_collisions`.
+  """
+  num_frames = len(result["position"])
+  frames = list(range(frame_start, frame_start + num_frames))
+  for i, asset in enumerate(assets):
+    for name in STATE_ARRAYS:
+      values = result[name][:, i]
+      setattr(asset, name, values[-1])
+      asset.keyframe_insert_many(name, frames, values)
+
+  collisions = ContactBuffer(dict(enumerate(assets)),
+                             capacity=max(len(result["contact_force"]), 1))
+  collisions.extend(result["contact_body_a"], result["contact_body_b"],
+                    result["contact_position"], result["contact_normal"],
+                    result["contact_frame"], result["contact_force"])
+  return collisions
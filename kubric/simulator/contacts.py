@@ -0,0 +1,121 @@
+# Copyright 2024 The Kubric Authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Columnar recording of the contacts between simulated bodies.
+
+`PyBullet.run` appends the contacts of every simulation step to a `ContactBuffer`, which stores
+them in (amortized) growing numpy arrays instead of one dict per contact. Iterating over (or
+indexing) the buffer still yields the collision events as dicts, as consumed by
+`kubric.process_collisions`. `ContactBuffer.aggregate` merges all contacts of a pair of bodies
+within a frame into a single event.
+This module does not depend on pybullet.
+"""
+
+from typing import Any, Dict, Iterator, Mapping, Optional
+
+import numpy as np
+
+from kubric import core
+
+# name -> (dtype, shape of one entry)
+CONTACT_FIELDS = {
+    "body_a": (np.int64, ()),
+    "body_b": (np.int64, ()),
+    "position": (np.float64, (3,)),
+    "contact_normal": (np.float64, (3,)),
+    "frame": (np.float64, ()),
+    "force": (np.float64, ()),
+}
+
+
+class ContactBuffer:
+  """Stores contact events (one row per contact) in preallocated numpy arrays."""
+
+  def __init__(self, body_to_asset: Optional[Mapping[int, core.Asset]] = None,
+               capacity: int = 1024):
+    """
+    Args:
+      body_to_asset: maps the body ids of the simulator to assets (for the "instances" of events).
+      capacity: the initial number of rows (the buffer grows as needed).
+    """
+    self.body_to_asset = {} if body_to_asset is None else body_to_asset
+    self._size = 0
+    self._columns = {name: np.zeros((capacity,) + shape, dtype=dtype)
+                     for name, (dtype, shape) in CONTACT_FIELDS.items()}
+
+  def __len__(self) -> int:
+    return self._size
+
+  def __getattr__(self, name: str) -> np.ndarray:
+    if name in CONTACT_FIELDS and "_columns" in self.__dict__:
+      return self._columns[name][:self._size]
+    raise AttributeError(name)
+
+  def _reserve(self, num_rows: int):
+    capacity = len(self._columns["frame"])
+    if self._size + num_rows > capacity:
+      new_capacity = max(2 * capacity, self._size + num_rows)
+      for name, column in self._columns.items():
+        self._columns[name] = np.resize(column, (new_capacity,) + column.shape[1:])
+
+  def extend(self, body_a, body_b, position, contact_normal, frame, force):
+    """Appends multiple contacts (each argument is an array or sequence of the same length)."""
+    values = {"body_a": body_a, "body_b": body_b, "position": position,
+              "contact_normal": contact_normal, "frame": frame, "force": force}
+    num_rows = len(force)
+    if not num_rows:
+      return
+    self._reserve(num_rows)
+    for name, value in values.items():
+      self._columns[name][self._size:self._size + num_rows] = value
+    self._size += num_rows
+
+  def aggregate(self) -> "ContactBuffer":
+    """Merges all contacts between the same two bodies within the same frame.
+
+    Of each group, the contact with the largest force is kept (with its position, normal and
+    sub-frame time).
+
+    Returns:
+      A new buffer with one row per (body_a, body_b, frame), in chronological order.
+    """
+    frame = np.floor(self.frame).astype(np.int64)
+    groups = np.stack([self.body_a, self.body_b, frame], axis=1)
+    _, group_ids = np.unique(groups, axis=0, return_inverse=True)
+    group_ids = group_ids.reshape(-1)
+    # sort by group and (descending) force, so that the first row of each group is its maximum
+    order = np.lexsort((-self.force, group_ids))
+    first = np.ones(len(order), dtype=bool)
+    first[1:] = group_ids[order][1:] != group_ids[order][:-1]
+    keep = np.sort(order[first])
+
+    aggregated = ContactBuffer(self.body_to_asset, capacity=max(len(keep), 1))
+    aggregated.extend(**{name: getattr(self, name)[keep] for name in CONTACT_FIELDS})
+    return aggregated
+
+  def __getitem__(self, index: int) -> Dict[str, Any]:
+    if not -self._size <= index < self._size:
+      raise IndexError(index)
+    index %= self._size
+    return {
+        "instances": (self.body_to_asset.get(int(self.body_a[index])),
+                      self.body_to_asset.get(int(self.body_b[index]))),
+        "position": tuple(self.position[index]),
+        "contact_normal": tuple(self.contact_normal[index]),
+        "frame": float(self.frame[index]),
+        "force": float(self.force[index]),
+    }
+
+  def __iter__(self) -> Iterator[Dict[str, Any]]:
+    return (self[i] for i in range(self._size))
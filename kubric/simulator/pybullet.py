@@ -14,17 +14,24 @@
 
 # pylint: disable=function-redefined
 
+import collections
+import contextlib
 import functools
 import inspect
 import logging
 import pathlib
 import sys
 import tempfile
-from typing import Dict, List, Optional, Tuple, Union
+from typing import Dict, NamedTuple, Optional, Tuple, Union
+from xml.etree import ElementTree
 
 from kubric import core
+from kubric import file_io
 from kubric.redirect_io import RedirectStream
-import tensorflow as tf
+from kubric.simulator.contacts import ContactBuffer
+from kubric.simulator.simulation_cache import SIMULATION_ARRAYS, STATE_ARRAYS
+from kubric.simulator.simulation_cache import SimulationCache, simulation_key
+import numpy as np
 
 # --- hides the "pybullet build time: May 26 2021 18:52:36" message on import
 with RedirectStream(stream=sys.stderr):
@@ -37,6 +44,8 @@ class _BulletClient:
 
   def __init__(self, connection_mode: int):
     self._client = pb.connect(connection_mode)
+    # the setters registered by `register_physical_object_setters` are skipped if False
+    self.setters_enabled = True
 
   @property
   def client(self):
@@ -59,9 +68,45 @@ class _BulletClient:
 class PyBullet(core.View):
   """Adds physics simulation on top of kb.Scene using PyBullet."""
 
-  def __init__(self, scene: core.Scene, scratch_dir=tempfile.mkdtemp()):
+  def __init__(self, scene: core.Scene, scratch_dir=tempfile.mkdtemp(),
+               cache_urdf_shapes: bool = False,
+               simulation_cache: Optional[SimulationCache] = None,
+               num_substeps: int = 0,
+               solver_iterations: int = 50):
+    """
+    Args:
+      scene: the kubric scene to simulate.
+      scratch_dir: where to store temporary files (e.g. by `save_state`).
+      cache_urdf_shapes: Whether to load the collision shape of a (single link) URDF file only once
+        per file and scale, and to create further instances with createMultiBody instead of
+        loadURDF. This is much faster for repeated assets, but the inertia computed by
+        createMultiBody differs slightly (a few percent) from the one of loadURDF, so that
+        simulations are not identical to the uncached ones. Collision shapes of primitives (cubes,
+        spheres) are always reused, since that does not change the simulation.
+      simulation_cache: If given, the results of `run` are stored in (and restored from) this
+        cache, keyed by the initial conditions of the simulation (see `simulation_key`).
+      num_substeps: The number of substeps into which pybullet subdivides each simulation step
+        (0 to disable). The length of a step is 1 / scene.step_rate.
+      solver_iterations: The (maximal) number of iterations of the constraint solver per step.
+        See benchmarks/simulation.py for the effect of these settings on accuracy and speed.
+    """
     self.scratch_dir = scratch_dir
+    self.cache_urdf_shapes = cache_urdf_shapes
+    self.simulation_cache = simulation_cache
+    self.num_substeps = num_substeps
+    self.solver_iterations = solver_iterations
+    # (type, file / size, scale) -> collision shape id (or _UrdfShape)
+    self._collision_shapes = {}
+    self.shape_cache_statistics = collections.Counter(hits=0, misses=0)
     self._physics_client = _BulletClient(pb.DIRECT)  # pb.GUI
+    # the states of all bodies recorded by the last call of `run`
+    # as {"position": array of shape (frames, bodies, 3), "quaternion": ..., ...}
+    self.last_states = None
+    # the number of simulated and skipped steps of the last call of `run` (and whether its
+    # results were restored from the simulation cache)
+    self.last_run_statistics = {}
+    # pybullet body id -> asset (kept up to date by add_asset and remove_asset)
+    self._body_to_asset: Dict[int, core.PhysicalObject] = {}
 
     # --- Set some parameters to fix the sticky-walls problem; see
     # https://github.com/bulletphysics/bullet3/issues/3094
@@ -71,15 +116,22 @@ class PyBullet(core.View):
                                  contactSlop=0.,
                                  enableConeFriction=False,
                                  deterministicOverlappingPairs=True)
-    # TODO: setTimeStep if scene.step_rate != 240 Hz
     super().__init__(
         scene,
         scene_observers={
             "gravity": [
                 lambda change: self._physics_client.setGravity(*change.new)
             ],
+            "step_rate": [
+                lambda change: self._set_time_step(change.new)
+            ],
         })
 
+  def _set_time_step(self, step_rate: int):
+    self._physics_client.setPhysicsEngineParameter(fixedTimeStep=1. / step_rate,
+                                                   numSubSteps=self.num_substeps,
+                                                   numSolverIterations=self.solver_iterations)
+
   @property
   def physics_client(self):
     return self._physics_client.client
@@ -91,8 +143,79 @@ class PyBullet(core.View):
   def remove_asset(self, asset: core.Asset) -> None:
     if self in asset.linked_objects:
       self._physics_client.removeBody(asset.linked_objects[self])
+      self._body_to_asset.pop(asset.linked_objects[self], None)
     # TODO(klausg): unobserve
 
+  def add_assets(self, assets):
+    """Creates identical primitives (and cached URDF shapes) with one createMultiBody call each.
+
+    Note that the body ids (and thus the order in which the solver handles the bodies) differ
+    from adding the assets one by one, so that the simulation is not identical.
+    """
+    body_ids = [None] * len(assets)
+    batches = collections.defaultdict(list)
+    for i, asset in enumerate(assets):
+      batch_key = self._batch_key(asset)
+      if batch_key is None:
+        body_ids[i] = self.add_asset(asset)
+      else:
+        batches[batch_key].append(i)
+
+    for (collision_idx, mass, inertial_position), indices in batches.items():
+      # useMaximalCoordinates and contactProcessingThreshold are required to
+      # fix the sticky walls issue;
+      # see https://github.com/bulletphysics/bullet3/issues/3094
+      created = self._physics_client.createMultiBody(
+          mass,
+          collision_idx,
+          -1,
+          batchPositions=[assets[i].position for i in indices],
+          baseInertialFramePosition=inertial_position,
+          useMaximalCoordinates=True)
+      for i, body_idx in zip(indices, created):
+        self._physics_client.changeDynamics(
+            body_idx, -1, contactProcessingThreshold=0)
+        self._link_body(assets[i], body_idx)
+        body_ids[i] = body_idx
+    return body_ids
+
+  def _batch_key(self, asset: core.Asset):
+    """The (collision shape, mass, inertial position) of assets that can be created in batches."""
+    if isinstance(asset, core.Cube):
+      collision_idx = self._collision_shape(
+          ("box", tuple(float(x) for x in asset.scale)),
+          lambda: self._physics_client.createCollisionShape(pb.GEOM_BOX, halfExtents=asset.scale))
+      return collision_idx, 0 if asset.static else asset.mass, (0., 0., 0.)
+    if isinstance(asset, core.Sphere) and asset.scale[0] == asset.scale[1] == asset.scale[2]:
+      radius = asset.scale[0]
+      collision_idx = self._collision_shape(
+          ("sphere", float(radius)),
+          lambda: self._physics_client.createCollisionShape(pb.GEOM_SPHERE, radius=radius))
+      return collision_idx, 0 if asset.static else asset.mass, (0., 0., 0.)
+    if (isinstance(asset, core.FileBasedObject) and self.cache_urdf_shapes and
+        asset.simulation_filename is not None and
+        asset.scale[0] == asset.scale[1] == asset.scale[2]):
+      path = pathlib.Path(asset.simulation_filename).resolve()
+      if path.suffix != ".urdf" or not path.exists():
+        return None
+      scale = asset.scale[0]
+      urdf_shape = self._collision_shape(("urdf", str(path), float(scale)),
+                                         lambda: self._load_urdf_shape(path, scale))
+      if urdf_shape is not None:
+        return (urdf_shape.collision_idx, 0 if asset.static else urdf_shape.mass,
+                urdf_shape.inertial_position)
+    return None
+
+  def _body_ids(self):
+    """The ids of all bodies in the simulation.
+
+    Bodies created in a batch are missing from getNumBodies / getBodyUniqueId (which only know the
+    last body of each batch), so the bodies of the assets are added explicitly.
+    """
+    body_ids = {self._physics_client.getBodyUniqueId(i)
+                for i in range(self._physics_client.getNumBodies())}
+    return sorted(body_ids | set(self._body_to_asset))
+
   @add_asset.register(core.Camera)
   def _add_object(self, obj: core.Camera) -> None:
     logger.debug("Ignored camera %s", obj)
@@ -107,8 +230,9 @@ class PyBullet(core.View):
 
   @add_asset.register(core.Cube)
   def _add_object(self, obj: core.Cube) -> Optional[int]:
-    collision_idx = self._physics_client.createCollisionShape(
-        pb.GEOM_BOX, halfExtents=obj.scale)
+    collision_idx = self._collision_shape(
+        ("box", tuple(float(x) for x in obj.scale)),
+        lambda: self._physics_client.createCollisionShape(pb.GEOM_BOX, halfExtents=obj.scale))
     visual_idx = -1
     mass = 0 if obj.static else obj.mass
     # useMaximalCoordinates and contactProcessingThreshold are required to
@@ -123,7 +247,7 @@ class PyBullet(core.View):
         useMaximalCoordinates=True)
     self._physics_client.changeDynamics(
         box_idx, -1, contactProcessingThreshold=0)
-    register_physical_object_setters(obj, box_idx, self._physics_client)
+    self._link_body(obj, box_idx)
 
     return box_idx
 
@@ -131,8 +255,9 @@ class PyBullet(core.View):
   def _add_object(self, obj: core.Sphere) -> Optional[int]:
     radius = obj.scale[0]
     assert radius == obj.scale[1] == obj.scale[2], obj.scale  # only uniform scaling
-    collision_idx = self._physics_client.createCollisionShape(
-        pb.GEOM_SPHERE, radius=radius)
+    collision_idx = self._collision_shape(
+        ("sphere", float(radius)),
+        lambda: self._physics_client.createCollisionShape(pb.GEOM_SPHERE, radius=radius))
     visual_idx = -1
     mass = 0 if obj.static else obj.mass
     # useMaximalCoordinates and contactProcessingThreshold are required to
@@ -147,7 +272,7 @@ class PyBullet(core.View):
         useMaximalCoordinates=True)
     self._physics_client.changeDynamics(
         sphere_idx, -1, contactProcessingThreshold=0)
-    register_physical_object_setters(obj, sphere_idx, self._physics_client)
+    self._link_body(obj, sphere_idx)
 
     return sphere_idx
 
@@ -168,7 +293,20 @@ class PyBullet(core.View):
     # useMaximalCoordinates and contactProcessingThreshold are required to
     # fix the sticky walls issue;
     # see https://github.com/bulletphysics/bullet3/issues/3094
-    if path.suffix == ".urdf":
+    urdf_shape = None
+    if path.suffix == ".urdf" and self.cache_urdf_shapes:
+      urdf_shape = self._collision_shape(("urdf", str(path), float(scale)),
+                                         lambda: self._load_urdf_shape(path, scale))
+    if urdf_shape is not None:
+      obj_idx = self._physics_client.createMultiBody(
+          0 if obj.static else urdf_shape.mass,
+          urdf_shape.collision_idx,
+          -1,
+          obj.position,
+          wxyz2xyzw(obj.quaternion),
+          baseInertialFramePosition=urdf_shape.inertial_position,
+          useMaximalCoordinates=True)
+    elif path.suffix == ".urdf":
       obj_idx = self._physics_client.loadURDF(
           str(path),
           useFixedBase=obj.static,
@@ -184,16 +322,62 @@ class PyBullet(core.View):
     self._physics_client.changeDynamics(
         obj_idx, -1, contactProcessingThreshold=0)
 
-    register_physical_object_setters(obj, obj_idx, self._physics_client)
+    self._link_body(obj, obj_idx)
     return obj_idx
 
-  def check_overlap(self, obj: core.PhysicalObject) -> bool:
+  def _collision_shape(self, key, create):
+    """Returns the cached collision shape for the given key (or creates it)."""
+    if key in self._collision_shapes:
+      self.shape_cache_statistics["hits"] += 1
+    else:
+      self.shape_cache_statistics["misses"] += 1
+      self._collision_shapes[key] = create()
+    return self._collision_shapes[key]
+
+  def _load_urdf_shape(self, path: pathlib.Path, scale: float) -> Optional["_UrdfShape"]:
+    """Creates the collision shape of a URDF file with a single link and mesh collision geometry.
+
+    Returns None for other URDF files (which are then loaded with loadURDF).
+    """
+    link = _parse_single_link_urdf(path)
+    if link is None:
+      logger.debug("Cannot cache the collision shape of '%s'", path)
+      return None
+    collision_idx = self._physics_client.createCollisionShape(
+        pb.GEOM_MESH,
+        fileName=str(path.parent / link["mesh_filename"]),
+        meshScale=[s * scale for s in link["mesh_scale"]],
+        collisionFramePosition=[x * scale for x in link["collision_xyz"]],
+        collisionFrameOrientation=pb.getQuaternionFromEuler(link["collision_rpy"]))
+    if collision_idx < 0:
+      return None
+    return _UrdfShape(collision_idx=collision_idx,
+                      mass=link["mass"],
+                      inertial_position=tuple(x * scale for x in link["inertial_xyz"]))
+
+  def _link_body(self, obj: core.PhysicalObject, body_idx: int):
+    register_physical_object_setters(obj, body_idx, self._physics_client)
+    self._body_to_asset[body_idx] = obj
+
+  def check_overlap(self, obj: core.PhysicalObject, broadphase: bool = True) -> bool:
+    """Whether the given object overlaps with any other body in the simulation.
+
+    Args:
+      obj: the object (which has to be added to the simulator).
+      broadphase: Whether to run the (exact) narrowphase test only for the bodies whose
+        axis-aligned bounding boxes overlap with the one of the object, instead of all bodies.
+
+    Returns:
+      True if the object overlaps with another body.
+    """
     obj_idx = obj.linked_objects[self]
 
-    body_ids = [
-        self._physics_client.getBodyUniqueId(i)
-        for i in range(self._physics_client.getNumBodies())
-    ]
+    if broadphase:
+      aabb_min, aabb_max = self._physics_client.getAABB(obj_idx)
+      overlapping = self._physics_client.getOverlappingObjects(aabb_min, aabb_max) or ()
+      body_ids = sorted({body_id for body_id, _ in overlapping})
+    else:
+      body_ids = self._body_ids()
     for body_id in body_ids:
       if body_id == obj_idx:
         continue
@@ -211,107 +395,268 @@ class PyBullet(core.View):
     velocity, angular_velocity = self._physics_client.getBaseVelocity(obj_idx)
     return velocity, angular_velocity
 
-  def save_state(self, path: Union[pathlib.Path, str] = "scene.bullet"):
-    """Receives a folder path as input."""
+  def save_state(self, path: Union[pathlib.Path, str] = "scene.bullet",
+                 background: bool = False):
+    """Saves the state of the simulation to a '.bullet' file.
+
+    Args:
+      path: Where to save the file (can be a remote path, e.g. on GCS).
+      background: Whether to copy the file to its target path on a background thread
+        (see `kubric.file_io.wait_for_background_copies`).
+
+    Returns:
+      The `file_io.CopyResult` of the copy (or a Future of it if background is set).
+    """
     assert self.scratch_dir is not None
     # first store in a temporary file and then copy, to support remote paths
-    self._physics_client.saveBullet(str(self.scratch_dir / "scene.bullet"))
-    tf.io.gfile.copy(self.scratch_dir / "scene.bullet", path, overwrite=True)
+    # (with a unique name, because background copies of previous states might still be running)
+    with tempfile.NamedTemporaryFile(dir=self.scratch_dir, prefix="scene_", suffix=".bullet",
+                                     delete=False) as f:
+      tmp_path = f.name
+    self._physics_client.saveBullet(tmp_path)
+    if background:
+      return file_io.copy_file_in_background(tmp_path, path, remove_source=True)
+    return file_io.copy_file(tmp_path, path, remove_source=True)
 
   def run(
       self,
       frame_start: int = 0,
-      frame_end: Optional[int] = None
-  ) -> Tuple[Dict[core.PhysicalObject, Dict[str, list]], List[dict]]:
+      frame_end: Optional[int] = None,
+      aggregate_contacts: bool = False,
+      rest_threshold: Optional[float] = None,
+      rest_angular_threshold: Optional[float] = None,
+      rest_frames: int = 3,
+  ) -> Tuple[Dict[core.PhysicalObject, Dict[str, np.ndarray]], ContactBuffer]:
     """
     Run the physics simulation.
 
     The resulting animation is saved directly as keyframes in the assets,
     and also returned (together with the collision events).
+    The states of all objects are recorded into preallocated (frames, objects, 3 / 4) arrays
+    (see `last_states`), and the animation of each asset consists of views into these arrays.
+
+    With a `simulation_cache`, the states and contacts of runs with the same initial conditions
+    and arguments are restored from the cache (without stepping the simulation), provided that
+    all bodies of the simulation were added as assets.
 
     Args:
       frame_start: The first frame from which to start the simulation (inclusive).
         Also the first frame for which keyframes are stored.
       frame_end: The last frame (inclusive) that is simulated (and for which animations
         are computed).
+      aggregate_contacts: Whether to merge all contacts between two objects within a frame into
+        a single collision event (with the largest force), see `ContactBuffer.aggregate`.
+      rest_threshold: If set, the simulation stops early once the linear velocities of all
+        bodies stayed below this value (in m/s) for rest_frames consecutive frames. The remaining
+        frames are filled with the final poses (and zero velocities), and no contacts are
+        recorded for them. The number of skipped steps is reported in `last_run_statistics`.
+      rest_angular_threshold: The threshold for the angular velocities (in rad/s) for the early
+        termination. Defaults to rest_threshold.
+      rest_frames: The number of consecutive frames all bodies have to be at rest.
 
     Returns:
-      A dict of all animations and a list of all collision events.
+      A dict of all animations (as {asset: {"position": array of shape (frames, 3), ...}}) and
+      the collision events as a `ContactBuffer` (which behaves like a list of dicts).
     """
 
     frame_end = self.scene.frame_end if frame_end is None else frame_end
     steps_per_frame = self.scene.step_rate // self.scene.frame_rate
     max_step = (frame_end - frame_start + 1) * steps_per_frame
 
-    obj_idxs = [
-        self._physics_client.getBodyUniqueId(i)
-        for i in range(self._physics_client.getNumBodies())
-    ]
-    animation = {obj_id: {"position": [], "quaternion": [], "velocity": [], "angular_velocity": []}
-                 for obj_id in obj_idxs}
+    obj_idxs = self._body_ids()
+    num_frames = frame_end - frame_start + 1
+    if rest_angular_threshold is None:
+      rest_angular_threshold = rest_threshold
+    cache_key = self._simulation_key(obj_idxs, frame_start, frame_end,
+                                     rest_threshold=rest_threshold,
+                                     rest_angular_threshold=rest_angular_threshold,
+                                     rest_frames=rest_frames)
+    cached = None if cache_key is None else self.simulation_cache.get(cache_key, SIMULATION_ARRAYS)
+    if cached is not None:
+      logger.info("Restoring the simulation of frames %d to %d from the cache", frame_start,
+                  frame_end)
+      states = {name: cached[name] for name in STATE_ARRAYS}
+      body_ids = np.asarray(obj_idxs, dtype=np.int64)
+      collisions = ContactBuffer(self._body_to_asset,
+                                 capacity=max(len(cached["contact_force"]), 1))
+      collisions.extend(body_ids[cached["contact_body_a"]], body_ids[cached["contact_body_b"]],
+                        cached["contact_position"], cached["contact_normal"],
+                        cached["contact_frame"], cached["contact_force"])
+      self.last_run_statistics = {"steps": 0, "skipped_steps": max_step, "cache_hit": True}
+    else:
+      states, collisions, skipped_steps = self._simulate(
+          obj_idxs, frame_start, num_frames, steps_per_frame, rest_threshold,
+          rest_angular_threshold, rest_frames)
+      self.last_run_statistics = {"steps": max_step - skipped_steps,
+                                  "skipped_steps": skipped_steps, "cache_hit": False}
+      if cache_key is not None:
+        self.simulation_cache.put(cache_key, self._cache_entry(obj_idxs, states, collisions))
+
+    self.last_states = states
+    columns = {obj_idx: i for i, obj_idx in enumerate(obj_idxs)}
+    animation = {asset: {key: value[:, columns[asset.linked_objects[self]]]
+                         for key, value in states.items()}
+                 for asset in self.scene.assets if asset.linked_objects.get(self) in columns}
 
-    collisions = []
+    # --- Transfer simulation to renderer keyframes
+    # (as whole trajectories, and without feeding the values back into the simulator)
+    frames = list(range(frame_start, frame_end + 1))
+    with self._setters_disabled():
+      for obj, obj_animation in animation.items():
+        for name, values in obj_animation.items():
+          setattr(obj, name, values[-1])
+          obj.keyframe_insert_many(name, frames, values)
+    # like the assets, the simulator continues from the state of the last frame
+    reset_base_position_and_orientation = self._physics_client.resetBasePositionAndOrientation
+    reset_base_velocity = self._physics_client.resetBaseVelocity
+    for i, obj_idx in enumerate(obj_idxs):
+      reset_base_position_and_orientation(obj_idx, states["position"][-1, i],
+                                          wxyz2xyzw(states["quaternion"][-1, i]))
+      reset_base_velocity(obj_idx, states["velocity"][-1, i], states["angular_velocity"][-1, i])
+
+    if aggregate_contacts:
+      collisions = collisions.aggregate()
+    return animation, collisions
+
+  def _simulate(self, obj_idxs, frame_start: int, num_frames: int, steps_per_frame: int,
+                rest_threshold: Optional[float], rest_angular_threshold: Optional[float],
+                rest_frames: int) -> Tuple[Dict[str, np.ndarray], ContactBuffer, int]:
+    """Steps the simulation and records the states of the given bodies (see `run`).
+
+    Returns:
+      The states (with quaternions in WXYZ format), the contacts and the number of skipped steps.
+    """
+    max_step = num_frames * steps_per_frame
+    states = {
+        "position": np.zeros((num_frames, len(obj_idxs), 3)),
+        "quaternion": np.zeros((num_frames, len(obj_idxs), 4)),  # in XYZW format until the end
+        "velocity": np.zeros((num_frames, len(obj_idxs), 3)),
+        "angular_velocity": np.zeros((num_frames, len(obj_idxs), 3)),
+    }
+    # pybullet has no queries for the states of multiple bodies, but binding the functions once
+    # avoids the attribute lookup of _BulletClient for each call
+    get_base_position_and_orientation = self._physics_client.getBasePositionAndOrientation
+    get_base_velocity = self._physics_client.getBaseVelocity
+    frames_at_rest = 0
+    skipped_steps = 0
+
+    collisions = ContactBuffer(self._body_to_asset)
+    get_contact_points = self._physics_client.getContactPoints
     for current_step in range(max_step):
 
-      contact_points = self._physics_client.getContactPoints()
-      for collision in contact_points:
-        (contact_flag,
-         body_a, body_b,
-         link_a, link_b,
-         position_a, position_b, contact_normal_b,
-         contact_distance, normal_force,
-         lateral_friction1, lateral_friction_dir1,
-         lateral_friction2, lateral_friction_dir2) = collision
-        del link_a, link_b  # < unused
-        del contact_flag, contact_distance, position_a  # < unused
-        del lateral_friction1, lateral_friction2  # < unused
-        del lateral_friction_dir1, lateral_friction_dir2  # < unused
-        if normal_force > 1e-6:
-          collisions.append({
-              "instances": (self._obj_idx_to_asset(body_b), self._obj_idx_to_asset(body_a)),
-              "position": position_b,
-              "contact_normal": contact_normal_b,
-              "frame": current_step / steps_per_frame,
-              "force": normal_force,
-          })
-
-      if current_step % steps_per_frame == 0:
-        for obj_idx in obj_idxs:
-          position, quaternion = self.get_position_and_rotation(obj_idx)
-          velocity, angular_velocity = self.get_velocities(obj_idx)
-
-          animation[obj_idx]["position"].append(position)
-          animation[obj_idx]["quaternion"].append(quaternion)
-          animation[obj_idx]["velocity"].append(velocity)
-          animation[obj_idx]["angular_velocity"].append(angular_velocity)
+      # contacts are recorded with the order of the bodies swapped (i.e. body_a is pybullet's
+      # body B, with position_b and contact_normal_b)
+      contacts = [(body_b, body_a, position_b, contact_normal_b, normal_force)
+                  for (_, body_a, body_b, _, _, _, position_b, contact_normal_b, _, normal_force,
+                       *_) in get_contact_points()
+                  if normal_force > 1e-6]
+      if contacts:
+        body_a, body_b, position, contact_normal, force = zip(*contacts)
+        collisions.extend(body_a, body_b, position, contact_normal,
+                          np.full(len(force), current_step / steps_per_frame), force)
+
+      if current_step % steps_per_frame == 0 and obj_idxs:
+        frame_id = current_step // steps_per_frame
+        poses = [get_base_position_and_orientation(obj_idx) for obj_idx in obj_idxs]
+        velocities = [get_base_velocity(obj_idx) for obj_idx in obj_idxs]
+        states["position"][frame_id], states["quaternion"][frame_id] = zip(*poses)
+        states["velocity"][frame_id], states["angular_velocity"][frame_id] = zip(*velocities)
+
+        if rest_threshold is not None and frame_id > 0:
+          at_rest = (
+              np.all(np.linalg.norm(states["velocity"][frame_id], axis=-1) < rest_threshold) and
+              np.all(np.linalg.norm(states["angular_velocity"][frame_id], axis=-1) <
+                     rest_angular_threshold))
+          frames_at_rest = frames_at_rest + 1 if at_rest else 0
+          if frames_at_rest >= rest_frames:
+            states["position"][frame_id + 1:] = states["position"][frame_id]
+            states["quaternion"][frame_id + 1:] = states["quaternion"][frame_id]
+            states["velocity"][frame_id + 1:] = 0.
+            states["angular_velocity"][frame_id + 1:] = 0.
+            skipped_steps = max_step - current_step
+            logger.info("All bodies are at rest at frame %d; skipping the remaining %d steps",
+                        frame_start + frame_id, skipped_steps)
+            break
 
       self._physics_client.stepSimulation()
 
-    animation = {asset: animation[asset.linked_objects[self]] for asset in self.scene.assets
-                 if asset.linked_objects.get(self) in obj_idxs}
+    states["quaternion"][:] = states["quaternion"][..., [3, 0, 1, 2]]  # XYZW -> WXYZ
+    return states, collisions, skipped_steps
 
-    # --- Transfer simulation to renderer keyframes
-    for obj in animation.keys():
-      for frame_id in range(frame_end - frame_start + 1):
-        obj.position = animation[obj]["position"][frame_id]
-        obj.quaternion = animation[obj]["quaternion"][frame_id]
-        obj.velocity = animation[obj]["velocity"][frame_id]
-        obj.angular_velocity = animation[obj]["angular_velocity"][frame_id]
-        obj.keyframe_insert("position", frame_id + frame_start)
-        obj.keyframe_insert("quaternion", frame_id + frame_start)
-        obj.keyframe_insert("velocity", frame_id + frame_start)
-        obj.keyframe_insert("angular_velocity", frame_id + frame_start)
+  def _simulation_key(self, obj_idxs, frame_start: int, frame_end: int,
+                      **settings) -> Optional[str]:
+    """The key of a run in the simulation cache.
 
-    return animation, collisions
+    None if there is no cache, or if some of the bodies were not added as assets (since their
+    initial conditions are unknown).
+    """
+    if self.simulation_cache is None or not all(i in self._body_to_asset for i in obj_idxs):
+      return None
+    settings.update(cache_urdf_shapes=self.cache_urdf_shapes, num_substeps=self.num_substeps,
+                    solver_iterations=self.solver_iterations)
+    return simulation_key(self.scene, [self._body_to_asset[i] for i in obj_idxs], frame_start,
+                          frame_end, settings)
+
+  def _cache_entry(self, obj_idxs, states: Dict[str, np.ndarray],
+                   collisions: ContactBuffer) -> Dict[str, np.ndarray]:
+    """The arrays stored in the simulation cache (with the bodies replaced by their index)."""
+    columns = {obj_idx: i for i, obj_idx in enumerate(obj_idxs)}
+    entry = dict(states)
+    entry["contact_body_a"] = np.array([columns[i] for i in collisions.body_a], dtype=np.int64)
+    entry["contact_body_b"] = np.array([columns[i] for i in collisions.body_b], dtype=np.int64)
+    entry["contact_position"] = collisions.position
+    entry["contact_normal"] = collisions.contact_normal
+    entry["contact_frame"] = collisions.frame
+    entry["contact_force"] = collisions.force
+    return entry
+
+  @contextlib.contextmanager
+  def _setters_disabled(self):
+    self._physics_client.setters_enabled = False
+    try:
+      yield
+    finally:
+      self._physics_client.setters_enabled = True
 
   def _obj_idx_to_asset(self, idx):
-    assets = [asset for asset in self.scene.assets if asset.linked_objects.get(self) == idx]
-    if len(assets) == 1:
-      return assets[0]
-    elif len(assets) == 0:
-      return None
-    else:
-      raise RuntimeError("Multiple assets linked to same pybullet object. That should never happen")
+    return self._body_to_asset.get(idx)
+
+
+class _UrdfShape(NamedTuple):
+  collision_idx: int
+  mass: float
+  inertial_position: Tuple[float, float, float]
+
+
+def _parse_single_link_urdf(path: pathlib.Path) -> Optional[dict]:
+  """Parses the inertial and collision properties of a URDF with one link and one mesh collision.
+
+  Returns None for any other URDF file.
+  """
+  def floats(element, attribute, default):
+    if element is None or element.get(attribute) is None:
+      return default
+    return tuple(float(x) for x in element.get(attribute).split())
+
+  robot = ElementTree.parse(path).getroot()
+  links = robot.findall("link")
+  collisions = links[0].findall("collision") if len(links) == 1 else []
+  if robot.findall("joint") or len(collisions) != 1:
+    return None
+  mesh = collisions[0].find("geometry/mesh")
+  inertial = links[0].find("inertial")
+  if mesh is None or inertial is None or inertial.find("mass") is None:
+    return None
+  if any(floats(inertial.find("origin"), "rpy", (0., 0., 0.))):
+    return None  # rotated inertial frames are not supported
+  return {
+      "mesh_filename": mesh.get("filename"),
+      "mesh_scale": floats(mesh, "scale", (1., 1., 1.)),
+      "collision_xyz": floats(collisions[0].find("origin"), "xyz", (0., 0., 0.)),
+      "collision_rpy": floats(collisions[0].find("origin"), "rpy", (0., 0., 0.)),
+      "inertial_xyz": floats(inertial.find("origin"), "xyz", (0., 0., 0.)),
+      "mass": float(inertial.find("mass").get("value")),
+  }
 
 
 def xyzw2wxyz(xyzw):
@@ -332,6 +677,8 @@ def register_physical_object_setters(obj: core.PhysicalObject, obj_idx,
 
   def setter(object_idx, func):
     def _callable(change):
+      if not physics_client.setters_enabled:
+        return None
       return func(object_idx, change.new, change.owner, physics_client)
     return _callable
 
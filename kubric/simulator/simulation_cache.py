@@ -0,0 +1,112 @@
+# Copyright 2024 The Kubric Authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""An on-disk cache for simulation results, keyed by a hash of the initial conditions.
+
+Render variants of the same physical scene (e.g. with other cameras, backgrounds or materials)
+lead to identical simulations. With `PyBullet(..., simulation_cache=SimulationCache(directory))`
+the simulator stores the recorded states and contacts of each `run` in a compressed npz file,
+and subsequent runs with the same `simulation_key` restore the keyframes from it instead of
+stepping the simulation.
+The key covers the simulated assets (in the order in which they were added), their collision
+files, scales, masses, frictions, restitutions, initial poses and velocities, the gravity, step
+and frame rates, the frame range and the simulator settings.
+Note that modifications made directly to the simulator (e.g. via pybullet) are not covered by it.
+This module does not depend on pybullet.
+"""
+
+import hashlib
+import json
+import pathlib
+import re
+from typing import Any, Dict, Optional, Sequence
+
+import numpy as np
+
+from kubric import core
+from kubric.cache import ArrayCache
+from kubric.cache import file_digest
+from kubric.kubric_typing import PathLike
+
+# the traits of physical objects that are inputs of the simulation
+SIMULATION_TRAITS = ("position", "quaternion", "velocity", "angular_velocity", "scale", "mass",
+                     "friction", "restitution", "static")
+
+# the arrays stored for each simulation run
+STATE_ARRAYS = ("position", "quaternion", "velocity", "angular_velocity")
+CONTACT_ARRAYS = ("contact_body_a", "contact_body_b", "contact_position", "contact_normal",
+                  "contact_frame", "contact_force")
+SIMULATION_ARRAYS = STATE_ARRAYS + CONTACT_ARRAYS
+
+
+def _collision_file_digests(filename: str) -> Dict[str, str]:
+  """Digests of a simulation file and of the (mesh) files referenced by it."""
+  digests = {"file": file_digest(filename)}
+  if filename.endswith(".urdf"):
+    content = pathlib.Path(filename).read_text(encoding="utf-8")
+    for referenced in sorted(set(re.findall(r'filename="([^"]+)"', content))):
+      path = pathlib.Path(filename).parent / referenced
+      if path.is_file():
+        digests[referenced] = file_digest(path)
+  return digests
+
+
+def _asset_state(asset: core.PhysicalObject) -> Dict[str, Any]:
+  state = {"type": type(asset).__name__}
+  state.update({name: np.asarray(getattr(asset, name)).tolist() for name in SIMULATION_TRAITS})
+  simulation_filename = getattr(asset, "simulation_filename", None)
+  if simulation_filename is not None:
+    state["simulation_filename"] = _collision_file_digests(str(simulation_filename))
+  return state
+
+
+def simulation_key(scene: core.Scene,
+                   assets: Sequence[core.PhysicalObject],
+                   frame_start: int,
+                   frame_end: int,
+                   settings: Optional[Dict[str, Any]] = None) -> str:
+  """Computes a deterministic hash of the inputs of a simulation run.
+
+  Args:
+    scene: the kubric scene (for the gravity, step rate and frame rate).
+    assets: the simulated assets in the order of the recorded states.
+    frame_start: the first simulated frame.
+    frame_end: the last simulated frame (inclusive).
+    settings: (JSON serializable) simulator settings that influence the results.
+
+  Returns:
+    The key as a hex string.
+  """
+  state = {
+      "gravity": np.asarray(scene.gravity, np.float64).tolist(),
+      "step_rate": int(scene.step_rate),
+      "frame_rate": int(scene.frame_rate),
+      "frames": [int(frame_start), int(frame_end)],
+      "settings": settings,
+      "assets": [_asset_state(asset) for asset in assets],
+  }
+  return hashlib.sha256(json.dumps(state, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+class SimulationCache(ArrayCache):
+  """Stores the states and contacts of simulation runs on disk with LRU eviction.
+
+  Each entry is a compressed npz file with the `SIMULATION_ARRAYS`, where the states have the
+  shape (frames, assets, 3 / 4), and the contacts refer to the assets by their index.
+  """
+
+  compressed = True
+
+  def __init__(self, directory: PathLike, max_size_bytes: int = 2**30):
+    super().__init__(directory, max_size_bytes=max_size_bytes)
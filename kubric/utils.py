@@ -112,6 +112,7 @@ def log_my_flags(flags):
 
 
 def done():
+  file_io.wait_for_background_copies()
   logging.info("Done!")
 
   from kubric import assets  # pylint: disable=import-outside-toplevel
@@ -142,7 +143,12 @@ def get_scene_metadata(scene, **kwargs):
   return metadata
 
 
-def get_camera_info(camera, **kwargs):
+def get_camera_info(camera, region=None, **kwargs):
+  """Collects the camera metadata.
+
+  If the images were rendered with `Blender.render(region=...)` then region should be the same
+  (a single region or a dict of regions per frame) so that "K" describes the cropped images.
+  """
   camera_info = {
       "focal_length": camera.focal_length,
       "sensor_width": camera.sensor_width,
@@ -152,6 +158,13 @@ def get_camera_info(camera, **kwargs):
       "K": camera.intrinsics,
       "R": camera.matrix_world,
   }
+  if isinstance(region, dict):
+    frames = sorted(region)
+    camera_info["region"] = np.array([region[f] for f in frames])
+    camera_info["K"] = np.stack([camera.intrinsics_for_region(region[f]) for f in frames])
+  elif region is not None:
+    camera_info["region"] = np.array(region)
+    camera_info["K"] = camera.intrinsics_for_region(region)
   camera_info.update(kwargs)
   return camera_info
 
@@ -185,13 +198,14 @@ def get_instance_info(scene, assets_subset=None):
 
 
 def process_collisions(collisions, scene, assets_subset=None):
+  """Converts collision events (a list or a `ContactBuffer`) into a JSON serializable form."""
   assets_subset = scene.foreground_assets if assets_subset is None else assets_subset
+  asset_indices = {}
+  for i, asset in enumerate(assets_subset):
+    asset_indices.setdefault(asset, i)
 
   def get_obj_index(obj):
-    try:
-      return assets_subset.index(obj)
-    except ValueError:
-      return -1
+    return asset_indices.get(obj, -1)
 
   return [{
       "instances": (get_obj_index(c["instances"][0]), get_obj_index(c["instances"][1])),
@@ -27,6 +27,7 @@ from typing import Tuple
 
 import trimesh
 
+from kubric.renderer import lod
 from shapenet_synsets import CATEGORY_NAMES
 from trimesh_utils import get_object_properties
 import trimesh_utils
@@ -221,6 +222,8 @@ def stage4(object_folder: Path, logger=_DEFAULT_LOGGER):
   properties = get_object_properties(source_path, logger)
   properties.update(get_object_volume(watertight_mesh_path))
   properties.update(get_visual_properties(vis_mesh_path))
+  # --- decimated level-of-detail variants of the visual geometry
+  lods = lod.make_lod_variants(vis_mesh_path)
 
 
   asset_id, category_id, category_name = get_asset_id_and_category(object_folder)
@@ -248,6 +251,7 @@ def stage4(object_folder: Path, logger=_DEFAULT_LOGGER):
           "nr_vertices": properties["nr_vertices"],
           "surface_area": properties["surface_area"],
           "volume": properties["volume"],
+          "lods": lods,
       }
   }
 
@@ -279,6 +283,8 @@ def stage5(object_folder: Path, logger=_DEFAULT_LOGGER):
   with tarfile.open(target_path, 'w:gz') as tar:
     tar.add(object_folder / 'kubric' / 'visual_geometry.glb',
             arcname='visual_geometry.glb')
+    for lod_path in sorted((object_folder / 'kubric').glob('visual_geometry.lod*.glb')):
+      tar.add(lod_path, arcname=lod_path.name)
     tar.add(object_folder / 'kubric' / 'collision_geometry.obj',
             arcname='collision_geometry.obj')
     tar.add(object_folder / 'kubric' / 'model_watertight.obj',
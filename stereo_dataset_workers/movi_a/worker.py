@@ -33,6 +33,9 @@ parser.add_argument("--camera", choices=["clevr", "random"], default="clevr")
 # Configuration for the source of the assets
 parser.add_argument("--kubasic_assets", type=str, default="gs://kubric-public/assets/KuBasic/KuBasic.json")
 parser.add_argument("--save_state", dest="save_state", action="store_true")
+parser.add_argument("--no_pack_state", dest="pack_state", action="store_false",
+                    help="do not pack the textures into the saved .blend file (which then "
+                         "refers to the downloaded files)")
 parser.set_defaults(save_state=True, frame_end=24, frame_rate=12, resolution=256)
 
 FLAGS = parser.parse_args()
@@ -40,7 +43,7 @@ FLAGS = parser.parse_args()
 # --- Common setups & resources
 scene, rng, output_dir, scratch_dir = kb.setup(FLAGS)
 simulator = PyBullet(scene, scratch_dir)
-renderer = Blender(scene, scratch_dir, samples_per_pixel=64)
+renderer = Blender(scene, scratch_dir, samples_per_pixel=64, share_materials=True)
 kubasic = kb.AssetSource.from_manifest(FLAGS.kubasic_assets)
 
 
@@ -125,7 +128,7 @@ for i in range(num_objects):
 if FLAGS.save_state:
   logging.info("Saving the simulator state to '%s' prior to the simulation.",
                output_dir / "scene.bullet")
-  simulator.save_state(output_dir / "scene.bullet")
+  simulator.save_state(output_dir / "scene.bullet", background=True)
 
 # Run dynamic objects simulation
 logging.info("Running the simulation ...")
@@ -136,14 +139,16 @@ animation, collisions = simulator.run(frame_start=0,
 if FLAGS.save_state:
   logging.info("Saving the renderer state to '%s' ",
                output_dir / "scene.blend")
-  renderer.save_state(output_dir / "scene.blend")
+  renderer.save_state(output_dir / "scene.blend", pack_textures=FLAGS.pack_state,
+                      background=True)
 
 
+logging.info(f"Rendering the scene with {left_cam.name} and {right_cam.name}...")
+multiview_data = renderer.render_multiview([left_cam, right_cam])
 for camera in [left_cam, right_cam]:
 
   scene.camera = camera
-  logging.info(f"Rendering the scene with {camera.name}...")
-  data_stack = renderer.render()
+  data_stack = multiview_data[camera.uid]
 
   # --- Postprocessing
   kb.compute_visibility(data_stack["segmentation"], scene.assets)
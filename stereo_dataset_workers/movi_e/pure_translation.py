@@ -69,6 +69,9 @@ parser.add_argument("--hdri_assets", type=str,
 parser.add_argument("--gso_assets", type=str,
                     default="gs://kubric-public/assets/GSO/GSO.json")
 parser.add_argument("--save_state", dest="save_state", action="store_true")
+parser.add_argument("--no_pack_state", dest="pack_state", action="store_false",
+                    help="do not pack the textures into the saved .blend file (which then "
+                         "refers to the downloaded files)")
 parser.set_defaults(save_state=False, frame_end=24, frame_rate=12,
                     resolution=256)
 FLAGS = parser.parse_args()
@@ -244,7 +247,7 @@ for i in range(num_static_objects):
 
 
 logging.info("Running 100 frames of simulation to let static objects settle ...")
-_, _ = simulator.run(frame_start=-100, frame_end=0)
+_, _ = simulator.run(frame_start=-100, frame_end=0, rest_threshold=1e-3)
 
 
 # stop any objects that are still moving and reset friction / restitution
@@ -283,7 +286,7 @@ for i in range(num_dynamic_objects):
 if FLAGS.save_state:
   logging.info("Saving the simulator state to '%s' prior to the simulation.",
                output_dir / "scene.bullet")
-  simulator.save_state(output_dir / "scene.bullet")
+  simulator.save_state(output_dir / "scene.bullet", background=True)
 
 # Run dynamic objects simulation
 logging.info("Running the simulation ...")
@@ -294,14 +297,15 @@ animation, collisions = simulator.run(frame_start=0,
 if FLAGS.save_state:
   logging.info("Saving the renderer state to '%s' ",
                output_dir / "scene.blend")
-  renderer.save_state(output_dir / "scene.blend")
+  renderer.save_state(output_dir / "scene.blend", pack_textures=FLAGS.pack_state,
+                      background=True)
 
 
-logging.info("Rendering the scene ...")
+logging.info("Rendering the scene from cameras %s ...", [left_cam.name, right_cam.name])
+multiview_data = renderer.render_multiview([left_cam, right_cam])
 for camera in [left_cam, right_cam]:
-  logging.info(f"  Rendering from camera '{camera.name}'")
   scene.camera = camera
-  data_stack = renderer.render()
+  data_stack = multiview_data[camera.uid]
 
   # --- Postprocessing
   kb.compute_visibility(data_stack["segmentation"], scene.assets)
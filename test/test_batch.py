@@ -0,0 +1,84 @@
+# Copyright 2024 The Kubric Authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Testing for `kubric.simulator.batch` module."""
+
+import json
+
+import kubric as kb
+from kubric.simulator import batch
+from kubric.simulator.pybullet import PyBullet
+import numpy as np
+import pytest
+
+
+def make_scene(height):
+  scene = kb.Scene(gravity=(0, 0, -10), frame_end=12)
+  scene += kb.Cube(name="floor", scale=(10, 10, 1), position=(0, 0, -1), static=True)
+  scene += kb.Sphere(name="ball", scale=0.2, position=(0, 0, height), velocity=(1, 0, 0))
+  return scene
+
+
+def test_scene_spec_roundtrip():
+  spec = json.loads(json.dumps(batch.scene_spec(make_scene(0.5), rest_threshold=1e-3)))
+  scene, assets = batch.build_scene(spec)
+  assert scene.frame_end == 12 and spec["run"] == {"rest_threshold": 1e-3}
+  assert [type(asset) for asset in assets] == [kb.Cube, kb.Sphere]
+  assert assets[0].static and assets[0].name == "floor"
+  np.testing.assert_allclose(assets[1].velocity, (1, 0, 0))
+  assert spec["simulator"] == {"cache_urdf_shapes": False, "num_substeps": 0,
+                               "solver_iterations": 50}
+
+
+def test_scene_spec_uses_simulator_settings():
+  scene = make_scene(0.5)
+  PyBullet(scene, num_substeps=2, solver_iterations=10)
+  spec = batch.scene_spec(scene)
+  assert spec["simulator"] == {"cache_urdf_shapes": False, "num_substeps": 2,
+                               "solver_iterations": 10}
+  other = PyBullet(make_scene(0.5), cache_urdf_shapes=True)
+  assert batch.scene_spec(scene, simulator=other)["simulator"]["cache_urdf_shapes"]
+
+
+def test_scene_spec_skips_objects_without_simulation_file():
+  scene = make_scene(0.5)
+  render_only = [kb.FileBasedObject(render_filename="mesh.obj"),
+                 kb.FileBasedObject(render_filename="mesh.obj", simulation_filename=None)]
+  scene += render_only
+  spec = batch.scene_spec(scene)
+  assert [obj["name"] for obj in spec["objects"]] == ["floor", "ball"]
+  for asset in render_only:
+    with pytest.raises(ValueError):
+      batch.scene_spec(scene, assets=[asset])
+
+
+def test_simulate_batch_matches_simulator():
+  specs = [batch.scene_spec(make_scene(height)) for height in (0.5, 1.0, 1.5)]
+  results = batch.simulate_batch(specs, processes=2)
+  assert len(results) == 3
+
+  scene = make_scene(1.0)
+  simulator = PyBullet(scene)
+  animation, collisions = simulator.run(frame_start=scene.frame_start)
+  ball = scene.assets[1]
+  result = results[1]
+  assert result["position"].shape == (12, 2, 3) and result["position"].dtype == np.float32
+  np.testing.assert_allclose(result["position"][:, 1], animation[ball]["position"], atol=1e-5)
+  assert len(result["contact_force"]) == len(collisions) > 0
+
+  _, assets = batch.build_scene(specs[1])
+  loaded_collisions = batch.load_result(assets, result, specs[1]["frame_start"])
+  np.testing.assert_allclose(assets[1].keyframes["position"][12], animation[ball]["position"][-1],
+                             atol=1e-5)
+  assert {frozenset(event["instances"]) for event in loaded_collisions} == {frozenset(assets)}
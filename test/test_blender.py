@@ -12,11 +12,19 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import numpy as np
+import pytest
+import trimesh
 from kubric.safeimport.bpy import bpy
 
 from kubric import core
+from kubric import file_io
+from kubric import post_processing
 from kubric.renderer import blender
 from kubric.renderer import blender_utils
+from kubric.renderer import hdri
+from kubric.renderer import render_cache as render_cache_lib
+from kubric.renderer.render_cache import RenderCache
 
 
 def test_prepare_blender_object():
@@ -141,3 +149,449 @@ def test_blender_samples_per_pixel_init(tmp_path):
   renderer = blender.Blender(core.Scene(), tmp_path, samples_per_pixel=256)
   assert renderer.samples_per_pixel == 256
   assert renderer.blender_scene.cycles.samples == 256
+
+
+def _make_annotation_test_scene():
+  scene = core.Scene(resolution=(64, 48), frame_start=1, frame_end=3)
+  scene += core.Cube(position=(-1.5, 0, 0), quaternion=(0.9, 0.1, 0.3, 0.2))
+  sphere = core.Sphere(position=(1.5, 0, 0), scale=1.2)
+  scene += sphere
+  for frame in range(1, 4):
+    sphere.position = (1.5, 0.2 * frame, 0)
+    sphere.keyframe_insert("position", frame)
+  scene += core.PerspectiveCamera(position=(2, -8, 5), look_at=(0, 0, 0))
+  return scene
+
+
+def test_rasterizer_annotations_match_cycles(tmp_path):
+  return_layers = ("depth", "segmentation", "normal", "object_coordinates", "forward_flow")
+  results = {}
+  for backend in ("cycles", "rasterizer"):
+    scene = _make_annotation_test_scene()
+    renderer = blender.Blender(scene, tmp_path / backend, samples_per_pixel=1,
+                               use_denoising=False, annotation_backend=backend)
+    results[backend] = renderer.render(frames=[2], return_layers=return_layers)
+  cycles, raster = results["cycles"], results["rasterizer"]
+
+  # segmentation may only differ along object boundaries
+  same_segment = cycles["segmentation"] == raster["segmentation"]
+  assert np.mean(same_segment) > 0.97
+  interior = same_segment[..., 0] & (cycles["segmentation"][..., 0] > 0)
+
+  np.testing.assert_allclose(raster["depth"][interior], cycles["depth"][interior], rtol=0.01)
+  np.testing.assert_allclose(raster["normal"][interior].astype(np.float32),
+                             cycles["normal"][interior].astype(np.float32), atol=0.05 * 65535)
+  np.testing.assert_allclose(raster["object_coordinates"][interior].astype(np.float32),
+                             cycles["object_coordinates"][interior].astype(np.float32),
+                             atol=0.05 * 65535)
+  np.testing.assert_allclose(raster["forward_flow"][interior], cycles["forward_flow"][interior],
+                             atol=0.5)
+
+
+def test_analytic_flow_matches_vector_pass(tmp_path):
+  results = {}
+  for flow_backend in ("vector", "analytic"):
+    scene = _make_annotation_test_scene()
+    renderer = blender.Blender(scene, tmp_path / flow_backend, samples_per_pixel=1,
+                               use_denoising=False, flow_backend=flow_backend)
+    results[flow_backend] = renderer.render(
+        frames=[2], return_layers=("segmentation", "backward_flow", "forward_flow"))
+  vector, analytic = results["vector"], results["analytic"]
+  np.testing.assert_array_equal(vector["segmentation"], analytic["segmentation"])
+  foreground = vector["segmentation"][..., 0] > 0
+  for key in ("backward_flow", "forward_flow"):
+    np.testing.assert_allclose(analytic[key][foreground], vector[key][foreground], atol=0.5)
+
+
+def test_analytic_flow_falls_back_to_vector_pass(tmp_path):
+  # the rasterizer cannot load fbx files, so the analytic flow is not available for this scene
+  bpy.ops.wm.read_factory_settings(use_empty=True)
+  bpy.ops.mesh.primitive_cube_add()
+  fbx_filename = str(tmp_path / "cube.fbx")
+  bpy.ops.export_scene.fbx(filepath=fbx_filename, use_selection=True)
+
+  results = {}
+  for flow_backend in ("vector", "analytic"):
+    scene = _make_annotation_test_scene()
+    scene += core.FileBasedObject(render_filename=fbx_filename, position=(0, 2, 0))
+    renderer = blender.Blender(scene, tmp_path / flow_backend, samples_per_pixel=1,
+                               use_denoising=False, flow_backend=flow_backend)
+    results[flow_backend] = renderer.render(
+        frames=[2], return_layers=("segmentation", "backward_flow", "forward_flow"))
+    # the Vector pass is only enabled for the render
+    aux_view_layer = renderer.blender_scene.view_layers["AuxOutputs"]
+    assert aux_view_layer.use_pass_vector == (flow_backend == "vector")
+  for key in ("backward_flow", "forward_flow"):
+    np.testing.assert_array_equal(results["analytic"][key], results["vector"][key])
+
+
+def test_render_multiview_matches_render(tmp_path):
+  scene = _make_annotation_test_scene()
+  left_camera = scene.camera
+  right_camera = core.PerspectiveCamera(position=(3, -8, 5), look_at=(0, 0, 0))
+  scene += right_camera
+  renderer = blender.Blender(scene, tmp_path, samples_per_pixel=1, use_denoising=False)
+  return_layers = ("depth", "segmentation")
+
+  multiview = renderer.render_multiview([left_camera, right_camera], frames=[1, 2],
+                                        return_layers=return_layers)
+  assert set(multiview) == {left_camera.uid, right_camera.uid}
+  assert scene.camera is left_camera
+
+  for camera in (left_camera, right_camera):
+    scene.camera = camera
+    renderer.scratch_dir = tmp_path / ("single_" + camera.uid)
+    single = renderer.render(frames=[1, 2], return_layers=return_layers)
+    assert multiview[camera.uid]["depth"].shape == (2, 48, 64, 1)
+    np.testing.assert_array_equal(multiview[camera.uid]["segmentation"], single["segmentation"])
+    np.testing.assert_allclose(multiview[camera.uid]["depth"], single["depth"], rtol=1e-4)
+
+
+def test_render_multiview_uses_render_cache(tmp_path):
+  cache = RenderCache(tmp_path / "cache")
+  scene = _make_annotation_test_scene()
+  left_camera = scene.camera
+  right_camera = core.PerspectiveCamera(position=(3, -8, 5), look_at=(0, 0, 0))
+  scene += right_camera
+  renderer = blender.Blender(scene, tmp_path / "scratch", samples_per_pixel=1,
+                             use_denoising=False, render_cache=cache)
+  return_layers = ("depth", "segmentation")
+
+  # the frames of the scene camera are shared with `render`
+  single = renderer.render(frames=[1, 2], return_layers=return_layers)
+  assert cache.statistics == {"hits": 0, "misses": 2, "evictions": 0}
+  multiview = renderer.render_multiview([left_camera, right_camera], frames=[1, 2],
+                                        return_layers=return_layers)
+  assert cache.statistics == {"hits": 2, "misses": 4, "evictions": 0}
+  assert not (tmp_path / "scratch" / left_camera.uid).exists()
+  np.testing.assert_array_equal(multiview[left_camera.uid]["segmentation"],
+                                single["segmentation"])
+  assert not np.array_equal(multiview[right_camera.uid]["segmentation"], single["segmentation"])
+
+  again = renderer.render_multiview([left_camera, right_camera], frames=[1, 2],
+                                    return_layers=return_layers)
+  assert cache.statistics["hits"] == 6
+  for camera in (left_camera, right_camera):
+    for key in return_layers:
+      np.testing.assert_array_equal(again[camera.uid][key], multiview[camera.uid][key])
+
+
+def test_render_multiview_region(tmp_path):
+  scene = _make_annotation_test_scene()
+  left_camera = scene.camera
+  right_camera = core.PerspectiveCamera(position=(3, -8, 5), look_at=(0, 0, 0))
+  scene += right_camera
+  renderer = blender.Blender(scene, tmp_path, samples_per_pixel=1, use_denoising=False)
+  return_layers = ("segmentation",)
+  region = (10, 20, 30, 52)
+
+  full = renderer.render_multiview([left_camera, right_camera], frames=[1],
+                                   return_layers=return_layers)
+  cropped = renderer.render_multiview([left_camera, right_camera], frames=[1],
+                                      return_layers=return_layers, region=region)
+  for camera in (left_camera, right_camera):
+    assert cropped[camera.uid]["segmentation"].shape == (1, 20, 32, 1)
+    np.testing.assert_array_equal(cropped[camera.uid]["segmentation"],
+                                  full[camera.uid]["segmentation"][:, 10:30, 20:52])
+  assert scene.camera is left_camera
+
+
+def test_render_multiview_rejects_duplicate_cameras(tmp_path):
+  scene = _make_annotation_test_scene()
+  renderer = blender.Blender(scene, tmp_path)
+  with pytest.raises(ValueError):
+    renderer.render_multiview([scene.camera, scene.camera])
+
+
+def test_render_region(tmp_path):
+  scene = _make_annotation_test_scene()
+  renderer = blender.Blender(scene, tmp_path, samples_per_pixel=1, use_denoising=False)
+  return_layers = ("depth", "segmentation")
+  full = renderer.render(frames=[1, 2], return_layers=return_layers)
+  regions = {1: (10, 20, 30, 52), 2: (4, 0, 24, 32)}
+  cropped = renderer.render(frames=[1, 2], return_layers=return_layers, region=regions)
+  assert cropped["depth"].shape == (2, 20, 32, 1)
+  for i, (y_min, x_min, y_max, x_max) in enumerate(regions.values()):
+    np.testing.assert_array_equal(cropped["segmentation"][i],
+                                  full["segmentation"][i, y_min:y_max, x_min:x_max])
+    np.testing.assert_allclose(cropped["depth"][i], full["depth"][i, y_min:y_max, x_min:x_max],
+                               rtol=1e-4)
+
+
+def test_rasterizer_annotations_with_resolution_percentage(tmp_path):
+  scene = _make_annotation_test_scene()
+  renderer = blender.Blender(scene, tmp_path, samples_per_pixel=1, use_denoising=False,
+                             annotation_backend="rasterizer")
+  renderer.blender_scene.render.resolution_percentage = 50
+  result = renderer.render(frames=[2], return_layers=("rgba", "depth", "segmentation",
+                                                      "forward_flow"))
+  assert result["rgba"].shape == (1, 24, 32, 4)
+  assert result["depth"].shape == (1, 24, 32, 1)
+  assert result["segmentation"].shape == (1, 24, 32, 1)
+  assert result["forward_flow"].shape == (1, 24, 32, 2)
+
+  preview = renderer.preview_pass(frames=[1, 2], resolution_percentage=25)
+  assert preview["segmentation"].shape == (2, 12, 16, 1)
+  assert preview["depth"].shape == (2, 12, 16, 1)
+
+  # regions are given in pixels of scene.resolution
+  with pytest.raises(ValueError):
+    renderer.render(frames=[2], return_layers=("depth",), region=(0, 0, 10, 10))
+
+
+def test_preview_pass_and_check_preview(tmp_path):
+  scene = _make_annotation_test_scene()
+  renderer = blender.Blender(scene, tmp_path, samples_per_pixel=16)
+  preview = renderer.preview_pass(frames=[1, 2], resolution_percentage=50)
+  assert set(preview) == {"segmentation", "depth"}
+  assert preview["segmentation"].shape == (2, 24, 32, 1)
+  # the full render settings are restored
+  assert renderer.samples_per_pixel == 16
+  assert renderer.blender_scene.render.resolution_percentage == 100
+
+  assert renderer.check_preview(post_processing.min_visible_foreground_objects(min_objects=2))
+  assert not renderer.check_preview(post_processing.min_visible_foreground_objects(min_objects=3))
+  assert renderer.preview_statistics == {"checked": 2, "rejected": 1}
+
+
+def test_render_cache(tmp_path):
+  cache = RenderCache(tmp_path / "cache")
+  scene = _make_annotation_test_scene()
+  renderer = blender.Blender(scene, tmp_path / "scratch", samples_per_pixel=1,
+                             use_denoising=False, render_cache=cache)
+  return_layers = ("depth", "segmentation")
+  first = renderer.render(frames=[1, 2], return_layers=return_layers)
+  assert cache.statistics["misses"] == 2
+  second = renderer.render(frames=[1, 2], return_layers=return_layers)
+  assert cache.statistics["hits"] == 2
+  for key in return_layers:
+    np.testing.assert_array_equal(first[key], second[key])
+
+
+def test_render_cache_dedupes_static_frames(tmp_path):
+  cache = RenderCache(tmp_path / "cache")
+  scene = core.Scene(resolution=(16, 16), frame_start=1, frame_end=4)
+  scene += core.Cube()
+  scene += core.PerspectiveCamera(position=(2, -8, 5), look_at=(0, 0, 0))
+  renderer = blender.Blender(scene, tmp_path / "scratch", samples_per_pixel=1,
+                             render_cache=cache)
+  result = renderer.render(return_layers=("depth",))
+  assert result["depth"].shape == (4, 16, 16, 1)
+  assert cache.size_bytes > 0 and len(list((tmp_path / "cache").glob("*.npz"))) == 1
+  assert len(list((tmp_path / "scratch" / "exr").glob("*.exr"))) == 1
+
+
+def test_render_profile(tmp_path):
+  scene = _make_annotation_test_scene()
+  renderer = blender.Blender(scene, tmp_path, samples_per_pixel=4, use_denoising=False)
+  renderer.render(frames=[1, 2], return_layers=("rgba", "depth"))
+  summary = renderer.last_render_profile.frame_summary()
+  for frame in (1, 2):
+    for name in ("frame_set", "cycles/sampling", "compositor_and_write",
+                 "postprocess/exr_decode", "postprocess/rgba", "postprocess/depth"):
+      assert name in summary[frame]
+  assert renderer.last_render_profile.peak_memory > 0
+  renderer.last_render_profile.save_chrome_trace(tmp_path / "trace.json")
+
+
+@pytest.mark.parametrize("return_layers", [
+    ("rgba", "depth", "segmentation", "normal", "object_coordinates"),
+    ("rgba", "forward_flow", "backward_flow"),
+])
+def test_static_scene_fast_path_is_bit_identical(tmp_path, return_layers):
+  results = {}
+  for fast_path in (False, True):
+    scene = core.Scene(resolution=(32, 24), frame_start=1, frame_end=3)
+    scene += core.Cube(position=(0, 0, 0))
+    scene += core.Sphere(position=(1.5, 0, 0), scale=0.5)
+    camera = core.PerspectiveCamera()
+    scene += camera
+    for frame in range(1, 4):
+      camera.position = (2 * frame, -8, 5)
+      camera.look_at((0, 0, 0))
+      camera.keyframe_insert("position", frame)
+      camera.keyframe_insert("quaternion", frame)
+    renderer = blender.Blender(scene, tmp_path / str(fast_path), samples_per_pixel=4,
+                               static_scene_fast_path=fast_path)
+    assert renderer.is_camera_only_animation()
+    results[fast_path] = renderer.render(return_layers=return_layers)
+    assert not renderer.blender_scene.render.use_persistent_data
+    assert renderer.blender_scene.view_layers["AuxOutputs"].use_pass_vector
+
+  for key in return_layers:
+    np.testing.assert_array_equal(results[True][key], results[False][key])
+
+
+def test_static_scene_fast_path_is_disabled_by_default(tmp_path):
+  assert not blender.Blender(core.Scene(), tmp_path).static_scene_fast_path
+
+
+def test_is_camera_only_animation(tmp_path):
+  scene = _make_annotation_test_scene()  # contains a moving sphere
+  renderer = blender.Blender(scene, tmp_path)
+  assert not renderer.is_camera_only_animation()
+
+
+def test_identical_materials_are_shared(tmp_path):
+  scene = core.Scene()
+  renderer = blender.Blender(scene, tmp_path, share_materials=True)
+  cubes = [core.Cube(material=core.PrincipledBSDFMaterial(color=core.get_color("red")))
+           for _ in range(3)]
+  scene += cubes
+  scene += core.Cube(material=core.PrincipledBSDFMaterial(color=core.get_color("blue")))
+
+  blender_materials = [cube.linked_objects[renderer].active_material for cube in cubes]
+  assert all(mat == blender_materials[0] for mat in blender_materials)
+  assert renderer.material_statistics["created"] == 2
+  assert renderer.material_statistics["shared"] == 2
+
+
+def test_shared_material_copy_on_write(tmp_path):
+  scene = core.Scene()
+  renderer = blender.Blender(scene, tmp_path, share_materials=True)
+  material_a = core.FlatMaterial(color=core.get_color("red"))
+  material_b = core.FlatMaterial(color=core.get_color("red"))
+  material_c = core.FlatMaterial(color=core.get_color("red"))
+  cube_a, cube_b, cube_c = [core.Cube(material=m) for m in (material_a, material_b, material_c)]
+  scene += [cube_a, cube_b, cube_c]
+
+  material_a.color = core.get_color("green")
+  material_b.keyframe_insert("holdout", 1)
+  assert renderer.material_statistics["split"] == 2
+
+  mat_a = cube_a.linked_objects[renderer].active_material
+  mat_b = cube_b.linked_objects[renderer].active_material
+  mat_c = cube_c.linked_objects[renderer].active_material
+  assert mat_a != mat_c and mat_b != mat_c and mat_a != mat_b
+  assert mat_a == material_a.linked_objects[renderer]
+  np.testing.assert_allclose(mat_a.node_tree.nodes["Emission"].inputs["Color"].default_value,
+                             core.get_color("green"))
+  np.testing.assert_allclose(mat_c.node_tree.nodes["Emission"].inputs["Color"].default_value,
+                             core.get_color("red"))
+  assert mat_b.node_tree.animation_data is not None
+  assert mat_c.node_tree.animation_data is None
+
+
+def test_share_materials_disabled_by_default(tmp_path):
+  scene = core.Scene()
+  renderer = blender.Blender(scene, tmp_path)
+  scene += [core.Cube(material=core.PrincipledBSDFMaterial()) for _ in range(2)]
+  assert renderer.material_statistics["created"] == 2
+  assert renderer.material_statistics["shared"] == 0
+
+
+def test_select_hdri_variant(tmp_path):
+  for name, width in [("environment", 256), ("environment.mip32", 32),
+                      ("environment.mip64", 64)]:
+    image = bpy.data.images.new(name, width=width, height=width // 2, float_buffer=True)
+    image.filepath_raw = str(tmp_path / f"{name}.exr")
+    image.file_format = "OPEN_EXR"
+    image.save()
+
+  scene = core.Scene(resolution=(16, 16))
+  scene.camera = core.PerspectiveCamera(focal_length=18, sensor_width=36)  # 90 degrees fov
+  renderer = blender.Blender(scene, tmp_path / "scratch", select_hdri_variant=True)
+  renderer._set_ambient_light_hdri(str(tmp_path / "environment.exr"))
+  assert renderer.ambient_hdri_node.image is None  # deferred until rendering
+  renderer._update_hdri_images()
+  image = renderer.ambient_hdri_node.image
+  assert tuple(image.size) == (64, 32)  # pi * 16 pixels are needed
+  assert image["kubric_source_filepath"] == str(tmp_path / "environment.mip64.exr")
+
+
+def test_hdri_image_cache_is_opt_in(tmp_path):
+  image = bpy.data.images.new("environment", width=32, height=16, float_buffer=True)
+  image.filepath_raw = str(tmp_path / "environment.exr")
+  image.file_format = "OPEN_EXR"
+  image.save()
+  hdri.IMAGE_CACHE.clear()
+  hits = hdri.IMAGE_CACHE.statistics["hits"]
+
+  for cache_hdri_images in (False, True, True):
+    scene = core.Scene(resolution=(16, 16))
+    renderer = blender.Blender(scene, tmp_path / "scratch", cache_hdri_images=cache_hdri_images)
+    renderer._set_ambient_light_hdri(str(tmp_path / "environment.exr"))
+    image = renderer.ambient_hdri_node.image
+    assert bpy.path.abspath(image.filepath) == str(tmp_path / "environment.exr")
+  assert hdri.IMAGE_CACHE.statistics["hits"] == hits + 1  # only the last scene used the cached pixels
+  assert image.source == "GENERATED"
+
+  # without packing, the saved file refers to the environment map
+  report = renderer.save_state(tmp_path / "scene.blend", pack_textures=False)
+  assert [f["path"] for f in report["external_files"]] == [str(tmp_path / "environment.exr")]
+
+
+def test_lod_selection_swaps_render_mesh(tmp_path):
+  trimesh.creation.icosphere(subdivisions=4).export(str(tmp_path / "visual_geometry.obj"))
+  trimesh.creation.icosphere(subdivisions=1).export(str(tmp_path / "visual_geometry.lod1.obj"))
+  scene = core.Scene(resolution=(32, 32))
+  renderer = blender.Blender(scene, tmp_path / "scratch", lod_max_error=1.)
+  obj = core.FileBasedObject(render_filename=str(tmp_path / "visual_geometry.obj"),
+                             bounds=((-1, -1, -1), (1, 1, 1)))
+  obj.metadata["lods"] = [{"filename": "visual_geometry.lod1.obj", "error": 0.05}]
+  scene += obj
+  scene.camera = core.PerspectiveCamera(position=(0, 0, 100), look_at=(0, 0, 0))
+
+  renderer._update_lods(frames=[1])
+  assert len(obj.linked_objects[renderer].data.polygons) == 80
+  scene.camera.position = (0, 0, 3)  # close-up: back to the original mesh
+  renderer._update_lods(frames=[1])
+  assert len(obj.linked_objects[renderer].data.polygons) == 5120
+
+
+def test_half_float_exr_layers(tmp_path):
+  scene = _make_annotation_test_scene()
+  results = {}
+  for half_float_layers in [(), blender_utils.HALF_FLOAT_LAYERS]:
+    renderer = blender.Blender(scene, tmp_path / str(len(half_float_layers)), samples_per_pixel=4,
+                               exr_half_float_layers=half_float_layers)
+    results[half_float_layers] = renderer.render(frames=[2], return_layers=(
+        "depth", "segmentation", "normal", "object_coordinates", "forward_flow"))
+  assert (tmp_path / "4" / "exr" / "half" / "frame_0002.exr").exists()
+
+  full, half = results[()], results[blender_utils.HALF_FLOAT_LAYERS]
+  for key in ("depth", "segmentation", "forward_flow"):  # still float32
+    np.testing.assert_array_equal(half[key], full[key])
+  for key in ("normal", "object_coordinates"):  # uint16, with an error of up to 2**-11
+    np.testing.assert_allclose(half[key].astype(np.float32), full[key], atol=65535 / 2**10)
+
+
+def test_rgba_from_exr_matches_png(tmp_path):
+  scene = _make_annotation_test_scene()
+  results = {}
+  for rgba_source in ["png", "exr"]:
+    renderer = blender.Blender(scene, tmp_path / rgba_source, samples_per_pixel=4,
+                               rgba_source=rgba_source)
+    renderer.blender_scene.view_settings.view_transform = "Standard"
+    renderer.blender_scene.render.image_settings.dither_intensity = 0.
+    results[rgba_source] = renderer.render(frames=[2], return_layers=("rgba",))["rgba"]
+  assert not list((tmp_path / "exr" / "images").glob("*.png"))
+  np.testing.assert_allclose(results["exr"].astype(np.int32), results["png"], atol=1)
+
+
+def test_save_state_without_packing_in_background(tmp_path):
+  scene = core.Scene()
+  texture = tmp_path / "texture.png"
+  file_io.write_png(np.zeros((4, 4, 3), dtype=np.uint8), texture)
+  renderer = blender.Blender(scene, tmp_path / "scratch")
+  bpy.data.images.load(str(texture))
+  report = renderer.save_state(tmp_path / "out" / "scene.blend", pack_textures=False,
+                               background=True)
+  assert report["external_files"] == [{"path": str(texture),
+                                       "sha256": render_cache_lib.file_digest(texture)}]
+  assert report["copy"].result().size_bytes == report["size_bytes"]
+  assert (tmp_path / "out" / "scene.blend").stat().st_size == report["size_bytes"]
+  assert not list((tmp_path / "scratch").glob("scene_*.blend"))
+
+
+def test_keyframe_insert_many(tmp_path):
+  scene = core.Scene()
+  renderer = blender.Blender(scene, tmp_path)
+  sphere = core.Sphere()
+  scene += sphere
+  positions = [(0, 0, frame) for frame in range(5)]
+  sphere.keyframe_insert_many("position", list(range(5)), positions)
+  blender_obj = sphere.linked_objects[renderer]
+  for frame, position in enumerate(positions):
+    renderer.blender_scene.frame_set(frame)
+    np.testing.assert_allclose(blender_obj.location, position, atol=1e-5)
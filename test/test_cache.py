@@ -0,0 +1,47 @@
+# Copyright 2024 The Kubric Authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Testing for `kubric.cache` module."""
+
+import numpy as np
+
+from kubric import cache
+from kubric.renderer.render_cache import RenderCache
+from kubric.simulator.simulation_cache import SimulationCache
+
+
+def test_caches_share_the_array_store():
+  assert issubclass(RenderCache, cache.ArrayCache)
+  assert issubclass(SimulationCache, cache.ArrayCache)
+  assert not issubclass(SimulationCache, RenderCache)
+
+
+def test_compressed_array_cache(tmp_path):
+  arrays = {"position": np.zeros((100, 3), dtype=np.float32)}
+  uncompressed = cache.ArrayCache(tmp_path / "uncompressed", max_size_bytes=2**20)
+  compressed = SimulationCache(tmp_path / "compressed")
+  for array_cache in (uncompressed, compressed):
+    array_cache.put("key", arrays)
+    np.testing.assert_array_equal(array_cache.get("key", ["position"])["position"],
+                                  arrays["position"])
+  assert compressed.size_bytes < uncompressed.size_bytes
+
+
+def test_file_digest(tmp_path):
+  path = tmp_path / "file.txt"
+  path.write_text("a")
+  digest = cache.file_digest(path)
+  assert digest == cache.file_digest(str(path))
+  path.write_text("bb")
+  assert cache.file_digest(path) != digest
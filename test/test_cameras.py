@@ -12,9 +12,11 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import numpy as np
 import pytest
 
 from kubric.core import cameras
+from kubric.core.scene import Scene
 
 
 def test_orthographic_camera_constructor():
@@ -33,3 +35,26 @@ def test_perspective_camera_field_of_view():
   assert cam.field_of_view == pytest.approx(1.1427, abs=1e-4)  # ca 65.5°
 
 
+
+
+def test_z_to_depth_of_region_matches_full_image():
+  scene = Scene(resolution=(8, 6))
+  cam = cameras.PerspectiveCamera(focal_length=28, sensor_width=36)
+  scene += cam
+  z = np.random.uniform(1, 10, size=(2, 6, 8, 1))
+  full_depth = cam.z_to_depth(z)
+  region_depth = cam.z_to_depth(z[:, 1:4, 2:7], region=(1, 2, 4, 7))
+  np.testing.assert_allclose(region_depth, full_depth[:, 1:4, 2:7], rtol=1e-6)
+
+
+def test_intrinsics_for_region():
+  scene = Scene(resolution=(8, 6))
+  cam = cameras.PerspectiveCamera(position=(0, 0, 0))
+  scene += cam
+  region = (1, 2, 4, 7)
+  point = np.array([0.3, -0.2, -2.])
+  full_uv = cam.intrinsics @ point
+  full_pixel = full_uv[:2] / full_uv[2] * np.array(scene.resolution)
+  region_uv = cam.intrinsics_for_region(region) @ point
+  region_pixel = region_uv[:2] / region_uv[2] * np.array([5, 3])
+  np.testing.assert_allclose(region_pixel, full_pixel - np.array([2, 1]))
@@ -0,0 +1,47 @@
+# Copyright 2024 The Kubric Authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import numpy as np
+import pytest
+
+from kubric import core
+from kubric.simulator.contacts import ContactBuffer
+
+
+def test_contact_buffer_grows_and_yields_events():
+  cube, sphere = core.Cube(), core.Sphere()
+  buffer = ContactBuffer({1: cube, 2: sphere}, capacity=2)
+  buffer.extend([1, 1, 2], [2, 2, 1], np.ones((3, 3)), np.zeros((3, 3)), [0., 0.25, 1.5],
+                [1., 3., 2.])
+  buffer.extend([], [], [], [], [], [])
+  assert len(buffer) == 3
+  np.testing.assert_array_equal(buffer.force, [1., 3., 2.])
+  assert buffer[-1] == {"instances": (sphere, cube), "position": (1., 1., 1.),
+                        "contact_normal": (0., 0., 0.), "frame": 1.5, "force": 2.}
+  assert [event["force"] for event in buffer] == [1., 3., 2.]
+  with pytest.raises(IndexError):
+    buffer[3]  # pylint: disable=pointless-statement
+
+
+def test_aggregate_keeps_max_force_per_pair_and_frame():
+  buffer = ContactBuffer()
+  buffer.extend(body_a=[1, 1, 1, 3, 1], body_b=[2, 2, 2, 2, 2],
+                position=np.arange(15).reshape(5, 3), contact_normal=np.zeros((5, 3)),
+                frame=[0., 0.5, 1., 1., 1.5], force=[1., 5., 2., 1., 4.])
+  aggregated = buffer.aggregate()
+  np.testing.assert_array_equal(aggregated.body_a, [1, 3, 1])
+  np.testing.assert_array_equal(aggregated.force, [5., 1., 4.])
+  np.testing.assert_array_equal(aggregated.frame, [0.5, 1., 1.5])
+  np.testing.assert_array_equal(aggregated.position[0], [3, 4, 5])
+  assert not ContactBuffer().aggregate()
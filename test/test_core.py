@@ -278,3 +278,23 @@ def test_keyframe_insert():
   assert change_argument.frame == 7
   assert change_argument.type == "keyframe"
 
+
+def test_keyframe_insert_many():
+  obj = objects.Object3D(position=(1, 1, 1))
+  handler = mock.Mock()
+  obj.observe(handler, "position", type="keyframe")
+  change_handler = mock.Mock()
+  obj.observe(change_handler, "position")
+
+  obj.keyframe_insert_many("position", [3, 4, 5], [(0, 0, 0), (1, 2, 3), (2, 4, 6)])
+
+  assert handler.call_count == 1
+  assert change_handler.call_count == 0
+  change_argument = handler.call_args[0][0]
+  assert change_argument.frames == [3, 4, 5]
+  assert change_argument.type == "keyframe"
+  np.testing.assert_allclose(obj.position, (1, 1, 1))
+  np.testing.assert_allclose(obj.get_value_at("position", 4), (1, 2, 3))
+  with pytest.raises(ValueError):
+    obj.keyframe_insert_many("position", [1, 2], [(0, 0, 0)])
+
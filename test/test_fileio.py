@@ -146,3 +146,16 @@ def test_write_image_dict(tmpdir):
 
       assert img.shape == img_recovered.shape
       np.testing.assert_allclose(img_recovered, img, rtol=1e-4, atol=1e-4)
+
+
+def test_copy_file_in_background(tmp_path):
+  source = tmp_path / "source.bin"
+  source.write_bytes(b"kubric" * 100)
+  future = file_io.copy_file_in_background(source, tmp_path / "sub" / "target.bin",
+                                           remove_source=True)
+  results = file_io.wait_for_background_copies()
+  assert results == [future.result()]
+  assert results[0].size_bytes == 600
+  assert (tmp_path / "sub" / "target.bin").read_bytes() == b"kubric" * 100
+  assert not source.exists()
+  assert not file_io.wait_for_background_copies()
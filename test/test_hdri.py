@@ -0,0 +1,61 @@
+# Copyright 2024 The Kubric Authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Testing for `kubric.renderer.hdri` module."""
+
+import numpy as np
+
+from kubric.renderer import hdri
+
+
+def test_find_and_select_mip_variants(tmp_path):
+  filename = tmp_path / "environment_4k.hdr"
+  filename.touch()
+  for width in (2048, 1024):
+    hdri.mip_variant_path(filename, width).touch()
+  (tmp_path / "other_4k.mip512.exr").touch()
+
+  variants = hdri.find_mip_variants(filename)
+  assert list(variants) == [1024, 2048]
+  assert variants[1024].name == "environment_4k.mip1024.exr"
+
+  # 90 degrees fov: pi * resolution_x texels are needed
+  fov = np.pi / 2
+  np.testing.assert_allclose(hdri.required_width(fov, 256), np.pi * 256)
+  assert hdri.select_mip_variant(filename, fov, 256) == str(variants[1024])
+  assert hdri.select_mip_variant(filename, fov, 512) == str(variants[2048])
+  assert hdri.select_mip_variant(filename, fov, 1024) == str(filename)
+  assert hdri.select_mip_variant(filename, fov, 256, oversampling=2.) == str(variants[2048])
+
+
+def test_image_cache_lru(tmp_path):
+  filenames = [tmp_path / f"image_{i}.exr" for i in range(3)]
+  for filename in filenames:
+    filename.touch()
+  cache = hdri.ImageCache(max_size_bytes=2 * 64)  # room for two images
+
+  assert cache.get(filenames[0]) is None
+  loaded = []
+  def load(filename):
+    loaded.append(filename)
+    return np.zeros((4, 4), np.float32)  # 64 bytes
+  for filename in filenames[:2]:
+    cache.get_or_load(filename, load)
+  cache.get_or_load(filenames[0], load)  # hit, makes image_1 the least recently used
+  cache.get_or_load(filenames[2], load)
+  assert loaded == [str(f) for f in filenames]
+  assert cache.statistics == {"hits": 1, "misses": 4, "evictions": 1}
+  assert cache.get(filenames[1]) is None
+  assert cache.get(filenames[0]) is not None
+  assert cache.size_bytes == 128
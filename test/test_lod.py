@@ -0,0 +1,76 @@
+# Copyright 2024 The Kubric Authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Testing for `kubric.renderer.lod` module."""
+
+import numpy as np
+import pytest
+import trimesh
+
+from kubric.core import cameras
+from kubric.core import objects
+from kubric.renderer import lod
+
+
+def test_lod_variant_path():
+  assert lod.lod_variant_path("/a/visual_geometry.glb", 2).as_posix() == \
+      "/a/visual_geometry.lod2.glb"
+
+
+def test_screen_space_scale():
+  camera = cameras.PerspectiveCamera(focal_length=18, sensor_width=36, position=(0, 0, 10),
+                                     look_at=(0, 0, 0))
+  cube = objects.Cube(position=(0, 0, 0), scale=0.5)  # closest point at depth 9.5
+  # focal length of 50 pixels for a 100 pixels wide image
+  scale = lod.screen_space_scale(cube, [camera], frames=[1], resolution=(100, 100))
+  np.testing.assert_allclose(scale, 0.5 * 50 / 9.5)
+
+  # moving the cube towards the camera increases the scale
+  cube.position = (0, 0, 5)
+  cube.keyframe_insert("position", 2)
+  cube.position = (0, 0, 0)
+  cube.keyframe_insert("position", 1)
+  scale = lod.screen_space_scale(cube, [camera], frames=[1, 2], resolution=(100, 100))
+  np.testing.assert_allclose(scale, 0.5 * 50 / 4.5)
+
+  behind_camera = objects.Cube(position=(0, 0, 20))
+  assert lod.screen_space_scale(behind_camera, [camera], [1], (100, 100)) == 0
+  around_camera = objects.Cube(position=(0, 0, 10), scale=2)
+  assert lod.screen_space_scale(around_camera, [camera], [1], (100, 100)) == np.inf
+
+
+def test_select_lod():
+  camera = cameras.PerspectiveCamera(focal_length=18, sensor_width=36, position=(0, 0, 10),
+                                     look_at=(0, 0, 0))
+  cube = objects.Cube(position=(0, 0, 0), scale=0.5)
+  lods = [{"error": 0.1}, {"error": 0.5}]
+  # one unit in object coordinates covers 0.5 * 50 / 9.5 ~= 2.63 pixels
+  assert lod.select_lod(cube, lods, [camera], [1], (100, 100), max_error=0.2) == 0
+  assert lod.select_lod(cube, lods, [camera], [1], (100, 100), max_error=1.) == 1
+  assert lod.select_lod(cube, lods, [camera], [1], (100, 100), max_error=2.) == 2
+
+
+def test_make_lod_variants(tmp_path):
+  pytest.importorskip("fast_simplification")
+  pytest.importorskip("rtree")
+  filename = tmp_path / "visual_geometry.obj"
+  trimesh.creation.icosphere(subdivisions=4).export(str(filename))
+
+  lods = lod.make_lod_variants(filename, face_ratios=(0.25, 0.05))
+  assert [entry["filename"] for entry in lods] == ["visual_geometry.lod1.obj",
+                                                  "visual_geometry.lod2.obj"]
+  assert lods[0]["num_faces"] > lods[1]["num_faces"]
+  assert 0 < lods[0]["error"] < lods[1]["error"] < 0.2
+  decimated = trimesh.load(str(tmp_path / "visual_geometry.lod2.obj"))
+  assert len(decimated.faces) == lods[1]["num_faces"]
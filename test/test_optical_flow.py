@@ -0,0 +1,79 @@
+# Copyright 2024 The Kubric Authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Testing for `kubric.renderer.optical_flow` module."""
+
+import numpy as np
+
+from kubric.core import cameras
+from kubric.core import objects
+from kubric.core.scene import Scene
+from kubric.renderer import optical_flow
+
+
+def _make_scene():
+  scene = Scene(resolution=(32, 32), frame_start=1, frame_end=3)
+  cube = objects.Cube(position=(0, 0, 0))
+  scene += cube
+  camera = cameras.PerspectiveCamera(position=(0, 0, 10), look_at=(0, 0, 0))
+  scene += camera
+  for frame in range(0, 5):
+    cube.position = (0.1 * frame, 0, 0)
+    cube.keyframe_insert("position", frame)
+  return scene, cube, camera
+
+
+def test_flow_of_a_single_point_over_a_stack():
+  scene, cube, camera = _make_scene()
+  # the top center of the cube is visible in pixel (10, 20) of frame 1 and (5, 7) of frame 3
+  object_coordinates = np.zeros((2, 32, 32, 3))
+  object_coordinates[:, :, :] = (0.5, 0.5, 1.)
+  segmentation = np.zeros((2, 32, 32, 1), dtype=np.int64)
+  segmentation[0, 10, 20] = 1
+  segmentation[1, 5, 7] = 1
+
+  backward_flow, forward_flow = optical_flow.compute_optical_flow(
+      object_coordinates, segmentation, scene, frames=[1, 3], assets=[cube],
+      bounds=[((-1, -1, -1), (1, 1, 1))])
+  assert backward_flow.shape == forward_flow.shape == (2, 32, 32, 2)
+
+  def pixel_at(frame):
+    # (row, column) of the top center of the cube at frame
+    point = (0.1 * frame, 0., 1.)
+    return camera.project_point(point, frame=frame)[1::-1] * 32
+
+  np.testing.assert_allclose(forward_flow[0, 10, 20], pixel_at(2) - pixel_at(1), atol=1e-6)
+  np.testing.assert_allclose(backward_flow[0, 10, 20], pixel_at(0) - pixel_at(1), atol=1e-6)
+  np.testing.assert_allclose(forward_flow[1, 5, 7], pixel_at(4) - pixel_at(3), atol=1e-6)
+  assert np.count_nonzero(forward_flow) == 2
+
+
+def test_camera_motion_and_uint16_object_coordinates():
+  scene, cube, camera = _make_scene()
+  for frame in range(1, 4):
+    cube.position = (0, 0, 0)
+    cube.keyframe_insert("position", frame)
+    camera.position = (0, 0.2 * frame, 10)
+    camera.keyframe_insert("position", frame)
+
+  object_coordinates = np.full((1, 32, 32, 3), 65535, dtype=np.uint16)
+  segmentation = np.ones((1, 32, 32, 1), dtype=np.int64)
+  backward_flow, forward_flow = optical_flow.compute_optical_flow(
+      object_coordinates, segmentation, scene, frames=[2], assets=[cube],
+      bounds=[((-1, -1, -1), (1, 1, 1))])
+  # all pixels show the (static) corner (1, 1, 1) of the cube, which moves vertically in the image
+  # when the camera moves along y
+  assert np.all(np.abs(forward_flow[..., 0]) > 0.5)
+  np.testing.assert_allclose(forward_flow, -backward_flow, atol=1e-6)
+  np.testing.assert_allclose(forward_flow[..., 1], 0., atol=1e-6)
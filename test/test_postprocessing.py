@@ -12,6 +12,7 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+from kubric import post_processing
 from kubric.renderer import blender_utils
 
 from kubric.core.scene import Scene
@@ -65,6 +66,14 @@ def test_mm3hash():
     assert blender_utils.mm3hash(name) == expected
 
 
+def test_post_processors_are_reexported_by_blender_utils():
+  for name in ("replace_cryptomatte_hashes_by_asset_index", "process_depth", "process_z",
+               "process_backward_flow", "process_forward_flow", "process_uv", "process_normal",
+               "process_object_coordinates", "process_segementation", "process_rgba",
+               "process_rgb"):
+    assert getattr(blender_utils, name) is getattr(post_processing, name)
+
+
 @pytest.mark.skip(reason="TODO(klausg)")
 def test_optical_flow():
   # --- create scene and attach a renderer to it
@@ -119,3 +128,37 @@ def test_depth(tmpdir):
   # the depth map should give a constant value equal to the radius of the sphere
   frames = renderer.render_still()
   np.testing.assert_allclose(frames["depth"], 10, atol=0.01)
+
+
+def test_min_visible_foreground_objects():
+  scene = Scene(resolution=(4, 4))
+  scene += objects.Cube()
+  scene += objects.Sphere(segmentation_id=7)
+  scene += objects.Cube(background=True)
+  segmentation = np.zeros((2, 4, 4, 1), dtype=np.uint32)
+  segmentation[0, :2] = 1  # the first cube covers half of the first frame
+  segmentation[1, 0, 0] = 7  # the sphere covers a single pixel of the second frame
+  segmentation[1, 2:] = 3  # background assets are ignored
+
+  layers = {"segmentation": segmentation}
+  predicate = post_processing.min_visible_foreground_objects
+  assert predicate(min_objects=2, min_visible_fraction=0.05)(layers, scene)
+  assert not predicate(min_objects=2, min_visible_fraction=0.1)(layers, scene)
+  assert not predicate(min_objects=3)(layers, scene)
+
+
+def test_tonemap_linear_rgba():
+  linear_rgba = np.array([[0., 0., 0., 0.],  # transparent
+                          [1., 0.5, 0.0031308, 1.],
+                          [0.25, 0.25, 0.25, 0.5],  # premultiplied by alpha=0.5
+                          [4., 4., 4., 1.]])  # clipped
+  rgba = post_processing.tonemap_linear_rgba(linear_rgba)
+  assert rgba.dtype == np.uint8
+  np.testing.assert_array_equal(rgba[0], [0, 0, 0, 0])
+  np.testing.assert_array_equal(rgba[1], [255, 188, 10, 255])
+  np.testing.assert_array_equal(rgba[2], rgba[1, 1:2].tolist() * 3 + [128])
+  np.testing.assert_array_equal(rgba[3], [255, 255, 255, 255])
+
+  brighter = post_processing.tonemap_linear_rgba(linear_rgba[2:3] / 2, exposure=1.)
+  np.testing.assert_array_equal(brighter[0, :3], rgba[2, :3])
+  assert post_processing.tonemap_linear_rgba(linear_rgba, bit_depth=16).dtype == np.uint16
@@ -0,0 +1,53 @@
+# Copyright 2024 The Kubric Authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Testing for `kubric.renderer.profiling` module."""
+
+import json
+
+import pytest
+
+from kubric.renderer import profiling
+
+
+def test_parse_cycles_peak_memory():
+  stats = "Fra:1 | Mem:24.51M (Peak 31.00M) | Time:00:01.27 | Sample 12/64"
+  assert profiling.parse_cycles_peak_memory(stats) == 31 * 2**20
+  assert profiling.parse_cycles_peak_memory("Fra:1 | Mem:1.5G, Peak:2.5G") == int(2.5 * 2**30)
+  assert profiling.parse_cycles_peak_memory("Compositing") is None
+
+
+def test_render_profile_summary_and_chrome_trace(tmp_path):
+  profile = profiling.RenderProfile()
+  for frame in (1, 2):
+    with profile.span("frame_set", frame=frame):
+      pass
+    profile.add_span("cycles/sampling", start=10. + frame, duration=0.5, frame=frame)
+    profile.record_memory(frame, cycles_peak_memory=2**30)
+  with profile.span("postprocess/analytic_flow"):
+    pass
+
+  assert profile.summary()["cycles/sampling"] == pytest.approx(1.0)
+  assert profile.frame_summary()[2]["cycles/sampling"] == pytest.approx(0.5)
+  assert profile.peak_memory >= 2**30
+
+  profile.save_chrome_trace(tmp_path / "trace.json")
+  with open(tmp_path / "trace.json", encoding="utf-8") as f:
+    trace = json.load(f)
+  spans = [e for e in trace["traceEvents"] if e["ph"] == "X"]
+  counters = [e for e in trace["traceEvents"] if e["ph"] == "C"]
+  assert len(spans) == 5
+  assert {e["cat"] for e in spans} == {"frame_set", "cycles", "postprocess"}
+  assert [e["args"].get("frame") for e in spans if e["cat"] == "cycles"] == [1, 2]
+  assert len(counters) == 2 and counters[0]["args"]["cycles_peak_memory"] == 1024.
@@ -16,6 +16,7 @@
 
 import kubric as kb
 from kubric.simulator.pybullet import PyBullet as KubricSimulator
+from kubric.simulator.simulation_cache import SimulationCache
 import numpy as np
 
 
@@ -50,3 +51,209 @@ def test_simulator_in_loop():
     scene.add(cube)
     simulator.run()
     np.testing.assert_allclose(cube.position[1], -0.5 * 10, atol=0.1)
+
+
+def test_run_records_states_into_arrays():
+  scene = kb.Scene(gravity=(0, 0, -10), frame_end=10)
+  simulator = KubricSimulator(scene)
+  floor = kb.Cube(name="floor", scale=(10, 10, 1), position=(0, 0, -1), static=True)
+  cubes = [kb.Cube(name=f"cube_{i}", scale=0.2, position=(i, 0, 1)) for i in range(5)]
+  scene.add([floor] + cubes)
+  animation, _ = simulator.run(frame_start=0, frame_end=10)
+
+  assert set(animation) == {floor, *cubes}
+  assert simulator.last_states["position"].shape == (11, 6, 3)
+  for cube in cubes:
+    assert animation[cube]["position"].shape == (11, 3)
+    assert animation[cube]["quaternion"].shape == (11, 4)
+    assert np.shares_memory(animation[cube]["position"], simulator.last_states["position"])
+    np.testing.assert_allclose(animation[cube]["position"][0], cube.get_value_at("position", 0))
+    np.testing.assert_allclose(animation[cube]["quaternion"][-1], cube.quaternion)
+  np.testing.assert_allclose(animation[floor]["quaternion"], [[1, 0, 0, 0]] * 11)
+
+
+def test_run_records_collisions():
+  for aggregate_contacts in [False, True]:
+    scene = kb.Scene(gravity=(0, 0, -10), frame_end=12,
+                     camera=kb.PerspectiveCamera(position=(0, -5, 1), look_at=(0, 0, 0)))
+    simulator = KubricSimulator(scene)
+    floor = kb.Cube(name="floor", scale=(10, 10, 1), position=(0, 0, -1), static=True)
+    sphere = kb.Sphere(name="sphere", scale=0.2, position=(0, 0, 0.5))
+    scene.add([floor, sphere])
+    _, collisions = simulator.run(aggregate_contacts=aggregate_contacts)
+    assert len(collisions) > 0
+    assert {frozenset(event["instances"]) for event in collisions} == {frozenset({floor, sphere})}
+    if aggregate_contacts:
+      keys = [(event["instances"], int(event["frame"])) for event in collisions]
+      assert len(set(keys)) == len(keys)
+
+    events = kb.process_collisions(collisions, scene, assets_subset=[sphere])
+    assert {event["instances"] for event in events} <= {(0, -1), (-1, 0)}
+
+
+def test_check_overlap_broadphase_matches_exhaustive():
+  scene = kb.Scene()
+  simulator = KubricSimulator(scene)
+  rng = np.random.RandomState(0)
+  cubes = [kb.Cube(scale=0.3, position=rng.uniform(-2, 2, size=3), static=True)
+           for _ in range(30)]
+  scene.add(cubes)
+  results = [simulator.check_overlap(cube) for cube in cubes]
+  assert any(results) and not all(results)
+  assert results == [simulator.check_overlap(cube, broadphase=False) for cube in cubes]
+
+  cubes[0].position = cubes[1].position  # the broadphase has to follow moved objects
+  assert simulator.check_overlap(cubes[0])
+
+
+def test_run_stops_early_when_bodies_are_at_rest():
+  results = {}
+  for rest_threshold in [None, 1e-3]:
+    scene = kb.Scene(gravity=(0, 0, -10), frame_end=48)
+    simulator = KubricSimulator(scene)
+    floor = kb.Cube(scale=(10, 10, 1), position=(0, 0, -1), static=True, friction=1.)
+    cube = kb.Cube(scale=0.2, position=(0, 0, 0.3), friction=1., restitution=0.)
+    scene.add([floor, cube])
+    results[rest_threshold], _ = simulator.run(rest_threshold=rest_threshold)
+    results[rest_threshold] = results[rest_threshold][cube]
+    statistics = simulator.last_run_statistics
+    assert statistics["steps"] + statistics["skipped_steps"] == 49 * 10
+
+  assert statistics["skipped_steps"] > 0
+  np.testing.assert_allclose(results[1e-3]["position"], results[None]["position"], atol=1e-3)
+  np.testing.assert_array_equal(results[1e-3]["velocity"][-1], 0.)
+  np.testing.assert_allclose(cube.get_value_at("position", 48), results[None]["position"][-1],
+                             atol=1e-3)
+
+
+def test_run_writes_back_trajectories_in_bulk():
+  scene = kb.Scene(gravity=(0, 0, -10), frame_end=6)
+  simulator = KubricSimulator(scene)
+  cube = kb.Cube(scale=0.2, position=(0, 0, 1))
+  scene.add(cube)
+  keyframe_changes = []
+  cube.observe(keyframe_changes.append, "position", type="keyframe")
+  animation, _ = simulator.run()
+
+  assert len(keyframe_changes) == 1
+  assert keyframe_changes[0].frames == list(range(7))
+  assert sorted(cube.keyframes["velocity"]) == list(range(7))
+  np.testing.assert_allclose(cube.position, animation[cube]["position"][-1], atol=1e-6)
+  # the simulator continues from the last frame
+  position, _ = simulator.get_position_and_rotation(cube.linked_objects[simulator])
+  np.testing.assert_allclose(position, animation[cube]["position"][-1], atol=1e-6)
+
+
+_CUBE_OBJ = """
+v -1 -1 -1
+v -1 -1 1
+v -1 1 -1
+v -1 1 1
+v 1 -1 -1
+v 1 -1 1
+v 1 1 -1
+v 1 1 1
+f 1 2 4 3
+f 5 7 8 6
+f 1 5 6 2
+f 3 4 8 7
+f 1 3 7 5
+f 2 6 8 4
+"""
+
+_CUBE_URDF = """
+<robot name="cube">
+  <link name="base">
+    <inertial>
+      <origin xyz="0 0 0" />
+      <mass value="1.0" />
+      <inertia ixx="1" ixy="0" ixz="0" iyy="1" iyz="0" izz="1" />
+    </inertial>
+    <collision>
+      <origin xyz="0 0 0" />
+      <geometry>
+        <mesh filename="collision_geometry.obj" />
+      </geometry>
+    </collision>
+  </link>
+</robot>
+"""
+
+
+def test_collision_shapes_are_cached(tmp_path):
+  (tmp_path / "collision_geometry.obj").write_text(_CUBE_OBJ)
+  (tmp_path / "object.urdf").write_text(_CUBE_URDF)
+  final_positions = {}
+  for cache_urdf_shapes in [False, True]:
+    scene = kb.Scene(gravity=(0, 0, -10), frame_end=12)
+    simulator = KubricSimulator(scene, cache_urdf_shapes=cache_urdf_shapes)
+    scene.add([kb.Cube(scale=0.5, position=(x, 0, 0.5), static=True) for x in range(3)])
+    objects = [kb.FileBasedObject(simulation_filename=str(tmp_path / "object.urdf"),
+                                  scale=0.2, position=(x, 0, 2)) for x in range(3)]
+    scene.add(objects)
+    simulator.run()
+    final_positions[cache_urdf_shapes] = np.array([obj.position for obj in objects])
+
+  assert simulator.shape_cache_statistics == {"hits": 4, "misses": 2}
+  np.testing.assert_allclose(final_positions[True], final_positions[False], atol=1e-3)
+
+
+def test_add_assets_in_batches():
+  trajectories = {}
+  for batched in [False, True]:
+    scene = kb.Scene(gravity=(0, 0, -10), frame_end=12)
+    simulator = KubricSimulator(scene)
+    floor = kb.Cube(scale=(10, 10, 1), position=(0, 0, -1), static=True)
+    spheres = [kb.Sphere(scale=0.1, position=(x, 0, 1)) for x in range(10)]
+    cubes = [kb.Cube(scale=0.1, position=(x, 2, 1), velocity=(0, 0, 1)) for x in range(5)]
+    scene.add([floor] + spheres + cubes, batch=batched)
+    assert simulator.shape_cache_statistics["misses"] == 3
+    body_ids = [asset.linked_objects[simulator] for asset in scene.assets]
+    assert len(set(body_ids)) == 16
+    if not batched:
+      # --- by default the bodies are created one by one (in the order of the assets)
+      assert body_ids == sorted(body_ids)
+    animation, _ = simulator.run()
+    assert set(animation) == set(scene.assets)
+    trajectories[batched] = np.array([animation[a]["position"] for a in spheres + cubes])
+
+  np.testing.assert_allclose(trajectories[True], trajectories[False], atol=1e-4)
+
+
+def test_run_restores_results_from_simulation_cache(tmp_path):
+  results = []
+  for _ in range(2):
+    scene = kb.Scene(gravity=(0, 0, -10), frame_end=12,
+                     camera=kb.PerspectiveCamera(position=(0, -5, 1), look_at=(0, 0, 0)))
+    simulator = KubricSimulator(scene, simulation_cache=SimulationCache(tmp_path))
+    floor = kb.Cube(scale=(10, 10, 1), position=(0, 0, -1), static=True)
+    sphere = kb.Sphere(scale=0.2, position=(0, 0, 0.5), velocity=(1, 0, 0))
+    scene.add([floor, sphere])
+    animation, collisions = simulator.run()
+    results.append((simulator.last_run_statistics, animation[sphere], list(collisions), sphere))
+
+  (first_statistics, first_animation, first_collisions, _), results = results[0], results[1:]
+  statistics, animation, collisions, sphere = results[0]
+  assert not first_statistics["cache_hit"] and statistics["cache_hit"]
+  assert statistics["steps"] == 0
+  for name, values in first_animation.items():
+    np.testing.assert_allclose(animation[name], values)
+    np.testing.assert_allclose(sphere.keyframes[name][12], values[-1])
+  assert len(collisions) == len(first_collisions) > 0
+  assert sphere in collisions[0]["instances"]
+  np.testing.assert_allclose(collisions[-1]["force"], first_collisions[-1]["force"])
+
+
+def test_time_step_follows_step_rate():
+  scene = kb.Scene(gravity=(0, 0, -10), frame_start=0, frame_end=24, step_rate=480)
+  simulator = KubricSimulator(scene, solver_iterations=20)
+  parameters = simulator._physics_client.getPhysicsEngineParameters()
+  assert parameters["fixedTimeStep"] == 1 / 480 and parameters["numSolverIterations"] == 20
+  scene.step_rate = 960
+  assert simulator._physics_client.getPhysicsEngineParameters()["fixedTimeStep"] == 1 / 960
+
+  cube = kb.Cube(position=(0, 0, 0))
+  scene.add(cube)
+  simulator.run()
+  # one second of free fall (independent of the step rate)
+  np.testing.assert_allclose(cube.position[2], -0.5 * 10, atol=0.1)
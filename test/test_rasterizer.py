@@ -0,0 +1,203 @@
+# Copyright 2024 The Kubric Authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Testing for `kubric.renderer.rasterizer` module."""
+
+import numpy as np
+import pytest
+import trimesh
+
+from kubric.core import cameras
+from kubric.core import objects
+from kubric.core.scene import Scene
+from kubric.post_processing import mm3hash
+from kubric.renderer import rasterizer
+
+
+def test_rasterize_triangles_coverage_and_occlusion():
+  pixels = np.array([[0., 0.], [4., 0.], [0., 4.],   # lower-left half of the 4x4 image
+                     [0., 0.], [4., 0.], [4., 4.]])  # upper-right half, further away
+  depth = np.array([1., 1., 1., 2., 2., 2.])
+  faces = np.array([[0, 1, 2], [3, 4, 5]])
+  face_idx, barycentric, z = rasterizer.rasterize_triangles(pixels, depth, faces, (4, 4))
+  face_idx = face_idx.reshape(4, 4)
+  # pixel centers with x + y < 4 belong to the closer triangle
+  xs, ys = np.meshgrid(np.arange(4) + 0.5, np.arange(4) + 0.5)
+  np.testing.assert_array_equal(face_idx[xs + ys < 4], 0)
+  np.testing.assert_array_equal(face_idx[(xs + ys > 4) & (xs > ys)], 1)
+  np.testing.assert_array_equal(face_idx[(xs + ys > 4) & (xs < ys)], -1)
+  np.testing.assert_allclose(barycentric[face_idx.flatten() >= 0].sum(axis=-1), 1.)
+  assert np.all(np.isinf(z[face_idx.flatten() < 0]))
+
+
+def test_clip_triangles_at_near_plane():
+  # a triangle with one vertex behind the near plane (depth 1) is clipped to a quad
+  pixels = np.array([[0., 0.], [4., 0.], [0., 4.]])
+  depth = np.array([2., 2., -2.])
+  tri_xy, tri_z, face, barycentric = rasterizer.clip_triangles(pixels[None], depth[None], near=1.)
+  assert tri_xy.shape == (2, 3, 2)
+  np.testing.assert_array_equal(face, [0, 0])
+  np.testing.assert_allclose(tri_z, barycentric @ depth)
+  assert np.all(tri_z >= 1. - 1e-12)
+  # the two vertices in front are kept, the other two lie on the near plane
+  np.testing.assert_allclose(np.sort(tri_z.ravel()), [1., 1., 1., 2., 2., 2.])
+
+
+def test_ground_plane_crossing_the_near_plane():
+  scene = Scene(resolution=(64, 48), frame_end=1)
+  scene += objects.Cube(scale=(40, 40, 0.1), position=(0, 0, -0.1))
+  camera = cameras.PerspectiveCamera(position=(0, -3, 1), look_at=(0, 0, 0))
+  scene += camera
+
+  layers = rasterizer.rasterize_frame(scene, frame=1)
+  covered = layers["segmentation_alphas"][..., 0] > 0
+  assert covered.mean() > 0.5
+  # the floor is visible below the horizon, with the depth of the ray / plane intersection
+  world_to_cam, intrinsics = rasterizer.camera_projection(camera, 1, (64, 48))
+  cols, rows = np.meshgrid(np.arange(64) + 0.5, np.arange(48) + 0.5)
+  # the view rays of the pixel centers (in world space), scaled to a depth of 1
+  rays = np.stack([cols, rows, np.ones_like(cols)], axis=-1) @ np.linalg.inv(intrinsics).T
+  rays /= -rays[..., 2:]
+  rays = rays @ world_to_cam[:3, :3]
+  hits_floor = rays[..., 2] < 0
+  np.testing.assert_array_equal(covered, hits_floor)
+  np.testing.assert_allclose(layers["depth"][..., 0][hits_floor], -1. / rays[..., 2][hits_floor],
+                             rtol=1e-4)
+
+
+def test_depth_inside_sphere():
+  scene = Scene(resolution=(7, 5), frame_end=1)
+  scene += objects.Sphere(scale=10, position=(0, 0, 0.))
+  scene += cameras.PerspectiveCamera(name="camera", position=(0, 0, 0), look_at=(1, 0, 0))
+
+  layers = rasterizer.rasterize_frame(scene, frame=1)
+  depth = scene.camera.z_to_depth(layers["depth"])
+  np.testing.assert_allclose(depth, 10, atol=0.05)
+
+
+def test_segmentation_and_object_coordinates():
+  scene = Scene(resolution=(32, 32), frame_end=1)
+  cube = objects.Cube(position=(0, 0, 0))
+  scene += cube
+  scene += cameras.PerspectiveCamera(position=(0, 0, 10), look_at=(0, 0, 0))
+
+  layers = rasterizer.rasterize_frame(scene, frame=1)
+  assert layers["segmentation_indices"][16, 16, 0] == mm3hash(cube.uid)
+  assert layers["segmentation_indices"][0, 0, 0] == 0
+  assert layers["depth"][0, 0, 0] == rasterizer.BACKGROUND_DEPTH
+  # the top face of the cube (z=1) is visible with normal (0, 0, 1)
+  np.testing.assert_allclose(layers["depth"][16, 16, 0], 9., atol=1e-5)
+  np.testing.assert_allclose(layers["normal"][16, 16], [0., 0., 1.], atol=1e-5)
+  np.testing.assert_allclose(layers["object_coordinates"][16, 16], [0.5, 0.5, 1.], atol=0.1)
+
+
+def test_flow_of_moving_cube():
+  scene = Scene(resolution=(32, 32), frame_start=1, frame_end=3)
+  cube = objects.Cube(position=(0, 0, 0), scale=0.5)
+  scene += cube
+  camera = cameras.PerspectiveCamera(position=(0, 0, 10), look_at=(0, 0, 0))
+  scene += camera
+  for frame in range(1, 4):
+    cube.position = (0.2 * frame - 0.4, 0, 0)
+    cube.keyframe_insert("position", frame)
+
+  layers = rasterizer.rasterize_frame(scene, frame=2)
+  # expected displacement of the top center of the cube in (row, column) pixels
+  current = camera.project_point((0., 0., 0.5))[:2]
+  moved = camera.project_point((0.2, 0., 0.5))[:2]
+  expected = (moved - current)[::-1] * np.array(scene.resolution)[::-1]
+  np.testing.assert_allclose(layers["forward_flow"][16, 16], expected, atol=1e-3)
+  np.testing.assert_allclose(layers["backward_flow"][16, 16], -expected, atol=1e-3)
+  np.testing.assert_allclose(layers["forward_flow"][0, 0], 0.)
+
+
+def test_rasterize_frame_at_lower_resolution():
+  scene = Scene(resolution=(32, 32), frame_start=1, frame_end=3)
+  cube = objects.Cube(position=(0, 0, 0), scale=0.5)
+  scene += cube
+  scene += cameras.PerspectiveCamera(position=(0, 0, 10), look_at=(0, 0, 0))
+  for frame in range(1, 4):
+    cube.position = (0.2 * frame - 0.4, 0, 0)
+    cube.keyframe_insert("position", frame)
+
+  full = rasterizer.rasterize_frame(scene, frame=2)
+  half = rasterizer.rasterize_frame(scene, frame=2, resolution=(16, 16))
+  for key, value in half.items():
+    assert value.shape == (16, 16) + full[key].shape[2:]
+  # the flow is measured in pixels of the given resolution
+  np.testing.assert_allclose(half["forward_flow"][8, 8], full["forward_flow"][16, 16] / 2,
+                             atol=1e-3)
+  np.testing.assert_allclose(half["depth"][8, 8], full["depth"][16, 16], atol=0.05)
+
+
+def _make_moving_cube_scene():
+  scene = Scene(resolution=(24, 16), frame_start=1, frame_end=3)
+  cube = objects.Cube(position=(0, 0, 0), scale=0.5)
+  scene += cube
+  scene += objects.Sphere(position=(1, 1, -1), scale=0.7)
+  scene += cameras.PerspectiveCamera(position=(0, 0, 10), look_at=(0, 0, 0))
+  for frame in range(1, 4):
+    cube.position = (0.2 * frame - 0.4, 0, 0)
+    cube.keyframe_insert("position", frame)
+  return scene
+
+
+def test_rasterizer_view_render():
+  scene = _make_moving_cube_scene()
+  renderer = rasterizer.Rasterizer(scene)
+  result = renderer.render()
+  assert result["depth"].shape == (3, 16, 24, 1)
+  assert result["segmentation"].shape == (3, 16, 24, 1)
+  assert result["backward_flow"].shape == (3, 16, 24, 2)
+  assert result["forward_flow"].shape == (3, 16, 24, 2)
+  assert result["normal"].shape == (3, 16, 24, 3)
+  assert result["normal"].dtype == np.uint16
+  assert result["object_coordinates"].shape == (3, 16, 24, 3)
+  assert result["object_coordinates"].dtype == np.uint16
+  assert set(np.unique(result["segmentation"])) == {0, 1, 2}
+
+  still = renderer.render_still(frame=2, return_layers=("depth",))
+  np.testing.assert_allclose(still["depth"], result["depth"][1])
+
+
+def test_rasterizer_threads_match_single_thread():
+  scene = _make_moving_cube_scene()
+  expected = rasterizer.rasterize_frame(scene, frame=2)
+  layers = rasterizer.rasterize_frame(scene, frame=2, num_threads=4)
+  for key, value in expected.items():
+    np.testing.assert_array_equal(layers[key], value)
+
+
+def test_rasterizer_numba_matches_numpy():
+  pytest.importorskip("numba")
+  scene = _make_moving_cube_scene()
+  expected = rasterizer.rasterize_frame(scene, frame=2)
+  layers = rasterizer.rasterize_frame(scene, frame=2, num_threads=2, use_numba=True)
+  np.testing.assert_array_equal(layers["segmentation_indices"], expected["segmentation_indices"])
+  for key in ("depth", "normal", "object_coordinates", "forward_flow", "backward_flow"):
+    np.testing.assert_allclose(layers[key], expected[key], rtol=1e-5, atol=1e-5)
+
+
+def test_is_rasterizable_and_mesh_of_variant(tmp_path):
+  trimesh.creation.box(extents=(2., 2., 2.)).export(str(tmp_path / "box.obj"))
+  trimesh.creation.box(extents=(1., 1., 1.)).export(str(tmp_path / "box.lod1.obj"))
+  asset = objects.FileBasedObject(render_filename=str(tmp_path / "box.obj"))
+  assert rasterizer.is_rasterizable(asset)
+  assert rasterizer.is_rasterizable(objects.Cube())
+  assert not rasterizer.is_rasterizable(objects.FileBasedObject(render_filename="model.fbx"))
+  assert not rasterizer.is_rasterizable(objects.FileBasedObject())
+
+  np.testing.assert_allclose(rasterizer.get_mesh(asset).bounds, [[-1] * 3, [1] * 3], atol=1e-6)
+  variant = rasterizer.get_mesh(asset, str(tmp_path / "box.lod1.obj"))
+  np.testing.assert_allclose(variant.bounds, [[-0.5] * 3, [0.5] * 3], atol=1e-6)
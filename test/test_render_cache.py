@@ -0,0 +1,137 @@
+# Copyright 2024 The Kubric Authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Testing for `kubric.renderer.render_cache` module."""
+
+import numpy as np
+
+from kubric.core import cameras
+from kubric.core import materials
+from kubric.core import objects
+from kubric.core.scene import Scene
+from kubric.renderer import render_cache
+
+
+def _make_scene(color=(1., 0., 0., 1.)):
+  scene = Scene(resolution=(8, 8), frame_start=1, frame_end=5)
+  cube = objects.Cube(name="cube", material=materials.PrincipledBSDFMaterial(color=color))
+  scene += cube
+  scene += cameras.PerspectiveCamera(name="camera", position=(0, 0, 10), look_at=(0, 0, 0))
+  # the cube only moves between frames 2 and 3
+  for frame, x in [(1, 0.), (2, 0.), (3, 1.), (4, 1.), (5, 1.)]:
+    cube.position = (x, 0, 0)
+    cube.keyframe_insert("position", frame)
+  return scene, cube
+
+
+def test_frame_keys_are_deterministic():
+  scene, _ = _make_scene()
+  keys = render_cache.frame_keys(scene, [1, 2, 3], {"samples_per_pixel": 16})
+  assert keys == render_cache.frame_keys(scene, [1, 2, 3], {"samples_per_pixel": 16})
+  assert keys != render_cache.frame_keys(scene, [1, 2, 3], {"samples_per_pixel": 32})
+
+  # metadata does not influence the rendering
+  scene.camera.metadata["foo"] = "bar"
+  assert keys == render_cache.frame_keys(scene, [1, 2, 3], {"samples_per_pixel": 16})
+
+
+def test_frame_keys_do_not_depend_on_uids():
+  scene_a, cube_a = _make_scene()
+  scene_b, cube_b = _make_scene()
+  assert cube_a.uid != cube_b.uid and cube_a.material.uid != cube_b.material.uid
+  assert render_cache.frame_keys(scene_a, [1, 2, 3]) == render_cache.frame_keys(scene_b, [1, 2, 3])
+
+  # but on the assignment of the referenced assets
+  cube_b.material = materials.PrincipledBSDFMaterial(color=(0., 1., 0., 1.))
+  assert render_cache.frame_keys(scene_a, [1]) != render_cache.frame_keys(scene_b, [1])
+
+
+def test_frame_keys_cover_referenced_assets_and_files(tmp_path):
+  scene, cube = _make_scene()
+  keys = render_cache.frame_keys(scene, [1])
+  cube.material.color = (0., 1., 0., 1.)
+  assert render_cache.frame_keys(scene, [1]) != keys
+
+  mesh_file = tmp_path / "mesh.obj"
+  mesh_file.write_text("v 0 0 0\n")
+  scene += objects.FileBasedObject(name="mesh", render_filename=str(mesh_file))
+  keys = render_cache.frame_keys(scene, [1])
+  mesh_file.write_text("v 0 0 1.5\n")
+  assert render_cache.frame_keys(scene, [1]) != keys
+
+
+def test_frame_keys_cover_lod_metadata(tmp_path):
+  scene, _ = _make_scene()
+  render_file = tmp_path / "mesh.obj"
+  render_file.write_text("v 0 0 0\n")
+  lod_file = tmp_path / "mesh.lod1.obj"
+  lod_file.write_text("v 0 0 0\n")
+  mesh = objects.FileBasedObject(name="mesh", render_filename=str(render_file))
+  mesh.metadata["lods"] = [{"filename": lod_file.name, "face_ratio": 0.5, "error": 0.1}]
+  scene += mesh
+  keys = render_cache.frame_keys(scene, [1])
+
+  mesh.metadata["lods"][0]["error"] = 0.2
+  assert render_cache.frame_keys(scene, [1]) != keys
+  keys = render_cache.frame_keys(scene, [1])
+  lod_file.write_text("v 0 0 1.5\n")
+  assert render_cache.frame_keys(scene, [1]) != keys
+
+
+def test_only_path_traits_are_hashed_as_files(tmp_path):
+  scene, _ = _make_scene()
+  some_file = tmp_path / "file.txt"
+  some_file.write_text("a")
+  path_keys = render_cache.frame_keys(scene, [1], {"images": [str(some_file)]})
+  other_keys = render_cache.frame_keys(scene, [1], {"view_transform": str(some_file)})
+
+  # the content of the file only matters where the string is used as a path
+  some_file.write_text("bb")
+  assert render_cache.frame_keys(scene, [1], {"images": [str(some_file)]}) != path_keys
+  assert render_cache.frame_keys(scene, [1], {"view_transform": str(some_file)}) == other_keys
+
+
+def test_static_frames_share_keys():
+  scene, _ = _make_scene()
+  keys = render_cache.frame_keys(scene, [1, 2, 3, 4, 5])
+  # frames 1 (clamped before the first keyframe) and 5 (after the last) see no motion
+  assert keys[1] != keys[2]  # frame 2 moves towards frame 3
+  assert keys[4] == keys[5]
+  assert len(set(keys.values())) == 4
+  regions = {4: (0, 0, 4, 4), 5: (4, 4, 8, 8)}
+  keys = render_cache.frame_keys(scene, [4, 5], frame_settings=regions)
+  assert keys[4] != keys[5]
+
+
+def test_render_cache_get_put_and_lru_eviction(tmp_path):
+  layers = {"depth": np.ones((4, 4, 1), dtype=np.float32),
+            "segmentation": np.zeros((4, 4, 1), dtype=np.uint32)}
+  cache = render_cache.RenderCache(tmp_path, max_size_bytes=2**20)
+  assert cache.get("a", ["depth"]) is None
+  cache.put("a", layers)
+  cached = cache.get("a", ["depth", "segmentation"])
+  np.testing.assert_array_equal(cached["depth"], layers["depth"])
+  assert cache.get("a", ["depth", "normal"]) is None
+  assert cache.statistics == {"hits": 1, "misses": 2, "evictions": 0}
+
+  # restrict the size to two entries
+  entry_size = cache.size_bytes
+  cache = render_cache.RenderCache(tmp_path, max_size_bytes=2 * entry_size)
+  cache.put("b", layers)
+  assert cache.get("a", ["depth"]) is not None  # "a" is now more recently used than "b"
+  cache.put("c", layers)
+  assert cache.statistics["evictions"] == 1
+  assert cache.get("b", ["depth"]) is None
+  assert cache.get("a", ["depth"]) is not None
+  assert sorted(p.stem for p in tmp_path.glob("*.npz")) == ["a", "c"]
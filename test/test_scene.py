@@ -102,6 +102,36 @@ def test_add_asset_multiple_times_ignored():
   view1.add.assert_called_once_with(asset)
 
 
+def test_add_list_of_assets():
+  scene = Scene()
+  view1 = mock.Mock(view.View)
+  scene.link_view(view1)
+  asset1, asset2 = assets.Asset(), assets.Asset()
+  cam = PerspectiveCamera()
+
+  scene.add([asset1, [asset2, asset1], cam])
+
+  assert scene.assets == (asset1, asset2, cam)
+  assert scene.camera == cam
+  assert view1.add.call_args_list == [mock.call(asset1), mock.call(asset2), mock.call(cam)]
+  view1.add_all.assert_not_called()
+
+
+def test_add_list_of_assets_in_batch():
+  scene = Scene()
+  view1 = mock.Mock(view.View)
+  scene.link_view(view1)
+  asset1, asset2 = assets.Asset(), assets.Asset()
+  cam = PerspectiveCamera()
+
+  scene.add([asset1, [asset2, asset1], cam], batch=True)
+
+  assert scene.assets == (asset1, asset2, cam)
+  assert scene.camera == cam
+  view1.add_all.assert_called_once_with([asset1, asset2, cam])
+  view1.add.assert_not_called()
+
+
 def test_add_asset_multi_scene():
   scene1 = Scene()
   scene2 = Scene()
@@ -0,0 +1,64 @@
+# Copyright 2024 The Kubric Authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Testing for `kubric.simulator.simulation_cache` module."""
+
+import kubric as kb
+from kubric.simulator import simulation_cache
+import numpy as np
+
+
+def make_scene():
+  scene = kb.Scene(gravity=(0, 0, -10), frame_end=12)
+  scene += kb.Cube(name="floor", scale=(10, 10, 1), position=(0, 0, -1), static=True)
+  scene += kb.Sphere(name="ball", scale=0.2, position=(0, 0, 0.5))
+  return scene
+
+
+def key(scene, **settings):
+  assets = [asset for asset in scene.assets if isinstance(asset, kb.PhysicalObject)]
+  return simulation_cache.simulation_key(scene, assets, 0, scene.frame_end, settings)
+
+
+def test_simulation_key_ignores_renderer_only_changes():
+  scene = make_scene()
+  reference = key(scene)
+  assert key(make_scene()) == reference
+  scene.assets[1].material = kb.PrincipledBSDFMaterial(color=kb.get_color("red"))
+  scene.camera = kb.PerspectiveCamera(position=(0, -5, 1))
+  assert key(scene) == reference
+
+
+def test_simulation_key_covers_initial_conditions():
+  reference = key(make_scene())
+  for change in [lambda s: setattr(s.assets[1], "position", (0, 0, 0.6)),
+                 lambda s: setattr(s.assets[1], "velocity", (1, 0, 0)),
+                 lambda s: setattr(s.assets[1], "friction", 0.1),
+                 lambda s: setattr(s.assets[0], "restitution", 0.9),
+                 lambda s: setattr(s, "gravity", (0, 0, -9)),
+                 lambda s: setattr(s, "frame_end", 24)]:
+    scene = make_scene()
+    change(scene)
+    assert key(scene) != reference
+  assert key(make_scene(), rest_threshold=1e-3) != reference
+
+
+def test_cache_roundtrip(tmp_path):
+  cache = simulation_cache.SimulationCache(tmp_path)
+  entry = {name: np.zeros((3, 2, 3)) for name in simulation_cache.SIMULATION_ARRAYS}
+  assert cache.get("key", simulation_cache.SIMULATION_ARRAYS) is None
+  cache.put("key", entry)
+  restored = simulation_cache.SimulationCache(tmp_path).get("key",
+                                                            simulation_cache.SIMULATION_ARRAYS)
+  assert set(restored) == set(entry)